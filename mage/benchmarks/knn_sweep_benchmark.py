@@ -0,0 +1,146 @@
+"""
+Sweeps the HNSW settings of the vector field (`m`, `ef_construction`) and the number of the kNN candidates
+(`num_candidates`) and reports the recall and the latency of the kNN search for every combination.
+
+For every pair of `--m` and `--ef-construction`, the documents of the alias `--alias` are copied into a temporary index,
+then the questions of the ground truth are searched with every value of `--num-candidates`. The rows are written to
+the CSV file `--output`; with `--chart` (requires matplotlib), the p95 latency is charted against the recall,
+one line per pair of the HNSW settings.
+
+The searches have no filter, so `num_candidates / k` of the chosen row is the setting `KNN_CANDIDATES_PER_RESULT`
+of the adaptive candidate policy of the application, and `m` and `ef_construction` are the pipeline variables
+`hnsw_m` and `hnsw_ef_construction`.
+
+Usage (from the directory `mage`, Elasticsearch with the indexed documents must be running):
+    python benchmarks/knn_sweep_benchmark.py --m 8 16 32 --ef-construction 100 200 --num-candidates 10 20 50 100 200 500
+"""
+import argparse
+import csv
+import itertools
+import time
+from typing import Any, Dict, List
+
+from elasticsearch import Elasticsearch
+from sentence_transformers import SentenceTransformer
+
+from vector_index_benchmark import DEFAULT_DATASET_PATH, DEFAULT_GROUND_TRUTH_PATH, VECTOR_FIELD_NAME, evaluate, \
+    load_documents, load_exporter, load_ground_truth
+
+
+def sweep(
+    es_client: Elasticsearch,
+    exporter: Dict[str, Any],
+    documents: Any,
+    ground_truth: List[Dict[str, str]],
+    query_vectors: Any,
+    args: argparse.Namespace,
+) -> List[Dict[str, Any]]:
+    dimensions = len(documents[VECTOR_FIELD_NAME].iloc[0])
+    rows: List[Dict[str, Any]] = []
+
+    for m, ef_construction in itertools.product(args.m, args.ef_construction):
+        start_time = time.perf_counter()
+        index_name = exporter["create_index"](
+            es_client, f"benchmark_m{m}_ef{ef_construction}", 1, dimensions, args.profile, m, ef_construction
+        )
+        try:
+            _, errors = exporter["index_documents"](es_client, exporter["create_actions"](documents, index_name), 500, 2, 5, 2)
+            if errors:
+                raise Exception(f"Failed to index {len(errors)} documents, the first error: {errors[0]}")
+
+            # The graph is built while the segments are merged, so the build time includes the force merge
+            exporter["complete_loading"](es_client, index_name, 0, "1s")
+            build_time = time.perf_counter() - start_time
+
+            # The first queries load the graph into memory, they are not measured
+            evaluate(es_client, index_name, ground_truth[:10], query_vectors[:10], args.k, max(args.num_candidates))
+
+            for num_candidates in args.num_candidates:
+                result = evaluate(es_client, index_name, ground_truth, query_vectors, args.k, max(num_candidates, args.k))
+                row = dict(
+                    m=m,
+                    ef_construction=ef_construction,
+                    num_candidates=num_candidates,
+                    candidates_per_result=num_candidates / args.k,
+                    build_s=build_time,
+                    **result,
+                )
+                rows.append(row)
+                print(", ".join(f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}" for name, value in row.items()))
+        finally:
+            es_client.indices.delete(index=index_name, ignore_unavailable=True)
+
+    return rows
+
+
+def write_csv(path: str, rows: List[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()), delimiter=";")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_chart(path: str, rows: List[Dict[str, Any]], k: int) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError as error:
+        raise SystemExit("The chart requires matplotlib: pip install matplotlib") from error
+
+    figure, axes = plt.subplots(figsize=(8, 6))
+    for (m, ef_construction), group in itertools.groupby(rows, key=lambda row: (row["m"], row["ef_construction"])):
+        group_rows = list(group)
+        axes.plot([row["p95_ms"] for row in group_rows], [row[f"recall@{k}"] for row in group_rows], marker="o",
+                  label=f"m={m}, ef_construction={ef_construction}")
+        for row in group_rows:
+            axes.annotate(str(row["num_candidates"]), (row["p95_ms"], row[f"recall@{k}"]), fontsize=7,
+                          textcoords="offset points", xytext=(3, 3))
+
+    axes.set_xlabel("p95 latency of the kNN search, ms")
+    axes.set_ylabel(f"recall@{k}")
+    axes.set_title("kNN recall against latency, the points are labeled with num_candidates")
+    axes.grid(True, alpha=0.3)
+    axes.legend()
+    figure.savefig(path, dpi=150, bbox_inches="tight")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep the HNSW settings and the number of the kNN candidates.")
+    parser.add_argument("--connection-string", default="http://localhost:9200", help="The URL of Elasticsearch.")
+    parser.add_argument("--alias", default="documents", help="The alias (or index) with the indexed documents.")
+    parser.add_argument("--ground-truth", default=DEFAULT_GROUND_TRUTH_PATH, help="A CSV file with the columns 'question' and 'document_id'.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH, help="A CSV file with the ground truth documents and their ids.")
+    parser.add_argument("--model", default="distiluse-base-multilingual-cased-v1", help="The embedding model of the documents.")
+    parser.add_argument("--profile", default="cosine", help="The vector index profile of the exporter.")
+    parser.add_argument("--m", type=int, nargs="+", default=[16], help="The values of the HNSW option 'm'.")
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100], help="The values of the HNSW option 'ef_construction'.")
+    parser.add_argument("--num-candidates", type=int, nargs="+", default=[10, 20, 50, 100, 200, 500, 1000],
+                        help="The numbers of the kNN candidates per shard.")
+    parser.add_argument("--k", type=int, default=10, help="The number of the kNN results.")
+    parser.add_argument("--limit", type=int, default=1000, help="The number of the ground truth questions.")
+    parser.add_argument("--output", default="knn_sweep.csv", help="The CSV file with the results.")
+    parser.add_argument("--chart", default=None, help="An optional PNG file with the chart of the latency against the recall.")
+    args = parser.parse_args()
+
+    exporter = load_exporter()
+    es_client = Elasticsearch(args.connection_string, request_timeout=120)
+    documents = load_documents(es_client, args.alias)
+    ground_truth = load_ground_truth(args.ground_truth, args.dataset, args.limit)
+    query_vectors = SentenceTransformer(args.model).encode(
+        [record["question"].lower() for record in ground_truth], normalize_embeddings=True
+    )
+    print(f"{len(documents)} documents, {len(ground_truth)} questions")
+
+    rows = sweep(es_client, exporter, documents, ground_truth, query_vectors, args)
+
+    write_csv(args.output, rows)
+    print(f"The results are written to '{args.output}'")
+
+    if args.chart:
+        write_chart(args.chart, rows, args.k)
+        print(f"The chart is written to '{args.chart}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compares the row-wise preprocessing of the ingestion pipeline (`iterrows` with `data.at`, Python object strings) with
+the vectorized blocks `preprocess_text` and `add_document_id_column` on a synthetic FAQ and project corpus.
+The benchmark loads the blocks from the Mage project and does not require Mage or any external services.
+
+The row-wise implementation is measured on the first `--row-wise-rows` rows only, it takes hours for a million rows.
+
+Usage (from the directory `mage`):
+    python benchmarks/preprocessing_benchmark.py --rows 1000000 --row-wise-rows 50000
+"""
+import argparse
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+BLOCKS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "zoomcamp-smart-mail", "smart-mail", "transformers")
+MODEL_NAME = "distiluse-base-multilingual-cased-v1"
+WORDS = ["wann", "erfolgt", "die", "auszahlung", "der", "zinsen", "für", "das", "projekt", "wie", "hoch", "ist", "rendite",
+         "investition", "laufzeit", "anleger", "immobilie", "darlehen", "tilgung", "Kündigung", "Vertrag", "Konto"]
+CATEGORIES = ["Allgemeine Fragen", "Investition", "Auszahlung", "Projekt", "Konto"]
+
+
+def load_block(file_name: str) -> Callable[..., DataFrame]:
+    """ Loads the `transform` function of a Mage block without Mage, the decorators are replaced by no-ops. """
+
+    block_globals: Dict[str, Any] = {"transformer": lambda function: function, "test": lambda function: function}
+    with open(os.path.join(BLOCKS_DIRECTORY, file_name), encoding="utf-8") as file:
+        exec(compile(file.read(), file_name, "exec"), block_globals)
+
+    return block_globals["transform"]
+
+
+def create_corpus(number_of_rows: int, seed: int) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(WORDS)
+
+    def create_texts(min_words: int, max_words: int) -> List[str]:
+        lengths = rng.integers(min_words, max_words, size=number_of_rows)
+        return [" ".join(words) for words in np.split(rng.choice(vocabulary, size=lengths.sum()), np.cumsum(lengths)[:-1])]
+
+    questions: List[Any] = create_texts(5, 15)
+    for idx in rng.choice(number_of_rows, size=number_of_rows // 100, replace=False):
+        questions[idx] = None
+
+    return DataFrame({
+        "source_system": "evdi",
+        "category": rng.choice(np.array(CATEGORIES), size=number_of_rows),
+        "question": questions,
+        "answer": create_texts(20, 80),
+        "answer_instructions": None,
+        "project_name": rng.choice(np.array(["The Five", "Sendlinger Tor", None], dtype=object), size=number_of_rows),
+        "project_id": None,
+    })
+
+
+def preprocess_text_row_wise(data: DataFrame) -> DataFrame:
+    """ The previous implementation of the block `preprocess_text`. """
+
+    data['question'] = data['question'].fillna('')
+    data['question'] = data['question'].str.lower()
+    data['answer'] = data['answer'].str.lower()
+
+    return data
+
+
+def add_document_id_column_row_wise(data: DataFrame, model_name: str) -> DataFrame:
+    """ The previous implementation of the block `add_document_id_column`. """
+
+    for idx, row in data.iterrows():
+        hex_digest = hashlib.md5(row["question"].encode() + row["answer"].encode()).hexdigest()
+        data.at[idx, "document_id"] = hex_digest[:12]
+
+    columns = sorted(column for column in data.columns if column != "document_id")
+    data["content_hash"] = [
+        hashlib.md5("\x1f".join([model_name, *("" if pd.isna(value) else str(value) for value in values)]).encode()).hexdigest()
+        for values in zip(*(data[column] for column in columns))
+    ]
+
+    return data
+
+
+def measure(name: str, preprocess: Callable[[DataFrame], DataFrame], corpus: DataFrame) -> Tuple[DataFrame, float]:
+    data = corpus.copy()
+
+    start_time = time.perf_counter()
+    result = preprocess(data)
+    elapsed_time = time.perf_counter() - start_time
+
+    result_memory = result.memory_usage(deep=True).sum()
+    print(
+        f"{name:>10}: {len(result)} rows in {elapsed_time:.2f} s ({len(result) / elapsed_time:,.0f} rows/s), "
+        f"result size={result_memory / 2**20:.0f} MiB"
+    )
+
+    return result, len(result) / elapsed_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing blocks of the ingestion pipeline.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="The number of synthetic FAQ rows.")
+    parser.add_argument("--row-wise-rows", type=int, default=50_000, help="The number of rows for the row-wise implementation.")
+    parser.add_argument("--seed", type=int, default=42, help="The seed of the synthetic corpus.")
+    args = parser.parse_args()
+
+    preprocess_text = load_block("preprocess_text.py")
+    add_document_id_column = load_block("add_document_id_column.py")
+
+    corpus = create_corpus(args.rows, args.seed)
+    print(f"{len(corpus)} rows, {corpus.memory_usage(deep=True).sum() / 2**20:.0f} MiB")
+
+    # The row-wise blocks ran on Python object strings, the default of pandas before 3.0
+    row_wise_corpus = corpus.head(args.row_wise_rows).astype(object)
+    row_wise_result, row_wise_throughput = measure(
+        "row-wise", lambda data: add_document_id_column_row_wise(preprocess_text_row_wise(data), MODEL_NAME), row_wise_corpus
+    )
+    vectorized_result, vectorized_throughput = measure(
+        "vectorized", lambda data: add_document_id_column(preprocess_text(data), embeddings_model_name=MODEL_NAME), corpus
+    )
+
+    # The document ids are the ids of the indexed documents, so both implementations must produce the same hashes
+    compared_rows = len(row_wise_result)
+    assert row_wise_result["document_id"].tolist() == vectorized_result["document_id"].head(compared_rows).tolist()
+    assert row_wise_result["content_hash"].tolist() == vectorized_result["content_hash"].head(compared_rows).tolist()
+
+    print(f"speedup: {vectorized_throughput / row_wise_throughput:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
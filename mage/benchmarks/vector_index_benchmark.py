@@ -0,0 +1,149 @@
+"""
+Compares the vector index profiles of the Elasticsearch exporter (`VECTOR_INDEX_PROFILES`) by the recall of the kNN search,
+the size of the index on disk and the latency of the kNN queries.
+
+The documents (with their vectors) are copied from the current index of the alias `--alias` into one temporary index
+per profile. The questions of the ground truth are searched in every index, a question is a hit when its document is
+among the `--k` results. The ground truth ids are created from the original texts, the pipeline creates the ids from
+the lowercased texts, so the ids are translated with the dataset of the ground truth.
+
+Usage (from the directory `mage`, Elasticsearch with the indexed documents must be running):
+    python benchmarks/vector_index_benchmark.py --connection-string http://localhost:9200 --alias documents
+"""
+import argparse
+import csv
+import hashlib
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from pandas import DataFrame
+from elasticsearch import Elasticsearch, helpers
+from sentence_transformers import SentenceTransformer
+
+
+EXPORTER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "zoomcamp-smart-mail", "smart-mail", "data_exporters", "export_to_elasticsearch.py"
+)
+RETRIEVAL_EVALUATION_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "notebook", "retrieval_evaluation")
+DEFAULT_GROUND_TRUTH_PATH = os.path.join(RETRIEVAL_EVALUATION_DIRECTORY, "ground_truth.csv")
+DEFAULT_DATASET_PATH = os.path.join(RETRIEVAL_EVALUATION_DIRECTORY, "dataset_with_doc_ids.csv")
+VECTOR_FIELD_NAME = "vector_question_answer"
+
+
+def load_exporter() -> Dict[str, Any]:
+    """ Loads the functions of the exporter block without Mage, the decorator is replaced by a no-op. """
+
+    exporter: Dict[str, Any] = {"data_exporter": lambda function: function}
+    with open(EXPORTER_PATH, encoding="utf-8") as file:
+        exec(compile(file.read(), EXPORTER_PATH, "exec"), exporter)
+
+    return exporter
+
+
+def load_ground_truth(path: str, dataset_path: str, limit: int) -> List[Dict[str, str]]:
+    with open(dataset_path, encoding="utf-8") as file:
+        # The same id as the block `add_document_id_column` creates after the block `preprocess_text`
+        pipeline_ids = {
+            row["document_id"]: hashlib.md5(row["question"].lower().encode() + row["answer"].lower().encode()).hexdigest()[:12]
+            for row in csv.DictReader(file, delimiter=";")
+        }
+
+    with open(path, encoding="utf-8") as file:
+        records = list(csv.DictReader(file, delimiter=";"))[:limit]
+
+    return [{**record, "document_id": pipeline_ids.get(record["document_id"], record["document_id"])} for record in records]
+
+
+def load_documents(es_client: Elasticsearch, alias_name: str) -> DataFrame:
+    hits = helpers.scan(es_client, index=alias_name, query={"query": {"match_all": {}}})
+    documents = DataFrame([hit["_source"] for hit in hits])
+
+    # The dot product profiles require unit vectors, the indices created before the profiles can have other vectors
+    vectors = np.asarray(documents[VECTOR_FIELD_NAME].tolist(), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents[VECTOR_FIELD_NAME] = list(vectors)
+
+    return documents
+
+
+def evaluate(
+    es_client: Elasticsearch, index_name: str, ground_truth: List[Dict[str, str]], query_vectors: np.ndarray, k: int, num_candidates: int
+) -> Dict[str, float]:
+    hits: List[bool] = []
+    reciprocal_ranks: List[float] = []
+    elapsed_times_ms: List[float] = []
+
+    for record, query_vector in zip(ground_truth, query_vectors):
+        start_time = time.perf_counter()
+        response = es_client.search(
+            index=index_name,
+            knn=dict(field=VECTOR_FIELD_NAME, query_vector=query_vector.tolist(), k=k, num_candidates=num_candidates),
+            source=["document_id"],
+            size=k,
+        )
+        elapsed_times_ms.append((time.perf_counter() - start_time) * 1000)
+
+        document_ids = [hit["_source"]["document_id"] for hit in response["hits"]["hits"]]
+        rank = document_ids.index(record["document_id"]) + 1 if record["document_id"] in document_ids else 0
+        hits.append(rank > 0)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    percentiles = statistics.quantiles(elapsed_times_ms, n=100)
+    return {
+        f"recall@{k}": statistics.mean(hits),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": percentiles[49],
+        "p95_ms": percentiles[94],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vector index profiles of the Elasticsearch exporter.")
+    parser.add_argument("--connection-string", default="http://localhost:9200", help="The URL of Elasticsearch.")
+    parser.add_argument("--alias", default="documents", help="The alias (or index) with the indexed documents.")
+    parser.add_argument("--ground-truth", default=DEFAULT_GROUND_TRUTH_PATH, help="A CSV file with the columns 'question' and 'document_id'.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH, help="A CSV file with the ground truth documents and their ids.")
+    parser.add_argument("--model", default="distiluse-base-multilingual-cased-v1", help="The embedding model of the documents.")
+    parser.add_argument("--profiles", nargs="+", default=None, help="The profiles to compare, all by default.")
+    parser.add_argument("--k", type=int, default=5, help="The number of the kNN results.")
+    parser.add_argument("--num-candidates", type=int, default=100, help="The number of the kNN candidates per shard.")
+    parser.add_argument("--limit", type=int, default=1000, help="The number of the ground truth questions.")
+    args = parser.parse_args()
+
+    exporter = load_exporter()
+    profiles: List[str] = args.profiles or list(exporter["VECTOR_INDEX_PROFILES"])
+
+    es_client = Elasticsearch(args.connection_string, request_timeout=120)
+    documents = load_documents(es_client, args.alias)
+    ground_truth = load_ground_truth(args.ground_truth, args.dataset, args.limit)
+    query_vectors = SentenceTransformer(args.model).encode(
+        [record["question"].lower() for record in ground_truth], normalize_embeddings=True
+    )
+    print(f"{len(documents)} documents, {len(ground_truth)} questions")
+
+    dimensions = len(documents[VECTOR_FIELD_NAME].iloc[0])
+    for profile in profiles:
+        index_name = exporter["create_index"](es_client, f"benchmark_{profile}", 1, dimensions, profile)
+        try:
+            _, errors = exporter["index_documents"](es_client, exporter["create_actions"](documents, index_name), 500, 2, 5, 2)
+            if errors:
+                raise Exception(f"Failed to index {len(errors)} documents, the first error: {errors[0]}")
+
+            exporter["complete_loading"](es_client, index_name, 0, "1s")
+            store_size = es_client.indices.stats(index=index_name, metric="store")["indices"][index_name]["total"]["store"]["size_in_bytes"]
+
+            # The first queries load the graph into memory, they are not measured
+            evaluate(es_client, index_name, ground_truth[:10], query_vectors[:10], args.k, args.num_candidates)
+            result = evaluate(es_client, index_name, ground_truth, query_vectors, args.k, args.num_candidates)
+
+            metrics = ", ".join(f"{name}={value:.3f}" for name, value in result.items())
+            print(f"{profile:>16}: size={store_size / 2**20:.1f} MiB, {metrics}")
+        finally:
+            es_client.indices.delete(index=index_name, ignore_unavailable=True)
+
+
+if __name__ == "__main__":
+    main()
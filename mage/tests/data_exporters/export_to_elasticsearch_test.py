@@ -0,0 +1,52 @@
+import os
+from typing import Any, Dict, List
+
+from elasticsearch import Elasticsearch
+from elastic_transport import ApiResponseMeta, HttpHeaders, ObjectApiResponse
+
+
+BLOCK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "zoomcamp-smart-mail", "smart-mail", "data_exporters", "export_to_elasticsearch.py")
+
+
+def load_block() -> Dict[str, Any]:
+    """ Loads the functions of the Mage block without Mage, the decorators are replaced by no-ops. """
+
+    block_globals: Dict[str, Any] = {"data_exporter": lambda function: function, "test": lambda function: function}
+    with open(BLOCK_PATH, encoding="utf-8") as file:
+        exec(compile(file.read(), BLOCK_PATH, "exec"), block_globals)
+
+    return block_globals
+
+
+class FakeElasticsearch(Elasticsearch):
+    """ Answers the bulk requests with the given status per action. """
+
+    def __init__(self, statuses: List[int]) -> None:
+        super().__init__("http://localhost:9200")
+        self._statuses = statuses
+
+    def options(self, **kwargs: Any) -> "FakeElasticsearch":
+        # streaming_bulk copies the client with its options, the copy must answer with the same statuses
+        return self
+
+    def bulk(self, *args: Any, operations: Any = None, **kwargs: Any) -> Any:
+        items = [{"delete": {"_id": f"doc{idx}", "status": status}} for idx, status in enumerate(self._statuses)]
+        meta = ApiResponseMeta(status=200, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=None)  # type: ignore
+        return ObjectApiResponse(body={"errors": True, "items": items}, meta=meta)
+
+
+def test_index_chunk_skips_the_deletes_of_missing_documents():
+    block = load_block()
+    chunk = [{"_op_type": "delete", "_index": "documents", "_id": f"doc{idx}"} for idx in range(3)]
+
+    succeeded_count, errors = block["index_chunk"](FakeElasticsearch([200, 404, 500]), chunk, max_retries=0, initial_backoff=0)
+
+    assert succeeded_count == 2
+    assert [error["delete"]["_id"] for error in errors] == ["doc2"]
+
+
+def test_is_enabled_parses_the_string_values_of_the_flag():
+    is_enabled = load_block()["is_enabled"]
+
+    assert [is_enabled(value) for value in (True, "true", "1", "Yes")] == [True] * 4
+    assert [is_enabled(value) for value in (False, "false", "0", "", None)] == [False] * 5
@@ -0,0 +1,39 @@
+import os
+from typing import Any, Dict, List
+
+
+BLOCK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "zoomcamp-smart-mail", "smart-mail", "transformers", "create_embeddings.py")
+
+COMMIT_HASH = "0123456789abcdef0123456789abcdef01234567"
+
+
+def load_block() -> Dict[str, Any]:
+    """ Loads the functions of the Mage block without Mage, the decorators are replaced by no-ops. """
+
+    block_globals: Dict[str, Any] = {"transformer": lambda function: function, "test": lambda function: function}
+    with open(BLOCK_PATH, encoding="utf-8") as file:
+        exec(compile(file.read(), BLOCK_PATH, "exec"), block_globals)
+
+    return block_globals
+
+
+def test_resolve_model_revision_pins_a_branch_to_the_commit_hash_of_the_snapshot():
+    block = load_block()
+    requested: List[Any] = []
+
+    def snapshot_download(repo_id: str, revision: str) -> str:
+        requested.append((repo_id, revision))
+        return f"/cache/snapshots/{COMMIT_HASH}"
+
+    block["snapshot_download"] = snapshot_download
+
+    assert block["resolve_model_revision"]("distiluse-base-multilingual-cased-v1", "main") == COMMIT_HASH
+    assert block["resolve_model_revision"]("org/model", "v1") == COMMIT_HASH
+    assert requested == [("sentence-transformers/distiluse-base-multilingual-cased-v1", "main"), ("org/model", "v1")]
+
+
+def test_resolve_model_revision_keeps_a_commit_hash_without_a_download():
+    block = load_block()
+    block["snapshot_download"] = None
+
+    assert block["resolve_model_revision"]("distiluse-base-multilingual-cased-v1", COMMIT_HASH) == COMMIT_HASH
@@ -0,0 +1,191 @@
+import glob
+import os
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from pandas import DataFrame
+import pandas as pd
+
+from elasticsearch import Elasticsearch
+
+if 'custom' not in globals():
+    from mage_ai.data_preparation.decorators import custom
+if 'test' not in globals():
+    from mage_ai.data_preparation.decorators import test
+
+
+@custom
+def stream_csv_ingestion(*args, **kwargs) -> Dict[str, int]:
+    """
+    Ingests the FAQ and project CSV files chunk by chunk.
+
+    Every chunk of `csv_chunk_size` rows goes through the same steps as the pipeline `ingestion_evdi`
+    (preprocessing, document ids, embeddings, bulk export) before the next chunk is read, so the peak memory depends
+    on the chunk size and not on the size of the corpus. Only the ids and the content hashes of the documents are kept
+    for the whole run, they are needed to delete the documents removed from the sources.
+
+    A full run loads a new versioned index and switches the alias `index_name` to it. With the `incremental` variable
+    and an existing alias, only the new and changed documents are embedded and indexed, the removed ones are deleted.
+    """
+    connection_string = kwargs.get('connection_string', 'http://elasticsearch:9200')
+    alias_name = kwargs.get('index_name', 'documents')
+    csv_chunk_size = int(kwargs.get('csv_chunk_size', 10000))
+    number_of_shards = kwargs.get('number_of_shards', 1)
+    number_of_replicas = kwargs.get('number_of_replicas', 0)
+    refresh_interval = kwargs.get('refresh_interval', '1s')
+    chunk_size = int(kwargs.get('chunk_size', 500))
+    thread_count = int(kwargs.get('thread_count', 2))
+    max_retries = int(kwargs.get('max_retries', 5))
+    initial_backoff = float(kwargs.get('initial_backoff', 2))
+    warmup_query_count = int(kwargs.get('warmup_query_count', 10))
+    keep_previous_versions = int(kwargs.get('keep_previous_versions', 1))
+    vector_column_name = kwargs.get('vector_column_name', 'vector_question_answer')
+    vector_index_profile = kwargs.get('vector_index_profile', 'cosine')
+    hnsw_m = kwargs.get('hnsw_m') or None
+    hnsw_ef_construction = kwargs.get('hnsw_ef_construction') or None
+
+    repo_path = get_repo_path()
+    preprocess_text = load_block(repo_path, 'transformers', 'preprocess_text.py')['transform']
+    add_document_id_column = load_block(repo_path, 'transformers', 'add_document_id_column.py')['transform']
+    select_changed_documents = load_block(repo_path, 'transformers', 'select_changed_documents.py')
+    create_embeddings = load_block(repo_path, 'transformers', 'create_embeddings.py')['transform']
+    exporter = load_block(repo_path, 'data_exporters', 'export_to_elasticsearch.py')
+
+    es_client = Elasticsearch(connection_string, timeout=60)
+    incremental = select_changed_documents['is_enabled'](kwargs.get('incremental', False)) and es_client.indices.exists_alias(name=alias_name)
+    indexed_hashes = select_changed_documents['get_indexed_content_hashes'](es_client, alias_name) if incremental else {}
+
+    index_name: str | None = alias_name if incremental else None
+    seen_ids: Set[str] = set()
+    warmup_documents: List[DataFrame] = []
+    statistics = dict(rows=0, indexed=0, unchanged=0, deleted=0)
+
+    try:
+        for chunk in read_csv_chunks(csv_chunk_size):
+            chunk = add_document_id_column(preprocess_text(chunk), **kwargs)
+            seen_ids.update(chunk['document_id'].tolist())
+            statistics['rows'] += len(chunk)
+
+            is_changed = chunk['content_hash'].ne(chunk['document_id'].map(indexed_hashes)).fillna(True).astype(bool)
+            statistics['unchanged'] += int((~is_changed).sum())
+            chunk = chunk[is_changed].copy()
+            if chunk.empty:
+                continue
+
+            chunk['operation'] = 'index'
+            chunk = create_embeddings(chunk, **kwargs)
+
+            if index_name is None:
+                dimensions = len(chunk[vector_column_name].iloc[0])
+                index_name = exporter['create_index'](
+                    es_client, alias_name, number_of_shards, dimensions, vector_index_profile, hnsw_m, hnsw_ef_construction
+                )
+
+            if len(warmup_documents) < warmup_query_count:
+                warmup_documents.append(chunk.head(warmup_query_count))
+
+            statistics['indexed'] += send_actions(
+                exporter, es_client, chunk, index_name, chunk_size, thread_count, max_retries, initial_backoff
+            )
+            print(f"Processed {statistics['rows']} documents: {statistics}")
+
+        if incremental:
+            deleted_ids = sorted(indexed_hashes.keys() - seen_ids)
+            deleted_data = DataFrame({'document_id': deleted_ids, 'operation': 'delete'})
+            statistics['deleted'] = send_actions(
+                exporter, es_client, deleted_data, alias_name, chunk_size, thread_count, max_retries, initial_backoff
+            )
+            es_client.indices.refresh(index=alias_name)
+            if statistics['indexed'] or statistics['deleted']:
+                exporter['update_content_version'](es_client, alias_name)
+        elif index_name is not None:
+            exporter['complete_loading'](es_client, index_name, number_of_replicas, refresh_interval)
+            exporter['warm_up'](es_client, index_name, pd.concat(warmup_documents).head(warmup_query_count), vector_column_name)
+    except Exception:
+        if not incremental and index_name is not None:
+            # The alias still points to the previous version, the incomplete index is not needed
+            es_client.indices.delete(index=index_name, ignore_unavailable=True)
+        raise
+
+    if not incremental and index_name is not None:
+        exporter['switch_alias'](es_client, alias_name, index_name)
+        print(f"The alias '{alias_name}' points to the index '{index_name}'")
+        exporter['delete_previous_versions'](es_client, alias_name, index_name, keep_previous_versions)
+
+    print(f"Ingestion completed: {statistics}")
+    return statistics
+
+
+def read_csv_chunks(csv_chunk_size: int) -> Iterator[DataFrame]:
+    """
+    Yields the rows of the FAQ and project files in chunks.
+
+    Every chunk has the columns of all files, so the content hashes are the same as for the concatenated data frame
+    of the pipeline `ingestion_evdi`.
+    """
+    file_paths: List[Tuple[str, bool]] = [
+        *((path, True) for path in sorted(glob.glob('data/projects/**/*.csv', recursive=True))),
+        *((path, False) for path in sorted(glob.glob('data/faqs/**/*.csv', recursive=True))),
+    ]
+
+    columns: Dict[str, None] = {}
+    for path, _ in file_paths:
+        columns.update(dict.fromkeys(read_csv(path, nrows=0).columns))
+
+    for path, is_project_file in file_paths:
+        for chunk in read_csv(path, chunksize=csv_chunk_size):
+            if is_project_file:
+                for column in ('project_id', 'authorization_id'):
+                    if column in chunk.columns:
+                        chunk[column] = chunk[column].str.upper()
+
+            yield chunk.reindex(columns=list(columns))
+
+
+def read_csv(path: str, **kwargs) -> Any:
+    return pd.read_csv(path, delimiter=';', encoding='utf-8-sig', **kwargs)
+
+
+def send_actions(
+    exporter: Dict[str, Any],
+    es_client: Elasticsearch,
+    data: DataFrame,
+    index_name: str,
+    chunk_size: int,
+    thread_count: int,
+    max_retries: int,
+    initial_backoff: float,
+) -> int:
+    succeeded_count, errors = exporter['index_documents'](
+        es_client, exporter['create_actions'](data, index_name), chunk_size, thread_count, max_retries, initial_backoff
+    )
+    if errors:
+        raise Exception(f"Failed to apply {len(errors)} changes to '{index_name}', the first error: {errors[0]}")
+
+    return succeeded_count
+
+
+def load_block(repo_path: str, block_directory: str, file_name: str) -> Dict[str, Any]:
+    """ Loads the functions of another block of the project, the decorators of the block are replaced by no-ops. """
+
+    block_globals: Dict[str, Any] = {
+        decorator: (lambda function: function) for decorator in ('transformer', 'data_exporter', 'test')
+    }
+    path = os.path.join(repo_path, block_directory, file_name)
+    with open(path, encoding='utf-8') as file:
+        exec(compile(file.read(), path, 'exec'), block_globals)
+
+    return block_globals
+
+
+def get_repo_path() -> str:
+    from mage_ai.settings.repo import get_repo_path as get_mage_repo_path
+
+    return get_mage_repo_path()
+
+
+@test
+def test_output(output, *args) -> None:
+    """
+    Template code for testing the output of the block.
+    """
+    assert output is not None, 'The output is undefined'
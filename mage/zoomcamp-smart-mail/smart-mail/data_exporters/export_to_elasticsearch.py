@@ -1,47 +1,154 @@
-from typing import Dict, List, Tuple, Union
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Set, Tuple
 from pandas import DataFrame
 
-import numpy as np
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
 
 if "data_exporter" not in globals():
     from mage_ai.data_preparation.decorators import data_exporter
 
 
+# The options of the dense vector field by the name of the profile. The documents are indexed as unit vectors, so
+# `dot_product` ranks as `cosine` without normalizing the vectors for every comparison. `int8_hnsw` keeps
+# the vectors of the HNSW graph quantized to bytes in memory (Elasticsearch 8.12 or later).
+VECTOR_INDEX_PROFILES = dict(
+    cosine=dict(similarity="cosine"),
+    dot_product=dict(similarity="dot_product"),
+    int8_dot_product=dict(similarity="dot_product", index_options=dict(type="int8_hnsw")),
+)
+
+# The defaults of Elasticsearch, the versions before 8.12 require both options when `index_options` is set
+DEFAULT_HNSW_OPTIONS = dict(type="hnsw", m=16, ef_construction=100)
+
+
 @data_exporter
 def elasticsearch(data: DataFrame, *args, **kwargs):
     """
     Exports document data to an Elasticsearch database.
+
+    The documents are loaded into a new versioned index (e.g. `documents_20240901120000123456`). Then the index is force-merged
+    and warmed up, and the alias `index_name` is atomically switched to it, so the applications that search the alias
+    never see a missing or half-filled index. Only the `keep_previous_versions` latest previous versions are kept.
+
+    The documents are sent with the bulk API in chunks of `chunk_size` documents by `thread_count` threads.
+    A chunk rejected with 429 (Too Many Requests) is retried up to `max_retries` times with an exponential backoff.
+    The refresh is disabled and the replicas are removed while loading, the settings are restored afterwards.
+    The options of the vector field are selected by `vector_index_profile` (see `VECTOR_INDEX_PROFILES`), the HNSW graph
+    is built with `hnsw_m` connections per node and `hnsw_ef_construction` candidates per insert (the defaults of Elasticsearch if not set).
+
+    With the `incremental` variable, the changes selected by the block `select_changed_documents` are applied
+    to the current version of the index instead: the new and changed documents are indexed, the deleted ones are deleted.
+    Every change of the documents updates `_meta.content_version` of the index mapping, so the document caches
+    of the applications notice the changes of an index without a new version.
     """
 
     connection_string = kwargs.get("connection_string", "http://elasticsearch:9200")
-    index_name = kwargs.get("index_name", "documents")
+    alias_name = kwargs.get("index_name", "documents")
     number_of_shards = kwargs.get("number_of_shards", 1)
     number_of_replicas = kwargs.get("number_of_replicas", 0)
+    refresh_interval = kwargs.get("refresh_interval", "1s")
     vector_column_name = kwargs.get("vector_column_name", "vector_question_answer")
+    vector_index_profile = kwargs.get("vector_index_profile", "cosine")
+    hnsw_m = kwargs.get("hnsw_m") or None
+    hnsw_ef_construction = kwargs.get("hnsw_ef_construction") or None
+    chunk_size = int(kwargs.get("chunk_size", 500))
+    thread_count = int(kwargs.get("thread_count", 2))
+    max_retries = int(kwargs.get("max_retries", 5))
+    initial_backoff = float(kwargs.get("initial_backoff", 2))
+    warmup_query_count = int(kwargs.get("warmup_query_count", 10))
+    keep_previous_versions = int(kwargs.get("keep_previous_versions", 1))
+    incremental = is_enabled(kwargs.get("incremental", False))
 
     dimensions = kwargs.get("dimensions") or None
     if dimensions is None and len(data) > 0:
-        first_document = data.iloc[0]
-        vector_value = first_document.get(vector_column_name)
-        dimensions = len(vector_value) if vector_value is not None else 0
+        # The deleted documents have no vectors
+        vectors = data[vector_column_name].dropna()
+        dimensions = len(vectors.iloc[0]) if len(vectors) > 0 else 0
 
     print(f"Connecting to Elasticsearch at {connection_string}")
     es_client = Elasticsearch(connection_string, timeout=60)  # Increase timeout to 60 seconds
     print(es_client.info())
 
+    if incremental and es_client.indices.exists_alias(name=alias_name):
+        print(f"Applying {len(data)} changes to the alias '{alias_name}'")
+        indexed_count, errors = index_documents(
+            es_client, create_actions(data, alias_name), chunk_size, thread_count, max_retries, initial_backoff
+        )
+        es_client.indices.refresh(index=alias_name)
+        if len(data) > 0:
+            update_content_version(es_client, alias_name)
+
+        print(f"Applied {indexed_count} changes, {len(errors)} changes failed")
+        if errors:
+            raise Exception(f"Failed to apply {len(errors)} changes, the first error: {errors[0]}")
+        return
+
+    index_name = create_index(
+        es_client, alias_name, number_of_shards, dimensions, vector_index_profile, hnsw_m, hnsw_ef_construction
+    )
+
+    print(f"Indexing {len(data)} data to Elasticsearch index '{index_name}'")
+    try:
+        indexed_count, errors = index_documents(
+            es_client, create_actions(data, index_name), chunk_size, thread_count, max_retries, initial_backoff
+        )
+        print(f"Indexed {indexed_count} documents, {len(errors)} documents failed")
+        if errors:
+            raise Exception(f"Failed to index {len(errors)} documents, the first error: {errors[0]}")
+
+        complete_loading(es_client, index_name, number_of_replicas, refresh_interval)
+        warm_up(es_client, index_name, data.head(warmup_query_count), vector_column_name)
+    except Exception:
+        # The alias still points to the previous version, the incomplete index is not needed
+        es_client.indices.delete(index=index_name, ignore_unavailable=True)
+        raise
+
+    switch_alias(es_client, alias_name, index_name)
+    print(f"The alias '{alias_name}' points to the index '{index_name}'")
+
+    delete_previous_versions(es_client, alias_name, index_name, keep_previous_versions)
+
+
+def create_index(
+    es_client: Elasticsearch,
+    alias_name: str,
+    number_of_shards: int,
+    dimensions: int,
+    vector_index_profile: str = "cosine",
+    hnsw_m: int | None = None,
+    hnsw_ef_construction: int | None = None,
+) -> str:
+    """ Creates a new version of the index for loading and returns its name. """
+
+    if vector_index_profile not in VECTOR_INDEX_PROFILES:
+        raise ValueError(f"Unknown vector index profile '{vector_index_profile}', use one of {list(VECTOR_INDEX_PROFILES)}")
+
+    vector_options: Dict[str, Any] = dict(VECTOR_INDEX_PROFILES[vector_index_profile])
+    hnsw_options = {
+        name: int(value) for name, value in dict(m=hnsw_m, ef_construction=hnsw_ef_construction).items() if value is not None
+    }
+    if hnsw_options:
+        vector_options["index_options"] = {**DEFAULT_HNSW_OPTIONS, **vector_options.get("index_options", {}), **hnsw_options}
+
     index_settings = dict(
         settings=dict(
             number_of_shards=number_of_shards,
-            number_of_replicas=number_of_replicas,
+            # The index is not searched while loading, so it is neither refreshed nor replicated
+            number_of_replicas=0,
+            refresh_interval="-1",
         ),
         mappings=dict(
+            _meta=dict(content_version=create_content_version()),
             properties=dict(
                 answer=dict(type="text", analyzer="german"),
                 question=dict(type="text", analyzer="german"),
                 category=dict(type="text", analyzer="german"),
                 project_name=dict(type="text", analyzer="german"),
                 document_id=dict(type="text"),
+                content_hash=dict(type="keyword"),
                 answer_instructions=dict(type="text"),
                 source_system=dict(type="keyword"),
                 project_id=dict(type="keyword"),
@@ -51,19 +158,178 @@ def elasticsearch(data: DataFrame, *args, **kwargs):
                     type="dense_vector",
                     dims=dimensions,
                     index=True,
-                    similarity="cosine",
+                    **vector_options,
                 ),
             ),
         ),
     )
 
-    if es_client.indices.exists(index=index_name):
-        es_client.indices.delete(index=index_name)
-
+    # The microseconds keep two runs started in the same second apart, Elasticsearch rejects an existing index name
+    index_name = f"{alias_name}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')}"
     es_client.indices.create(index=index_name, body=index_settings)
     print("Index created with properties:", index_settings)
 
-    print(f"Indexing {len(data)} data to Elasticsearch index '{index_name}'")
-    for idx, row in data.iterrows():
-        document_to_index = row.to_dict()
-        es_client.index(index=index_name, document=document_to_index)
+    return index_name
+
+
+def is_enabled(value: object) -> bool:
+    """ Parses a flag variable, the variables of a triggered run can be strings such as "false" or "0". """
+    return str(value).strip().lower() in ("true", "1", "yes", "y")
+
+
+def create_content_version() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def update_content_version(es_client: Elasticsearch, index_name: str) -> None:
+    """ Marks the documents of the index as changed for the document caches of the applications. """
+
+    es_client.indices.put_mapping(index=index_name, meta=dict(content_version=create_content_version()))
+
+
+def complete_loading(es_client: Elasticsearch, index_name: str, number_of_replicas: int, refresh_interval: str) -> None:
+    """ Restores the replicas and the refresh of the loaded index and merges its segments. """
+
+    es_client.indices.put_settings(
+        index=index_name,
+        settings=dict(number_of_replicas=number_of_replicas, refresh_interval=refresh_interval),
+    )
+    es_client.indices.refresh(index=index_name)
+    es_client.indices.forcemerge(index=index_name, max_num_segments=1)
+    # Wait for the replicas, otherwise the searches after the switch can hit the replicas that are still recovering
+    es_client.cluster.health(index=index_name, wait_for_status="green" if number_of_replicas else "yellow")
+
+
+def warm_up(es_client: Elasticsearch, index_name: str, documents: DataFrame, vector_column_name: str) -> None:
+    """
+    Runs the kNN and BM25 queries of the application against the index, so the HNSW graph and the term dictionaries
+    are loaded into memory before the index receives the traffic.
+    """
+    for question, vector in zip(documents["question"], documents[vector_column_name]):
+        es_client.search(
+            index=index_name,
+            knn=dict(field=vector_column_name, query_vector=list(vector), k=20, num_candidates=10000),
+            source=False,
+        )
+        es_client.search(
+            index=index_name,
+            query=dict(multi_match=dict(query=question, fields=["question^2", "answer^2", "category", "project_name"], type="best_fields")),
+            size=20,
+            source=False,
+        )
+
+
+def switch_alias(es_client: Elasticsearch, alias_name: str, index_name: str) -> None:
+    """ Points the alias to the index with one atomic request. """
+
+    actions: List[Dict[str, Any]] = []
+
+    if es_client.indices.exists_alias(name=alias_name):
+        for current_index_name in es_client.indices.get_alias(name=alias_name).keys():
+            actions.append({"remove": {"index": current_index_name, "alias": alias_name}})
+    elif es_client.indices.exists(index=alias_name):
+        # An index created before the exporter used aliases has the name of the alias, it is replaced
+        actions.append({"remove_index": {"index": alias_name}})
+
+    actions.append({"add": {"index": index_name, "alias": alias_name}})
+    es_client.indices.update_aliases(actions=actions)
+
+
+def delete_previous_versions(es_client: Elasticsearch, alias_name: str, index_name: str, keep_previous_versions: int) -> None:
+    """ Deletes the versions of the index except the current one and `keep_previous_versions` latest previous ones. """
+
+    # The versions created before the microseconds were added to the names have 14 digits, they sort before the newer ones
+    version_pattern = re.compile(rf"^{re.escape(alias_name)}_\d{{14}}(\d{{6}})?$")
+    previous_versions = sorted(
+        (name for name in es_client.indices.get(index=f"{alias_name}_*").keys() if version_pattern.match(name) and name != index_name),
+        reverse=True,
+    )
+
+    for previous_version in previous_versions[keep_previous_versions:]:
+        print(f"Deleting the previous version '{previous_version}'")
+        es_client.indices.delete(index=previous_version, ignore_unavailable=True)
+
+
+def create_actions(data: DataFrame, index_name: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the bulk actions for the rows of the data frame without materializing all of them.
+
+    The document id is the id of the Elasticsearch document, so a changed document replaces its previous version.
+    """
+    columns = [column for column in data.columns if column != "operation"]
+    operations = data["operation"] if "operation" in data.columns else ["index"] * len(data)
+
+    for operation, values in zip(operations, zip(*(data[column] for column in columns))):
+        document = dict(zip(columns, values))
+
+        if operation == "delete":
+            yield {"_op_type": "delete", "_index": index_name, "_id": document["document_id"]}
+        else:
+            yield {"_op_type": "index", "_index": index_name, "_id": document["document_id"], "_source": document}
+
+
+def index_documents(
+    es_client: Elasticsearch,
+    actions: Iterator[Dict[str, Any]],
+    chunk_size: int,
+    thread_count: int,
+    max_retries: int,
+    initial_backoff: float,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Sends the actions in chunks with `thread_count` parallel bulk requests.
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: The number of succeeded actions and the errors of the failed actions.
+    """
+    indexed_count = 0
+    errors: List[Dict[str, Any]] = []
+
+    with ThreadPoolExecutor(max_workers=thread_count, thread_name_prefix="bulk") as executor:
+        pending: Set[Future] = set()
+
+        while True:
+            chunk = list(islice(actions, chunk_size))
+            if chunk:
+                pending.add(executor.submit(index_chunk, es_client, chunk, max_retries, initial_backoff))
+
+            # Only a few chunks are kept in memory, the data frame is streamed to Elasticsearch
+            if pending and (not chunk or len(pending) >= thread_count * 2):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_indexed_count, chunk_errors = future.result()
+                    indexed_count += chunk_indexed_count
+                    errors.extend(chunk_errors)
+
+            if not chunk and not pending:
+                break
+
+    return indexed_count, errors
+
+
+def index_chunk(
+    es_client: Elasticsearch, chunk: List[Dict[str, Any]], max_retries: int, initial_backoff: float
+) -> Tuple[int, List[Dict[str, Any]]]:
+    errors: List[Dict[str, Any]] = []
+
+    # streaming_bulk retries the documents rejected with 429 with an exponential backoff
+    for ok, item in helpers.streaming_bulk(
+        es_client,
+        chunk,
+        chunk_size=len(chunk),
+        max_retries=max_retries,
+        initial_backoff=initial_backoff,
+        raise_on_error=False,
+        yield_ok=False,
+    ):
+        # `ignore_status` of streaming_bulk has no effect without `raise_on_error`, the missing documents are skipped here
+        if not ok and not is_missing_document_delete(item):
+            errors.append(item)
+
+    return len(chunk) - len(errors), errors
+
+
+def is_missing_document_delete(item: Dict[str, Any]) -> bool:
+    """ A document deleted from the sources can already be missing in the index, its delete is not an error. """
+
+    return item.get("delete", {}).get("status") == 404
@@ -1,5 +1,6 @@
 import hashlib
 from pandas import DataFrame
+import pandas as pd
 
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
@@ -22,11 +23,20 @@ def transform(data: DataFrame, *args, **kwargs):
     Returns:
         Anything (e.g. data frame, dictionary, array, int, str, etc.)
     """
-    # Specify your transformation logic here
-    for idx, row in data.iterrows():
-        hex_digest = hashlib.md5(row["question"].encode() + row["answer"].encode()).hexdigest()
-        id = hex_digest[:12]
-        data.at[idx, "document_id"] = id
+    # The hashes are computed in one pass over the concatenated column values instead of row by row
+    question_answer_pairs = (data["question"] + data["answer"]).tolist()
+    document_ids = [hashlib.md5(text.encode()).hexdigest()[:12] for text in question_answer_pairs]
+    data["document_id"] = pd.Series(document_ids, index=data.index, dtype="string[pyarrow]")
+
+    # The hash of all columns detects the changed documents, e.g. a new category of an unchanged question.
+    # The embedding model is part of the hash, so a new model embeds all documents again.
+    model_name = kwargs.get("embeddings_model_name", "")
+    columns = sorted(column for column in data.columns if column not in ("document_id", "content_hash"))
+    contents = pd.Series(model_name, index=data.index, dtype="string[pyarrow]").str.cat(
+        [data[column].astype("string[pyarrow]").fillna("") for column in columns], sep="\x1f"
+    )
+    content_hashes = [hashlib.md5(content.encode()).hexdigest() for content in contents.tolist()]
+    data["content_hash"] = pd.Series(content_hashes, index=data.index, dtype="string[pyarrow]")
 
     return data
 
@@ -1,33 +1,197 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pyarrow as pa
+from huggingface_hub import snapshot_download
 from sentence_transformers import SentenceTransformer
 from pandas import DataFrame
+import pandas as pd
 
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
 if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
+COMMIT_HASH_PATTERN = re.compile(r"[0-9a-f]{40}")
+
 
 @transformer
 def transform(data: DataFrame, *args, **kwargs) -> DataFrame:
-    
+    """
+    Creates the embeddings of the question and answer pairs.
+
+    The embeddings are kept in a SQLite store (`embedding_store_path`) by the hash of the text, the model name and
+    the commit hash of the model. The `embeddings_model_revision` (a branch, a tag or a commit hash, "main" by default)
+    is resolved to the commit hash before the lookup, so a new commit of a branch does not reuse the embeddings of the
+    previous commit. Only the texts missed in the store are encoded, the model is not loaded when there are no misses.
+
+    The missed texts are sorted by their number of tokens, so every batch contains texts of similar length and
+    little padding. With at least `multi_process_min_texts` texts, the batches are encoded by a pool of
+    `process_count` processes (by default one per CPU core).
+
+    The returned vectors are normalized to unit length. They are stored in a fixed-size list Arrow column backed by
+    one contiguous float32 buffer, the deleted documents have null vectors.
+    """
     model_name = kwargs['embeddings_model_name']
-    model = SentenceTransformer(model_name)
-  
-    
+    model_revision = resolve_model_revision(model_name, kwargs.get('embeddings_model_revision', 'main'))
+    store_path = kwargs.get('embedding_store_path', 'mage_data/embedding_store.sqlite')
     batch_size = kwargs.get('batch_size', 100)
-    embeddings = []
+    process_count = int(kwargs.get('process_count') or os.cpu_count() or 1)
+    multi_process_min_texts = int(kwargs.get('multi_process_min_texts', 1000))
+
+    # The deleted documents are not embedded
+    is_indexed = data['operation'] != 'delete' if 'operation' in data.columns else pd.Series(True, index=data.index)
+    question_answer_pairs = (data.loc[is_indexed, "question"] + " " + data.loc[is_indexed, "answer"]).tolist()
+    keys = [create_key(model_name, model_revision, text) for text in question_answer_pairs]
+
+    store = EmbeddingStore(store_path)
+    try:
+        stored_vectors = store.get_many(keys)
+
+        # The first row of every text missed in the store, a repeated text is encoded once
+        missed_rows: Dict[str, int] = {}
+        for row, key in enumerate(keys):
+            if key not in stored_vectors:
+                missed_rows.setdefault(key, row)
+
+        found_count = sum(1 for key in keys if key in stored_vectors)
+        print(f"Embeddings: {found_count} found in the store, {len(missed_rows)} unique texts to encode")
+
+        encoded_vectors: Dict[str, np.ndarray] = {}
+        if missed_rows:
+            model = SentenceTransformer(model_name, revision=model_revision)
+            missed_keys = list(missed_rows.keys())
+            missed_texts = [question_answer_pairs[missed_rows[key]] for key in missed_keys]
 
-    for i in range(0, len(data), batch_size):
-        batch = data.iloc[i:i + batch_size]
-        question_answer_pairs = (batch["question"] + " " + batch["answer"]).tolist()
-        batch_vectors = model.encode(question_answer_pairs)
-        
-        # Append embeddings to the list
-        embeddings.extend(batch_vectors)
+            use_pool = process_count > 1 and len(missed_texts) >= multi_process_min_texts
+            missed_vectors = encode_texts(model, missed_texts, batch_size, process_count if use_pool else 1)
+            encoded_vectors.update(zip(missed_keys, missed_vectors))
 
-    data['vector_question_answer'] = embeddings
+            store.put_many(encoded_vectors)
+    finally:
+        store.close()
+
+    # One float32 matrix with a row per document holds all vectors, the Arrow column below wraps it without a copy
+    vectors = {**stored_vectors, **encoded_vectors}
+    if not vectors:
+        # All documents are deleted, there is no vector to store
+        data['vector_question_answer'] = None
+        return data
+
+    dimensions = len(next(iter(vectors.values())))
+    indexed_rows = np.flatnonzero(is_indexed.to_numpy(dtype=bool))
+    matrix = np.zeros((len(data), dimensions), dtype=np.float32)
+    for row, key in zip(indexed_rows, keys):
+        matrix[row] = vectors[key]
+
+    # Unit vectors are required by the `dot_product` similarity and rank the same with the `cosine` similarity
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    data['vector_question_answer'] = create_vector_array(matrix, ~is_indexed.to_numpy(dtype=bool))
     return data
-    
+
+
+def create_vector_array(matrix: np.ndarray, is_null: np.ndarray) -> pd.arrays.ArrowExtensionArray:
+    """ Wraps the rows of the float32 matrix into a fixed-size list array, the rows marked by `is_null` are nulls. """
+
+    values = pa.array(matrix.reshape(-1))
+    return pd.arrays.ArrowExtensionArray(pa.FixedSizeListArray.from_arrays(values, matrix.shape[1], mask=pa.array(is_null)))
+
+
+def encode_texts(model: SentenceTransformer, texts: List[str], batch_size: int, process_count: int) -> np.ndarray:
+    """
+    Encodes the texts bucketed by their number of tokens, optionally with a pool of processes.
+
+    Returns:
+        np.ndarray: A float32 matrix with one row per text in the order of the texts.
+    """
+    # The longest texts go first, so a memory issue shows up with the first batch
+    order = np.argsort(get_token_counts(model, texts), kind='stable')[::-1]
+    sorted_texts = [texts[idx] for idx in order]
+
+    if process_count > 1:
+        pool = model.start_multi_process_pool(target_devices=['cpu'] * process_count)
+        try:
+            # Every chunk is a run of sorted texts, i.e. a bucket of texts with similar lengths
+            chunk_size = max(batch_size, math.ceil(len(sorted_texts) / (process_count * 4)))
+            sorted_vectors = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size, chunk_size=chunk_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        sorted_vectors = model.encode(sorted_texts, batch_size=batch_size)
+
+    # Restore the order of the texts
+    vectors = np.empty((len(texts), sorted_vectors.shape[1]), dtype=np.float32)
+    vectors[order] = sorted_vectors
+    return vectors
+
+
+def get_token_counts(model: SentenceTransformer, texts: List[str]) -> List[int]:
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is None:
+        return [len(text) for text in texts]
+
+    # The model truncates the longer texts, so they are as expensive as the texts of the maximum length
+    input_ids = tokenizer(texts, add_special_tokens=False, truncation=True, max_length=model.max_seq_length)['input_ids']
+    return [len(ids) for ids in input_ids]
+
+
+def resolve_model_revision(model_name: str, revision: str) -> str:
+    """ Returns the commit hash of the revision of a model of the Hugging Face Hub, a local model keeps the revision as is. """
+
+    if COMMIT_HASH_PATTERN.fullmatch(revision) or os.path.isdir(model_name):
+        return revision
+
+    # A model name without an organization is a model of sentence-transformers
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+    # The snapshots of the Hugging Face cache are named by the commit hash, a cached model is resolved offline as well
+    return os.path.basename(snapshot_download(repo_id, revision=revision))
+
+
+def create_key(model_name: str, model_revision: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{model_revision}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingStore:
+    """ A content-addressed store of float32 embeddings in a SQLite database. """
+
+    # SQLite limits the number of the parameters of a query
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        unique_keys = list(dict.fromkeys(keys))
+        vectors: Dict[str, np.ndarray] = {}
+
+        for i in range(0, len(unique_keys), self.QUERY_BATCH_SIZE):
+            batch_keys = unique_keys[i:i + self.QUERY_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch_keys))
+            rows = self._connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch_keys)
+            vectors.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+
+        return vectors
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        rows: List[tuple] = [(key, np.ascontiguousarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+
+    def close(self) -> None:
+        self._connection.close()
 
 
 @test
@@ -35,4 +199,4 @@ def test_output(output, *args) -> None:
     """
     Template code for testing the output of the block.
     """
-    assert output is not None, 'The output is undefined'
\ No newline at end of file
+    assert output is not None, 'The output is undefined'
@@ -8,9 +8,13 @@ if 'test' not in globals():
 
 @transformer
 def transform(data: DataFrame, *args, **kwargs):
+    # The Arrow-backed strings are stored in contiguous buffers instead of one Python object per cell,
+    # and the string methods run in the Arrow compute kernels
+    for column in data.select_dtypes(include=['object', 'string']).columns:
+        data[column] = data[column].astype('string[pyarrow]')
+
     # There are data without a question
-    data['question'] = data['question'].fillna('')
-    data['question'] = data['question'].str.lower()
+    data['question'] = data['question'].fillna('').str.lower()
     data['answer'] = data['answer'].str.lower()
 
     return data
@@ -0,0 +1,73 @@
+from typing import Dict
+from pandas import DataFrame
+import pandas as pd
+
+from elasticsearch import Elasticsearch, helpers
+
+if 'transformer' not in globals():
+    from mage_ai.data_preparation.decorators import transformer
+if 'test' not in globals():
+    from mage_ai.data_preparation.decorators import test
+
+
+@transformer
+def transform(data: DataFrame, *args, **kwargs) -> DataFrame:
+    """
+    Compares the documents with the documents of the live index and keeps only the changes.
+
+    Every returned row has the column `operation`:
+        - "index": a new or changed document that is embedded and indexed;
+        - "delete": a document that is not in the sources anymore, only `document_id` is set.
+
+    The unchanged documents are dropped, so they are neither embedded nor indexed again.
+    Without the `incremental` variable, or when the alias of the index does not exist yet, all documents are returned for a full rebuild.
+    """
+    data['operation'] = 'index'
+
+    if not is_enabled(kwargs.get('incremental', False)):
+        return data
+
+    connection_string = kwargs.get('connection_string', 'http://elasticsearch:9200')
+    index_name = kwargs.get('index_name', 'documents')
+
+    es_client = Elasticsearch(connection_string, timeout=60)
+    # The exporter updates only a versioned index behind the alias, an index without the alias is rebuilt
+    if not es_client.indices.exists_alias(name=index_name):
+        print(f"The alias '{index_name}' does not exist, all {len(data)} documents are indexed")
+        return data
+
+    indexed_hashes = get_indexed_content_hashes(es_client, index_name)
+
+    # A new document has no indexed hash, the comparison with the missing value is NA for the Arrow-backed strings
+    is_changed = data['content_hash'].ne(data['document_id'].map(indexed_hashes)).fillna(True).astype(bool)
+    changed_data = data[is_changed]
+
+    deleted_ids = indexed_hashes.keys() - set(data['document_id'])
+    deleted_data = DataFrame({'document_id': sorted(deleted_ids), 'operation': 'delete'})
+
+    print(f"Documents: {len(changed_data)} new or changed, {len(deleted_data)} deleted, {len(data) - len(changed_data)} unchanged")
+
+    return pd.concat([changed_data, deleted_data], axis=0, ignore_index=True)
+
+
+def is_enabled(value: object) -> bool:
+    """ Parses a flag variable, the variables of a triggered run can be strings such as "false" or "0". """
+    return str(value).strip().lower() in ("true", "1", "yes", "y")
+
+
+def get_indexed_content_hashes(es_client: Elasticsearch, index_name: str) -> Dict[str, str | None]:
+    """ Returns the content hashes of the indexed documents by the document ids. """
+
+    hits = helpers.scan(es_client, index=index_name, query={'query': {'match_all': {}}, '_source': ['content_hash']})
+
+    # The documents indexed before the content hashes were introduced have no hash, they are indexed again
+    return {hit['_id']: hit.get('_source', {}).get('content_hash') for hit in hits}
+
+
+@test
+def test_output(output, *args) -> None:
+    """
+    Template code for testing the output of the block.
+    """
+    assert output is not None, 'The output is undefined'
+    assert output['operation'].isin(['index', 'delete']).all(), 'Unknown operation'
@@ -0,0 +1,254 @@
+"""
+Replays a corpus of emails through `EmailHandler.handle` to measure the solution under a realistic mail volume.
+
+The emails are either the export of the notebook `notebook/evaluate_prototype/get_emails.ipynb` (a CSV file with the
+columns `email_from`, `subject` and `question_without_history`) or synthetic emails about the known projects.
+The emails are sent by a pool of workers:
+    - with `--rate 0` (default), every worker sends the next email as soon as its previous email is answered (closed loop);
+    - with `--rate R`, the emails arrive as a Poisson process with R emails per second regardless of the answers (open loop).
+      The latency of an email is measured from its arrival, so the time spent waiting for a free worker is included.
+
+The report contains the throughput, the error rate, the percentiles of the latency and of every processing stage
+(see `EmailHandler`), and the CPU time and the peak memory of the process. The answers are stored in the database
+configured in `.env.dev` like the answers of the email client.
+
+Usage (from the directory `smart_mail`):
+    export $(grep -v '^#' .env.dev | xargs)
+    PYTHONPATH=src python benchmarks/mailbox_replay_benchmark.py --emails _cleaned_emails.csv --concurrency 4 --rate 2
+    PYTHONPATH=src python benchmarks/mailbox_replay_benchmark.py --synthetic 200 --concurrency 8 --output replay.json
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import random
+import resource
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from common.emails import get_legitimate_emails
+from common.service_container import get_service_container
+from data_loaders.projects_loader import ProjectsLoader
+from dtos.email_message import EmailMessage
+from handler.email_handler import EmailHandler
+from services.tracing.span_exporter import SpanExporter
+
+
+SYNTHETIC_QUESTIONS = [
+    "Wann erfolgt die nächste Zinszahlung für das Projekt {project}?",
+    "Ich habe in {project} investiert. Wann wird das Darlehen zurückgezahlt?",
+    "Warum ist die Zahlung für {project} im Verzug?",
+    "Wie erhalte ich eine Steuerbescheinigung für meine Investition?",
+    "Wie kann ich meine Bankverbindung ändern?",
+    "Kann ich meine Investition in {project} vorzeitig kündigen?",
+]
+
+
+@dataclass
+class RequestRecord:
+    """ The timings of a replayed email, in seconds. """
+
+    queue_time: float
+    service_time: float
+    latency: float
+    error: str | None
+
+
+class RecordingSpanExporter(SpanExporter):
+    """ Keeps the durations of all spans per stage for the report and passes them on to the optional exporter. """
+
+    def __init__(self, exporter: SpanExporter | None = None) -> None:
+        self._exporter = exporter
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+
+    def export(self, name: str, duration_seconds: float) -> None:
+        with self._lock:
+            self._durations[name].append(duration_seconds)
+
+        if self._exporter is not None:
+            self._exporter.export(name, duration_seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._durations.clear()
+
+    def get_durations(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {name: list(durations) for name, durations in self._durations.items()}
+
+
+def load_emails(path: str, body_column: str) -> List[EmailMessage]:
+    with open(path, encoding="utf-8") as file:
+        reader = csv.DictReader(file, delimiter=";")
+        return [EmailMessage(row["email_from"], row["subject"] or "", row[body_column] or "") for row in reader]
+
+
+def create_synthetic_emails(number_of_emails: int, rng: random.Random) -> List[EmailMessage]:
+    projects = ProjectsLoader.get_projects()
+    senders = get_legitimate_emails()
+    emails: List[EmailMessage] = []
+
+    for idx in range(number_of_emails):
+        project = rng.choice(projects)
+        body = rng.choice(SYNTHETIC_QUESTIONS).format(project=project.name)
+        emails.append(EmailMessage(rng.choice(senders), f"Frage {idx} zu {project.name}", body))
+
+    return emails
+
+
+def handle_email(email_handler: EmailHandler, email: EmailMessage, arrival_time: float) -> RequestRecord:
+    start_time = time.perf_counter()
+    error: str | None = None
+
+    try:
+        email_handler.handle(email.email_from, email.subject, email.body)
+    except Exception as ex:
+        logging.getLogger(__name__).warning("Failed to handle the email '%s': %s", email.subject, ex)
+        error = type(ex).__name__
+
+    end_time = time.perf_counter()
+    return RequestRecord(start_time - arrival_time, end_time - start_time, end_time - arrival_time, error)
+
+
+def replay(email_handler: EmailHandler, emails: List[EmailMessage], concurrency: int, rate: float, rng: random.Random) -> List[RequestRecord]:
+    """ Sends the emails to the handler, see the module docstring for the closed and the open loop. """
+
+    futures: List[Future[RequestRecord]] = []
+    # In the closed loop, an email is sent only if a worker is free
+    free_workers = threading.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as executor:
+        arrival_time = time.perf_counter()
+
+        for email in emails:
+            if rate > 0:
+                arrival_time += rng.expovariate(rate)
+                time.sleep(max(0.0, arrival_time - time.perf_counter()))
+            else:
+                free_workers.acquire()
+                arrival_time = time.perf_counter()
+
+            future = executor.submit(handle_email, email_handler, email, arrival_time)
+            if rate <= 0:
+                future.add_done_callback(lambda _: free_workers.release())
+            futures.append(future)
+
+    return [future.result() for future in futures]
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """ Returns the statistics of the durations in milliseconds. """
+
+    durations_ms = [duration * 1000 for duration in durations]
+    if len(durations_ms) == 1:
+        durations_ms = durations_ms * 2
+
+    percentiles = statistics.quantiles(durations_ms, n=100, method="inclusive")
+
+    return {
+        "mean": statistics.mean(durations_ms),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "max": max(durations_ms),
+    }
+
+
+def create_report(records: List[RequestRecord], stage_durations: Dict[str, List[float]], elapsed_time: float,
+                  start_usage: resource.struct_rusage, end_usage: resource.struct_rusage) -> Dict[str, Any]:
+    succeeded_records = [record for record in records if record.error is None]
+    cpu_time = (end_usage.ru_utime - start_usage.ru_utime) + (end_usage.ru_stime - start_usage.ru_stime)
+
+    report: Dict[str, Any] = {
+        "emails": len(records),
+        "errors": len(records) - len(succeeded_records),
+        "error_rate": (len(records) - len(succeeded_records)) / len(records) if records else 0.0,
+        "errors_by_type": dict(Counter(record.error for record in records if record.error is not None)),
+        "elapsed_seconds": elapsed_time,
+        "throughput_per_second": len(succeeded_records) / elapsed_time if elapsed_time > 0 else 0.0,
+        "latency_ms": summarize([record.latency for record in succeeded_records]) if succeeded_records else {},
+        "queue_time_ms": summarize([record.queue_time for record in succeeded_records]) if succeeded_records else {},
+        "stage_durations_ms": {name: summarize(durations) for name, durations in sorted(stage_durations.items())},
+        "resource_usage": {
+            "cpu_seconds": cpu_time,
+            # The share of one CPU core used by the process during the replay
+            "cpu_utilization": cpu_time / elapsed_time if elapsed_time > 0 else 0.0,
+            # Linux reports the peak resident set size in kilobytes
+            "max_rss_mb": end_usage.ru_maxrss / 1024,
+        },
+    }
+
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['emails']} emails in {report['elapsed_seconds']:.1f} s, throughput {report['throughput_per_second']:.2f} emails/s")
+    print(f"errors: {report['errors']} ({report['error_rate']:.1%}) {report['errors_by_type'] or ''}")
+
+    resource_usage = report["resource_usage"]
+    print(f"cpu: {resource_usage['cpu_seconds']:.1f} s ({resource_usage['cpu_utilization']:.0%} of one core), peak memory: {resource_usage['max_rss_mb']:.0f} MB")
+
+    rows = [("latency", report["latency_ms"]), ("queue time", report["queue_time_ms"])] + list(report["stage_durations_ms"].items())
+    print(f"{'stage':>22} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}  (ms)")
+    for name, summary in rows:
+        if summary:
+            print(f"{name:>22} " + " ".join(f"{summary[key]:>10.1f}" for key in ["mean", "p50", "p95", "p99", "max"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a corpus of emails through the email handler.")
+    parser.add_argument("--emails", help="A CSV file exported by the notebook get_emails.ipynb.")
+    parser.add_argument("--body-column", default="question_without_history", help="The column of the CSV file with the email body.")
+    parser.add_argument("--synthetic", type=int, default=100, help="The number of synthetic emails if no CSV file is set.")
+    parser.add_argument("--limit", type=int, help="The number of emails to send, the corpus is repeated if it is smaller.")
+    parser.add_argument("--concurrency", type=int, default=4, help="The number of workers handling the emails.")
+    parser.add_argument("--rate", type=float, default=0.0, help="The arrival rate in emails per second, 0 sends the emails as fast as the workers handle them.")
+    parser.add_argument("--warmup", type=int, default=3, help="The number of emails handled before the measurement.")
+    parser.add_argument("--seed", type=int, default=42, help="The seed of the synthetic emails and the arrival times.")
+    parser.add_argument("--output", help="A JSON file to write the report to.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(args.seed)
+
+    emails = load_emails(args.emails, args.body_column) if args.emails else create_synthetic_emails(args.synthetic, rng)
+    if args.limit is not None:
+        emails = list(itertools.islice(itertools.cycle(emails), args.limit))
+
+    # The handler of the email client, its spans are recorded for the report before they are passed on
+    container = get_service_container()
+    span_exporter = RecordingSpanExporter(container.span_exporter)
+    container.override("span_exporter", span_exporter)
+    email_handler = container.email_handler
+
+    # Load the models and open the connections before the measurement
+    for email in emails[:args.warmup]:
+        handle_email(email_handler, email, time.perf_counter())
+    span_exporter.reset()
+
+    print(f"Replaying {len(emails)} emails with {args.concurrency} workers" + (f" at {args.rate} emails/s" if args.rate > 0 else ""))
+
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    start_time = time.perf_counter()
+    records = replay(email_handler, emails, args.concurrency, args.rate, rng)
+    elapsed_time = time.perf_counter() - start_time
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    report = create_report(records, span_exporter.get_durations(), elapsed_time, start_usage, end_usage)
+    report["settings"] = {"concurrency": args.concurrency, "rate": args.rate, "source": args.emails or "synthetic"}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
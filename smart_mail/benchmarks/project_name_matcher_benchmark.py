@@ -0,0 +1,83 @@
+"""
+Compares the exact project name matching with `name in query` for every project against the Aho-Corasick automaton
+used by `ProjectIdentifierService.get_matched_projects`. The benchmark uses synthetic project names and long forwarded
+email threads and does not require any external services.
+
+Usage (from the directory `smart_mail`):
+    PYTHONPATH=src python benchmarks/project_name_matcher_benchmark.py --projects 5000 --emails 200
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Set
+
+from services.content.aho_corasick_automaton import AhoCorasickAutomaton
+from services.content.text_preprocessor_service import TextPreprocessorService
+
+
+WORDS = ["stadthaus", "mozart", "zukunftspark", "oberfranken", "nordbayern", "wohnquartier", "pasing", "berliner", "flair",
+         "friedrichshain", "office", "europaring", "altbau", "sendlinger", "tor", "solarpark", "living", "the", "five", "park"]
+SUFFIXES = ["", " ii", " iii", " iv", " v", " vi"]
+EMAIL_WORDS = ["wann", "erfolgt", "die", "auszahlung", "zinsen", "projekt", "vielen", "dank", "gruss", "von", "gesendet",
+               "betreff", "anlage", "frage", "rückzahlung", "termin", "kunde", "vertrag"]
+
+
+def create_project_names(number_of_projects: int, rng: random.Random) -> List[str]:
+    names = {" ".join(rng.sample(WORDS, rng.randint(2, 4))) + rng.choice(SUFFIXES) for _ in range(number_of_projects * 2)}
+    return sorted(names, key=len, reverse=True)[:number_of_projects]
+
+
+def create_email_thread(project_names: List[str], number_of_messages: int, rng: random.Random) -> str:
+    messages: List[str] = []
+
+    for _ in range(number_of_messages):
+        body = " ".join(rng.choice(EMAIL_WORDS) for _ in range(rng.randint(50, 150)))
+        messages.append(f"-----Original Message-----\nBetreff: {rng.choice(project_names)}\n{body}")
+
+    return TextPreprocessorService.preprocess_text("\n".join(messages))
+
+
+def measure(find: Callable[[str], Set[int]], emails: List[str]) -> List[float]:
+    elapsed_times_ms: List[float] = []
+
+    for email in emails:
+        start_time = time.perf_counter()
+        find(email)
+        elapsed_times_ms.append((time.perf_counter() - start_time) * 1000)
+
+    return elapsed_times_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the exact project name matching.")
+    parser.add_argument("--projects", type=int, default=5000, help="The number of synthetic project names.")
+    parser.add_argument("--emails", type=int, default=200, help="The number of synthetic email threads.")
+    parser.add_argument("--messages", type=int, default=10, help="The number of forwarded messages per email thread.")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    project_names = create_project_names(args.projects, rng)
+    emails = [create_email_thread(project_names, args.messages, rng) for _ in range(args.emails)]
+
+    start_time = time.perf_counter()
+    automaton = AhoCorasickAutomaton(project_names)
+    build_time_ms = (time.perf_counter() - start_time) * 1000
+
+    def find_with_substring_search(email: str) -> Set[int]:
+        return {idx for idx, name in enumerate(project_names) if name in email}
+
+    for email in emails[:10]:
+        assert automaton.find_all(email) == find_with_substring_search(email)
+
+    average_length = statistics.mean(len(email) for email in emails)
+    print(f"{len(project_names)} project names, {len(emails)} emails, {average_length:.0f} characters per email")
+    print(f"automaton build time: {build_time_ms:.1f} ms")
+
+    for name, find in [("substring search", find_with_substring_search), ("aho-corasick", automaton.find_all)]:
+        elapsed_times_ms = measure(find, emails)
+        print(f"{name:>16}: mean={statistics.mean(elapsed_times_ms):.2f} ms, max={max(elapsed_times_ms):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares the latency of the two-call retrieval path (`RetrievalService`) with the single-round-trip
+`_msearch` path (`MultiSearchRetrievalService`) against the Elasticsearch instance configured in `.env.dev`.
+Both paths are measured with and without the two-phase retrieval, every measurement includes the rank fusion
+and the loading of the documents used in the prompt.
+
+Usage (from the directory `smart_mail`):
+    export $(grep -v '^#' .env.dev | xargs)
+    PYTHONPATH=src python benchmarks/retrieval_benchmark.py --repetitions 3
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from common.client_factory import ClientFactory
+from common.sentence_transformer_model_factory import SentenceTransformerModelFactory
+from common.settings import Settings
+from services.multi_search_retrieval_service import MultiSearchRetrievalService
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_service import RetrievalService
+
+
+DEFAULT_QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "notebook", "retrieval_evaluation", "ground_truth.csv")
+
+
+def load_questions(path: str, limit: int) -> List[str]:
+    with open(path, encoding="utf-8") as file:
+        reader = csv.DictReader(file, delimiter=";")
+        return [row["question"] for row in reader][:limit]
+
+
+def measure(service: RetrievalService, questions: List[str], repetitions: int) -> List[float]:
+    elapsed_times_ms: List[float] = []
+    reciprocal_rank_fusion_service = ReciprocalRankFusionService()
+
+    for _ in range(repetitions):
+        for question in questions:
+            start_time = time.perf_counter()
+            reranked_search_results = reciprocal_rank_fusion_service.rerank(service.search(question), 10)
+            service.fetch_documents(reranked_search_results)
+            elapsed_times_ms.append((time.perf_counter() - start_time) * 1000)
+
+    return elapsed_times_ms
+
+
+def summarize(elapsed_times_ms: List[float]) -> Dict[str, float]:
+    percentiles = statistics.quantiles(elapsed_times_ms, n=100)
+
+    return {
+        "mean": statistics.mean(elapsed_times_ms),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the two-call retrieval against the _msearch retrieval.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH, help="A CSV file with the column 'question'.")
+    parser.add_argument("--limit", type=int, default=100, help="The number of questions to use.")
+    parser.add_argument("--repetitions", type=int, default=3, help="How many times every question is searched.")
+    args = parser.parse_args()
+
+    settings = Settings()
+    es_client = ClientFactory(settings).create_elasticsearch_client()
+    embedding_provider = SentenceTransformerModelFactory(settings).create_embedding_provider()
+    questions = load_questions(args.questions, args.limit)
+
+    services: Dict[str, RetrievalService] = {
+        "two calls": RetrievalService(es_client, embedding_provider, settings),
+        "msearch": MultiSearchRetrievalService(es_client, embedding_provider, settings),
+        "two calls, two-phase": RetrievalService(es_client, embedding_provider, settings, two_phase=True),
+        "msearch, two-phase": MultiSearchRetrievalService(es_client, embedding_provider, settings, two_phase=True),
+    }
+
+    # Warm up the model, the connection pool and the Elasticsearch caches.
+    for service in services.values():
+        measure(service, questions[:10], 1)
+
+    print(f"{len(questions)} questions x {args.repetitions} repetitions")
+    for name, service in services.items():
+        summary = summarize(measure(service, questions, args.repetitions))
+        print(f"{name:>20}: " + ", ".join(f"{key}={value:.1f} ms" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
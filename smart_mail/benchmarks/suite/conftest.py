@@ -0,0 +1,218 @@
+"""
+Deterministic in-process stand-ins for the benchmark suite of the application.
+
+The suite measures the code of the application, not the external systems: Elasticsearch, the embedding model,
+the LLM (Bedrock or Ollama) and Postgres are replaced by the fakes below. The fakes return the same results for the
+same input, so two runs of the suite on the same machine are comparable.
+
+Usage (from the directory `smart_mail/src`):
+    # Run the suite and compare the results with the tracked baseline, fail on a regression of the median by more than 25 %
+    python -m pytest ../benchmarks/suite --benchmark-storage=file://../benchmarks/suite/baselines \
+        --benchmark-compare --benchmark-compare-fail=median:25%
+
+    # Save a new baseline, e.g. after an intended change of the hot path
+    python -m pytest ../benchmarks/suite --benchmark-storage=file://../benchmarks/suite/baselines --benchmark-save=baseline
+
+The baselines are stored per machine type (e.g. `Linux-CPython-3.11-64bit`), the timings are comparable only on the
+machine that saved them. A build agent saves its own baseline before the comparison is used as a gate. The profile of the
+machine and the commit of a tracked baseline are described in `MACHINE.md` next to it, update it with the baseline.
+"""
+import random
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pytest
+import torch
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.pool import StaticPool
+
+from common.model_base import ModelBase
+from data_loaders.projects_loader import ProjectsLoader
+from services.content.content_data_preparer import ContentDataPreparer
+# The models are registered in the metadata by their imports
+from services.database.answer_model import AnswerModel  # noqa: F401
+from services.generation.generation_result import GenerationResult
+from services.generation.generation_service import GenerationService
+
+
+NUMBER_OF_DOCUMENTS = 2000
+EMBEDDING_DIMENSION = 384
+
+WORDS = [
+    "Auszahlung", "Zinsen", "Projekt", "Rückzahlung", "Laufzeit", "Konto", "Steuer", "Bescheinigung", "Investition",
+    "Verzug", "Tilgung", "Vertrag", "Kündigung", "Nachrangdarlehen", "Wallet", "Identifizierung", "Adresse", "Bank",
+]
+
+
+def create_text(rng: random.Random, number_of_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(number_of_words))
+
+
+def create_documents(number_of_documents: int = NUMBER_OF_DOCUMENTS) -> List[Dict[str, Any]]:
+    """ Creates the knowledge base, every fifth document belongs to a project and every tenth one is protected. """
+
+    rng = random.Random(42)
+    projects = ProjectsLoader.get_projects()
+    documents: List[Dict[str, Any]] = []
+
+    for idx in range(number_of_documents):
+        document: Dict[str, Any] = {
+            "document_id": f"doc{idx}",
+            "category": rng.choice(["Auszahlungen", "Steuern", "Konto", "Projekte"]),
+            "question": create_text(rng, 12),
+            "answer": create_text(rng, 80),
+            "answer_instructions": create_text(rng, 10) if idx % 7 == 0 else None,
+        }
+
+        if idx % 5 == 0:
+            project = projects[idx % len(projects)]
+            document["project_id"] = str(project.id).upper()
+            document["project_name"] = project.name
+
+        if idx % 10 == 0:
+            document["authorization_id"] = document["project_id"]
+
+        documents.append(document)
+
+    return documents
+
+
+class FakeElasticsearch:
+    """
+    Answers the searches from an in-memory knowledge base.
+
+    The hits of a search are a window of the documents that starts at the position derived from the query, so the same
+    query always returns the same hits and different queries return different, partly overlapping hits.
+    """
+
+    def __init__(self, documents: Sequence[Dict[str, Any]]) -> None:
+        self._documents = list(documents)
+        self._documents_by_id = {document["document_id"]: document for document in documents}
+
+    def search(self, index: str, body: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+        return self._create_response(body)
+
+    def msearch(self, body: List[Dict[str, Any]], **params: Any) -> Dict[str, Any]:
+        return {"responses": [{**self._create_response(search_body), "status": 200} for search_body in body[1::2]]}
+
+    def mget(self, index: str, ids: List[str], source: List[str], **params: Any) -> Dict[str, Any]:
+        docs = [
+            {"_id": document_id, "found": True, "_source": self._select_fields(self._documents_by_id[document_id], source)}
+            for document_id in ids if document_id in self._documents_by_id
+        ]
+        return {"docs": docs}
+
+    def _create_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if "knn" in body:
+            size = body["knn"]["k"]
+            # The text search uses another window than the kNN search, so the rank fusion merges partly overlapping lists
+            start = int(zlib.crc32(np.asarray(body["knn"]["query_vector"], dtype=np.float32).tobytes()))
+        else:
+            size = body["size"]
+            start = zlib.crc32(body["query"]["bool"]["must"]["multi_match"]["query"].encode("utf-8"))
+
+        hits = [
+            {
+                "_score": 1.0 / (rank + 1),
+                "_source": self._select_fields(self._documents[(start + rank * 3) % len(self._documents)], body["_source"])
+            }
+            for rank in range(size)
+        ]
+        return {"hits": {"hits": hits}}
+
+    @staticmethod
+    def _select_fields(document: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+        return {field: document[field] for field in fields if document.get(field) is not None}
+
+
+class HashEmbeddingProvider:
+    """ Replaces `EmbeddingProvider`, the embedding of a text is a random vector seeded by the hash of the text. """
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION) -> None:
+        self.model_name = "hash-embedding"
+        self._dimension = dimension
+
+    def encode(self, texts: str | List[str]) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._create_embedding(texts)
+
+        return np.stack([self._create_embedding(text) for text in texts])
+
+    def encode_pooled(self, texts: Sequence[str]) -> torch.Tensor:
+        return self.encode_with_pooled(texts)[1]
+
+    def encode_with_pooled(self, texts: Sequence[str]) -> Tuple[np.ndarray, torch.Tensor]:
+        if len(texts) == 0:
+            return np.empty((0, 0), dtype=np.float32), torch.empty((0, 0))
+
+        embeddings = np.stack([self._create_embedding(text) for text in texts])
+        return embeddings, torch.from_numpy(embeddings.copy())
+
+    def _create_embedding(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal(self._dimension, dtype=np.float32)
+
+
+class FakeGenerationService(GenerationService):
+    """ Replaces the LLM, the answer is a fixed text and the token counts are the numbers of the words. """
+
+    OUTPUT_TEXT = "<p>Die Auszahlung erfolgt zum Ende des Quartals.</p>"
+
+    def get_answer(self, prompt: str) -> GenerationResult:
+        return GenerationResult(
+            input_text_token_count=len(prompt.split()),
+            token_count=len(self.OUTPUT_TEXT.split()),
+            completion_reason="stop",
+            output_text=self.OUTPUT_TEXT,
+            text_generation_config={"temperature": 0.0, "max_tokens": 1024}
+        )
+
+
+class SqliteDatabaseManager:
+    """ Replaces `DatabaseManager` with an in-memory SQLite database with the tables of the application. """
+
+    def __init__(self) -> None:
+        # A single connection keeps the in-memory database alive for all sessions
+        self._engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        ModelBase.metadata.create_all(bind=self._engine)
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+
+@pytest.fixture(scope="session")
+def documents() -> List[Dict[str, Any]]:
+    return create_documents()
+
+
+@pytest.fixture(scope="session")
+def fake_elasticsearch(documents: List[Dict[str, Any]]) -> FakeElasticsearch:
+    return FakeElasticsearch(documents)
+
+
+@pytest.fixture(scope="session")
+def embedding_provider() -> HashEmbeddingProvider:
+    return HashEmbeddingProvider()
+
+
+@pytest.fixture(scope="session")
+def settings() -> Any:
+    return SimpleNamespace(index_name="documents", source_system="evdi")
+
+
+@pytest.fixture
+def database_manager() -> SqliteDatabaseManager:
+    return SqliteDatabaseManager()
+
+
+@pytest.fixture(scope="session")
+def generation_service() -> FakeGenerationService:
+    return FakeGenerationService()
+
+
+@pytest.fixture(scope="session")
+def content_data_preparer(embedding_provider: HashEmbeddingProvider) -> ContentDataPreparer:
+    return ContentDataPreparer(embedding_provider)  # type: ignore
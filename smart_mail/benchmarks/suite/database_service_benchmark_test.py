@@ -0,0 +1,41 @@
+from typing import Any, Dict, List
+
+from services.database.database_service import DatabaseService
+
+
+def create_answer_model(idx: int) -> Dict[str, Any]:
+    return {
+        "email_id": f"email-{idx}",
+        "sender_email": "customer_with_project2@gmail.com",
+        "email_subject": "Auszahlung",
+        "email_body": "Wann erfolgt die nächste Zahlung?",
+        "llm_prompt": "prompt " * 500,
+        "input_text_token_count": 500,
+        "token_count": 50,
+        "llm_completion_reason": "stop",
+        "llm_response": "<p>Die Auszahlung erfolgt zum Ende des Quartals.</p>",
+        "llm_text_generation_config": {"temperature": 0.0},
+        "llm_response_time_ms": 1200,
+        "processing_status": "processed",
+        "total_processing_time_ms": 1500,
+        "request_metadata": {"stage_durations_ms": {"generation": 1200.0, "knn_search": 12.5}},
+        "error_message": None,
+        "source_system": "evdi"
+    }
+
+
+def test_create_answer(benchmark: Any, database_manager: Any):
+    database_service = DatabaseService(database_manager)
+
+    created_entity = benchmark(database_service.create_answer, create_answer_model(0))
+
+    assert created_entity.id is not None
+
+
+def test_create_answers(benchmark: Any, database_manager: Any):
+    database_service = DatabaseService(database_manager)
+    answer_models: List[Dict[str, Any]] = [create_answer_model(idx) for idx in range(16)]
+
+    created_entities = benchmark(database_service.create_answers, answer_models)
+
+    assert all(created_entity.id is not None for created_entity in created_entities)
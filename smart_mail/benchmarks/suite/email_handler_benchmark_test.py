@@ -0,0 +1,44 @@
+from typing import Any
+
+import pytest
+
+from common.emails import get_email_with_investments_in_project2
+from dtos.email_message import EmailMessage
+from handler.email_handler import EmailHandler
+from services.database.database_service import DatabaseService
+from services.generation.prompt_creator import PromptCreator
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_service import RetrievalService
+
+
+SUBJECT = "Auszahlung The Five"
+BODY = "Wann erfolgt die nächste Zahlung der Zinsen?"
+
+
+@pytest.fixture
+def email_handler(fake_elasticsearch: Any, embedding_provider: Any, settings: Any, generation_service: Any,
+                  database_manager: Any, content_data_preparer: Any) -> EmailHandler:
+    return EmailHandler(
+        RetrievalService(fake_elasticsearch, embedding_provider, settings, two_phase=True),  # type: ignore
+        PromptCreator(),
+        generation_service,
+        DatabaseService(database_manager),
+        ReciprocalRankFusionService(),
+        content_data_preparer,
+        embedding_provider,
+        settings
+    )
+
+
+def test_handle(benchmark: Any, email_handler: EmailHandler, generation_service: Any):
+    output_text = benchmark(email_handler.handle, get_email_with_investments_in_project2(), SUBJECT, BODY)
+
+    assert output_text == generation_service.OUTPUT_TEXT
+
+
+def test_handle_batch(benchmark: Any, email_handler: EmailHandler):
+    emails = [EmailMessage(get_email_with_investments_in_project2(), f"{SUBJECT} {idx}", BODY) for idx in range(16)]
+
+    output_texts = benchmark(email_handler.handle_batch, emails)
+
+    assert len(output_texts) == 16
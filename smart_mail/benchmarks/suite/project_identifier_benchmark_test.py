@@ -0,0 +1,36 @@
+from typing import Any
+
+from data_loaders.projects_loader import ProjectsLoader
+from services.content.project_identifier_service import ProjectIdentifierService
+
+
+EXACT_MATCH_QUERY = "Re: Fwd: Wann erfolgt die Auszahlung im Projekt Berliner Flair in Friedrichshain II?"
+FUZZY_MATCH_QUERY = "Wann erfolgt die Auszahlung im Projekt Zukunftspark in Franken?"
+
+
+def create_service(embedding_provider: Any) -> ProjectIdentifierService:
+    return ProjectIdentifierService(ProjectsLoader.get_projects(), embedding_provider)
+
+
+def test_extract_project_by_name(benchmark: Any, embedding_provider: Any):
+    service = create_service(embedding_provider)
+
+    identified_project = benchmark(service.extract_project, EXACT_MATCH_QUERY)
+
+    assert identified_project is not None
+    assert identified_project.name == "Berliner Flair in Friedrichshain II"
+
+
+def test_extract_project_by_embeddings(benchmark: Any, embedding_provider: Any):
+    service = create_service(embedding_provider)
+
+    benchmark(service.extract_project, FUZZY_MATCH_QUERY)
+
+
+def test_extract_projects(benchmark: Any, embedding_provider: Any):
+    service = create_service(embedding_provider)
+    queries = [EXACT_MATCH_QUERY, FUZZY_MATCH_QUERY] * 8
+
+    identified_projects = benchmark(service.extract_projects, queries)
+
+    assert len(identified_projects) == 16
@@ -0,0 +1,17 @@
+from typing import Any, Dict, List
+
+from common.emails import get_email_with_investments_in_project2
+from data_loaders.repayment_schedule_loader import RepaymentScheduleLoader
+from services.generation.prompt_creator import PromptCreator
+from services.search_result import SearchResult
+
+
+def test_create(benchmark: Any, documents: List[Dict[str, Any]]):
+    prompt_creator = PromptCreator()
+    search_results = [SearchResult.create(1.0 / (rank + 1), document) for rank, document in enumerate(documents[:10])]
+    repayment_schedule = RepaymentScheduleLoader.get_repayment_schedule(get_email_with_investments_in_project2(), "0113C948-C9CE-4A3D-AF99-D66BDEDE7D33")
+
+    prompt = benchmark(prompt_creator.create, "Wann erfolgt die nächste Zahlung?", search_results, repayment_schedule)
+
+    assert len(repayment_schedule) > 0
+    assert "Wann erfolgt die nächste Zahlung?" in prompt
@@ -0,0 +1,29 @@
+from typing import Any, List
+
+import pytest
+
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_result import RetrievalResult
+from services.search_result import SearchResult
+
+
+def create_search_results(number_of_results: int, step: int) -> List[SearchResult]:
+    return [
+        SearchResult(1.0 / (rank + 1), "category", "question", "answer", f"doc{rank * step}", None, None, None, None)
+        for rank in range(number_of_results)
+    ]
+
+
+@pytest.mark.parametrize("number_of_results", [10, 1000])
+def test_rerank(benchmark: Any, number_of_results: int):
+    service = ReciprocalRankFusionService()
+    # Every second document of the text search is found by the kNN search too
+    retrieval_result = RetrievalResult(
+        text_result_items=create_search_results(number_of_results, 1),
+        vector_result_items=create_search_results(number_of_results, 2)
+    )
+
+    search_results = benchmark(service.rerank, retrieval_result, 10)
+
+    assert len(search_results) == 10
+    assert search_results[0].document_id == "doc0"
@@ -0,0 +1,46 @@
+from typing import Any, List
+
+import pytest
+
+from dtos.retrieval_request import RetrievalRequest
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_service import RetrievalService
+
+
+QUESTION = "Wann erfolgt die Auszahlung der Zinsen für das Projekt The Five?"
+AUTHORIZATION_IDS = ["0113C948-C9CE-4A3D-AF99-D66BDEDE7D33", "D1F21F84-9EEC-4D0B-A63A-BF656A28A256"]
+
+
+def create_requests(number_of_requests: int) -> List[RetrievalRequest]:
+    return [
+        RetrievalRequest(question=f"{QUESTION} Frage {idx}", customer_project_id=AUTHORIZATION_IDS[0], authorization_ids=AUTHORIZATION_IDS)
+        for idx in range(number_of_requests)
+    ]
+
+
+@pytest.mark.parametrize("two_phase", [False, True], ids=["single_phase", "two_phase"])
+def test_search(benchmark: Any, fake_elasticsearch: Any, embedding_provider: Any, settings: Any, two_phase: bool):
+    service = RetrievalService(fake_elasticsearch, embedding_provider, settings, two_phase=two_phase)  # type: ignore
+    reciprocal_rank_fusion_service = ReciprocalRankFusionService()
+
+    def search():
+        retrieval_result = service.search(QUESTION, customer_project_id=AUTHORIZATION_IDS[0], authorization_ids=AUTHORIZATION_IDS)  # type: ignore
+        return service.fetch_documents(reciprocal_rank_fusion_service.rerank(retrieval_result, 10))
+
+    search_results = benchmark(search)
+
+    assert len(search_results) == 10
+    assert all(search_result.answer != "" for search_result in search_results)
+
+
+def test_search_batch(benchmark: Any, fake_elasticsearch: Any, embedding_provider: Any, settings: Any):
+    service = RetrievalService(fake_elasticsearch, embedding_provider, settings, two_phase=True)  # type: ignore
+    requests = create_requests(16)
+
+    def search_batch():
+        retrieval_results = service.search_batch(requests)
+        return service.fetch_documents_batch([retrieval_result.vector_result_items for retrieval_result in retrieval_results])
+
+    search_results_lists = benchmark(search_batch)
+
+    assert len(search_results_lists) == 16
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from elasticsearch import Elasticsearch
+from common.settings import Settings
+from services.document_cache import DocumentCache
+from services.embedding_provider import EmbeddingProvider
+from services.knn_candidate_policy import FilterSelectivityEstimator, KnnCandidatePolicy
+from services.multi_search_retrieval_service import MultiSearchRetrievalService
+from services.retrieval_service import RetrievalService
+
+
+class RetrievalServiceFactory:
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+
+    def create_service(self, es_client: Elasticsearch, embedding_provider: EmbeddingProvider) -> RetrievalService:
+        retrieval_mode = self._settings.retrieval_mode
+        candidate_policy = self.create_candidate_policy(es_client)
+        two_phase = self._settings.retrieval_two_phase
+        document_cache = self.create_document_cache(es_client) if two_phase else None
+
+        if retrieval_mode == "sequential":
+            return RetrievalService(es_client, embedding_provider, self._settings, candidate_policy=candidate_policy,
+                                    two_phase=two_phase, document_cache=document_cache)
+
+        if retrieval_mode == "concurrent":
+            executor = ThreadPoolExecutor(max_workers=self._settings.retrieval_max_workers, thread_name_prefix="retrieval")
+            return RetrievalService(es_client, embedding_provider, self._settings, executor, candidate_policy, two_phase, document_cache)
+
+        if retrieval_mode == "multi_search":
+            return MultiSearchRetrievalService(es_client, embedding_provider, self._settings, candidate_policy=candidate_policy,
+                                               two_phase=two_phase, document_cache=document_cache)
+
+        raise ValueError(f"Unsupported retrieval mode: {retrieval_mode}")
+
+    def create_candidate_policy(self, es_client: Elasticsearch) -> KnnCandidatePolicy:
+        # The estimation is opt-in, every filter missed in its cache costs two `_count` requests before the kNN search
+        selectivity_estimator = None
+        if self._settings.knn_num_candidates is None and self._settings.knn_selectivity_ttl_seconds > 0:
+            selectivity_estimator = FilterSelectivityEstimator(es_client, self._settings.index_name, self._settings.knn_selectivity_ttl_seconds)
+
+        return KnnCandidatePolicy(
+            self._settings.knn_num_candidates,
+            self._settings.knn_candidates_per_result,
+            self._settings.knn_min_num_candidates,
+            self._settings.knn_max_num_candidates,
+            selectivity_estimator
+        )
+
+    def create_document_cache(self, es_client: Elasticsearch) -> DocumentCache | None:
+        if not self._settings.document_cache_enabled:
+            return None
+
+        document_cache = DocumentCache(
+            es_client,
+            self._settings.index_name,
+            RetrievalService.SOURCE_FIELDS,
+            self._settings.document_cache_max_documents,
+            self._settings.document_cache_check_interval_seconds,
+            self._settings.document_cache_snapshot_path
+        )
+        # The documents are loaded on start, so the first emails do not wait for the scan of the index
+        document_cache.load()
+
+        return document_cache
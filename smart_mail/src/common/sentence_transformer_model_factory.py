@@ -1,11 +1,31 @@
 from common.settings import Settings
 from sentence_transformers import SentenceTransformer
+from services.embedding_cache import EmbeddingCache
+from services.embedding_provider import EmbeddingProvider
 
 
 class SentenceTransformerModelFactory:
     def __init__(self, settings: Settings) -> None:
         self.model_name = settings.embedding_model_name
+        self._settings = settings
 
     def create_model(self) -> SentenceTransformer:
         # TODO: revision=4.7.0 (https://huggingface.co/sentence-transformers/distiluse-base-multilingual-cased-v1/resolve/main/config.json)
         return SentenceTransformer(self.model_name)
+
+    def create_embedding_provider(self) -> EmbeddingProvider:
+        return EmbeddingProvider(self.create_model(), self.model_name, self.create_embedding_cache())
+
+    def create_embedding_cache(self) -> EmbeddingCache | None:
+        if self._settings.embedding_cache_size <= 0:
+            return None
+
+        # The model is cased, the texts are cached as they are encoded
+        return EmbeddingCache(
+            f"{self.model_name}/{EmbeddingProvider.CACHE_REPRESENTATION}",
+            self._settings.embedding_cache_size,
+            self._settings.embedding_cache_ttl_seconds,
+            self._settings.embedding_cache_path,
+            max_disk_size=self._settings.embedding_cache_max_disk_size,
+            normalize_texts=False
+        )
@@ -0,0 +1,147 @@
+import threading
+from typing import Any, Callable, Dict, TypeVar
+
+from elasticsearch import Elasticsearch
+from common.client_factory import ClientFactory
+from common.database_manager import DatabaseManager
+from common.retrieval_service_factory import RetrievalServiceFactory
+from common.sentence_transformer_model_factory import SentenceTransformerModelFactory
+from common.settings import Settings
+from handler.email_handler import EmailHandler
+from services.content.content_data_preparer import ContentDataPreparer
+from services.database.database_service import DatabaseService
+from services.embedding_provider import EmbeddingProvider
+from services.generation.generation_service import GenerationService
+from services.generation.prompt_creator import PromptCreator
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_service import RetrievalService
+from services.tracing.span_exporter import SpanExporter
+
+T = TypeVar("T")
+
+
+class ServiceContainer:
+    """
+    A lazy container of the application services (composition root).
+
+    Every service is created on first access and then reused, so a heavy dependency (e.g. the embedding model)
+    is only loaded by the applications that use it. Use `get_service_container` to share one container per process.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+        self._services: Dict[str, Any] = {}
+        # Creating a service can create its dependencies, so the lock must be reentrant
+        self._lock = threading.RLock()
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings
+
+    @property
+    def client_factory(self) -> ClientFactory:
+        return self._get_or_create("client_factory", lambda: ClientFactory(self._settings))
+
+    @property
+    def es_client(self) -> Elasticsearch:
+        return self._get_or_create("es_client", self.client_factory.create_elasticsearch_client)
+
+    @property
+    def embedding_provider(self) -> EmbeddingProvider:
+        return self._get_or_create("embedding_provider", SentenceTransformerModelFactory(self._settings).create_embedding_provider)
+
+    @property
+    def retrieval_service(self) -> RetrievalService:
+        return self._get_or_create("retrieval_service", lambda: RetrievalServiceFactory(self._settings).create_service(self.es_client, self.embedding_provider))
+
+    @property
+    def generation_service(self) -> GenerationService:
+        return self._get_or_create("generation_service", self.client_factory.create_generation_service)
+
+    @property
+    def database_manager(self) -> DatabaseManager:
+        return self._get_or_create("database_manager", self._create_database_manager)
+
+    @property
+    def database_service(self) -> DatabaseService:
+        return self._get_or_create("database_service", lambda: DatabaseService(self.database_manager))
+
+    @property
+    def content_data_preparer(self) -> ContentDataPreparer:
+        return self._get_or_create("content_data_preparer", lambda: ContentDataPreparer(self.embedding_provider, self._settings.project_embedding_index_path))
+
+    @property
+    def email_handler(self) -> EmailHandler:
+        return self._get_or_create("email_handler", lambda: EmailHandler(
+            self.retrieval_service,
+            PromptCreator(),
+            self.generation_service,
+            self.database_service,
+            ReciprocalRankFusionService(self._settings.rrf_k, self._settings.rrf_text_weight, self._settings.rrf_vector_weight),
+            self.content_data_preparer,
+            self.embedding_provider,
+            self._settings,
+            self.span_exporter
+        ))
+
+    @property
+    def span_exporter(self) -> SpanExporter | None:
+        return self._get_or_create("span_exporter", self._create_span_exporter)
+
+    def override(self, name: str, service: Any) -> None:
+        """
+        Replaces a service of the container, e.g. the span exporter of a benchmark or a client of an external system in a test.
+
+        The services created before the override keep the replaced service, so a service is overridden before the first access
+        to the services that depend on it.
+
+        Args:
+            name (str): The name of the service, the name of its property (e.g. "span_exporter").
+            service (Any): The service to use instead.
+        """
+        if not isinstance(getattr(type(self), name, None), property):
+            raise ValueError(f"The container has no service '{name}'.")
+
+        with self._lock:
+            self._services[name] = service
+
+    def _create_span_exporter(self) -> SpanExporter | None:
+        if self._settings.metrics_port <= 0:
+            return None
+
+        # The Prometheus client is only required if the export is enabled
+        from services.tracing.prometheus_span_exporter import PrometheusSpanExporter
+
+        return PrometheusSpanExporter(self._settings.metrics_port)
+
+    def _create_database_manager(self) -> DatabaseManager:
+        database_manager = self.client_factory.create_database_manager()
+        database_manager.db_init()
+        return database_manager
+
+    def _get_or_create(self, name: str, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = factory()
+
+            return self._services[name]
+
+
+_service_container: ServiceContainer | None = None
+_service_container_lock = threading.Lock()
+
+
+def get_service_container() -> ServiceContainer:
+    """
+    Returns the process-wide service container.
+
+    Streamlit re-executes the application scripts on every rerun. The container lives in this module instead
+    of the scripts, so the services are created once per process and shared between the sessions.
+    """
+    global _service_container
+
+    with _service_container_lock:
+        if _service_container is None:
+            _service_container = ServiceContainer(Settings())
+
+        return _service_container
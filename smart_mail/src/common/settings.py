@@ -11,7 +11,7 @@ class Settings:
 
         Attributes:
             elastic_search_url (str): URL for the Elasticsearch instance.
-            index_name (str): Name of the Elasticsearch index.
+            index_name (str): Name of the Elasticsearch index, or of the alias that points to the current version of the index.
             postgres_user (str): Username for the PostgreSQL database.
             postgres_password (str): Password for the PostgreSQL database.
             postgres_port (str): Port number for the PostgreSQL database.
@@ -19,6 +19,27 @@ class Settings:
             source_system (str): Identifier for the source system.
             postgres_host (str): Hostname for the PostgreSQL database.
             embedding_model_name (str): Name of the embedding model to use.
+            retrieval_mode (str): Retrieval backend to use: "sequential" (default), "concurrent" or "multi_search".
+            retrieval_max_workers (int): Number of threads shared by the concurrent retrieval mode.
+            retrieval_two_phase (bool): Flag indicating whether the searches return only the document ids and scores and the texts are loaded for the used results only.
+            document_cache_enabled (bool): Flag indicating whether the two-phase retrieval takes the documents from an in-process cache of the whole index.
+            document_cache_max_documents (int): Maximum number of documents of a cached index. A larger index is not cached.
+            document_cache_check_interval_seconds (float): Minimum time between two checks of the index version by the document cache in seconds.
+            document_cache_snapshot_path (str | None): Path to a JSON file that keeps the cached documents across restarts.
+            rrf_k (int): Rank constant of the reciprocal rank fusion.
+            rrf_text_weight (float): Weight of the text search results in the reciprocal rank fusion.
+            rrf_vector_weight (float): Weight of the vector search results in the reciprocal rank fusion.
+            metrics_port (int): Port of the Prometheus endpoint with the durations of the processing stages. The value 0 disables the export.
+            embedding_cache_size (int): Maximum number of text embeddings kept in memory. The value 0 disables the cache.
+            embedding_cache_ttl_seconds (float): Time to live of a cached text embedding in seconds.
+            embedding_cache_path (str | None): Path to an SQLite file that keeps the cached text embeddings across restarts.
+            embedding_cache_max_disk_size (int): Maximum number of text embeddings kept in the SQLite file, the oldest ones are deleted first.
+            project_embedding_index_path (str | None): Directory of the persisted project name embeddings. If not set, the embeddings are computed on every start.
+            knn_num_candidates (int | None): A fixed number of the kNN candidates per shard, 10000 by default. If set to 0, the number is chosen per search by the adaptive policy.
+            knn_candidates_per_result (float): Number of the kNN candidates per requested result of the adaptive policy.
+            knn_min_num_candidates (int): Lower bound of the adaptive number of the kNN candidates.
+            knn_max_num_candidates (int): Upper bound of the adaptive number of the kNN candidates, at most 10000.
+            knn_selectivity_ttl_seconds (float): Time to live of an estimated filter selectivity of the adaptive policy in seconds. The value 0 (default) disables the estimation.
             use_local_llm (bool): Flag indicating whether to use a local LLM (Language Learning Model).
             local_llm_url (str, optional): URL for the local LLM API. Only set if USE_LOCAL_LLM is True.
             local_llm_model_name (str, optional): Name of the local LLM model. Only set if USE_LOCAL_LLM is True.
@@ -36,6 +57,27 @@ class Settings:
         self.source_system = self.get_env_variable("SOURCE_SYSTEM")
         self.postgres_host = self.get_env_variable("POSTGRES_HOST")
         self.embedding_model_name = self.get_env_variable("EMBEDDING_MODEL_NAME")
+        self.retrieval_mode = self.get_optional_env_variable("RETRIEVAL_MODE", "sequential").lower()
+        self.retrieval_max_workers = int(self.get_optional_env_variable("RETRIEVAL_MAX_WORKERS", "4"))
+        self.retrieval_two_phase = self.get_optional_env_variable("RETRIEVAL_TWO_PHASE", "false").lower() in ("true", "1", "yes", "y")
+        self.document_cache_enabled = self.get_optional_env_variable("DOCUMENT_CACHE_ENABLED", "false").lower() in ("true", "1", "yes", "y")
+        self.document_cache_max_documents = int(self.get_optional_env_variable("DOCUMENT_CACHE_MAX_DOCUMENTS", "100000"))
+        self.document_cache_check_interval_seconds = float(self.get_optional_env_variable("DOCUMENT_CACHE_CHECK_INTERVAL_SECONDS", "30"))
+        self.document_cache_snapshot_path = self.get_optional_env_variable("DOCUMENT_CACHE_SNAPSHOT_PATH", "") or None
+        self.rrf_k = int(self.get_optional_env_variable("RRF_K", "60"))
+        self.rrf_text_weight = float(self.get_optional_env_variable("RRF_TEXT_WEIGHT", "1"))
+        self.rrf_vector_weight = float(self.get_optional_env_variable("RRF_VECTOR_WEIGHT", "1"))
+        self.metrics_port = int(self.get_optional_env_variable("METRICS_PORT", "0"))
+        self.embedding_cache_size = int(self.get_optional_env_variable("EMBEDDING_CACHE_SIZE", "1024"))
+        self.embedding_cache_ttl_seconds = float(self.get_optional_env_variable("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+        self.embedding_cache_path = self.get_optional_env_variable("EMBEDDING_CACHE_PATH", "") or None
+        self.embedding_cache_max_disk_size = int(self.get_optional_env_variable("EMBEDDING_CACHE_MAX_DISK_SIZE", "100000"))
+        self.project_embedding_index_path = self.get_optional_env_variable("PROJECT_EMBEDDING_INDEX_PATH", "") or None
+        self.knn_num_candidates = int(self.get_optional_env_variable("KNN_NUM_CANDIDATES", "10000")) or None
+        self.knn_candidates_per_result = float(self.get_optional_env_variable("KNN_CANDIDATES_PER_RESULT", "10"))
+        self.knn_min_num_candidates = int(self.get_optional_env_variable("KNN_MIN_NUM_CANDIDATES", "100"))
+        self.knn_max_num_candidates = int(self.get_optional_env_variable("KNN_MAX_NUM_CANDIDATES", "10000"))
+        self.knn_selectivity_ttl_seconds = float(self.get_optional_env_variable("KNN_SELECTIVITY_TTL_SECONDS", "0"))
 
         use_local_llm_str = self.get_env_variable("USE_LOCAL_LLM")
         self.use_local_llm = use_local_llm_str.lower() in ("true", "1", "yes", "y")
@@ -57,6 +99,13 @@ class Settings:
             raise EnvironmentError(f"Environment variable {name} is not set.")
         return value
 
+    @staticmethod
+    def get_optional_env_variable(name: str, default: str) -> str:
+        value = os.getenv(name)
+        if value is None or value.strip() == "":
+            return default
+        return value
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "elastic_search_url": self.elastic_search_url,
@@ -68,6 +117,27 @@ class Settings:
             "source_system": self.source_system,
             "postgres_host": self.postgres_host,
             "embedding_model_name": self.embedding_model_name,
+            "retrieval_mode": self.retrieval_mode,
+            "retrieval_max_workers": self.retrieval_max_workers,
+            "retrieval_two_phase": self.retrieval_two_phase,
+            "document_cache_enabled": self.document_cache_enabled,
+            "document_cache_max_documents": self.document_cache_max_documents,
+            "document_cache_check_interval_seconds": self.document_cache_check_interval_seconds,
+            "document_cache_snapshot_path": self.document_cache_snapshot_path,
+            "rrf_k": self.rrf_k,
+            "rrf_text_weight": self.rrf_text_weight,
+            "rrf_vector_weight": self.rrf_vector_weight,
+            "metrics_port": self.metrics_port,
+            "embedding_cache_size": self.embedding_cache_size,
+            "embedding_cache_ttl_seconds": self.embedding_cache_ttl_seconds,
+            "embedding_cache_path": self.embedding_cache_path,
+            "embedding_cache_max_disk_size": self.embedding_cache_max_disk_size,
+            "project_embedding_index_path": self.project_embedding_index_path,
+            "knn_num_candidates": self.knn_num_candidates,
+            "knn_candidates_per_result": self.knn_candidates_per_result,
+            "knn_min_num_candidates": self.knn_min_num_candidates,
+            "knn_max_num_candidates": self.knn_max_num_candidates,
+            "knn_selectivity_ttl_seconds": self.knn_selectivity_ttl_seconds,
             "use_local_llm": self.use_local_llm,
             "local_llm_url": self.local_llm_url if self.use_local_llm else "The 'use_local_llm' should be set to True to use this field.",
             "local_llm_model_name": self.local_llm_model_name if self.use_local_llm else "The 'use_local_llm' should be set to True to use this field.",
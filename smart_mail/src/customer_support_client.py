@@ -2,40 +2,18 @@ from typing import Any, Dict, List
 import logging
 import streamlit as st
 import pandas as pd
-from common.client_factory import ClientFactory
-from handler.email_handler import EmailHandler
-from common.settings import Settings
-from common.sentence_transformer_model_factory import (
-    SentenceTransformerModelFactory as ModelFactory,
-)
+from common.service_container import get_service_container
 from services.database.answer_model import AnswerModel
-from services.database.database_service import DatabaseService
-from services.generation.prompt_creator import PromptCreator
-from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
-from services.retrieval_service import RetrievalService
-from services.content.content_data_preparer import ContentDataPreparer
 
 
 # Initialization
-settings = Settings()
-client_factory = ClientFactory(settings)
-es_client = client_factory.create_elasticsearch_client()
-model_factory = ModelFactory(settings)
-embedding_model = model_factory.create_model()
-retrieval_service = RetrievalService(es_client, embedding_model, settings)
-generation_service = client_factory.create_generation_service()
-database_manager = client_factory.create_database_manager()
-database_service = DatabaseService(database_manager)
-content_data_preparer = ContentDataPreparer()
-email_handler = EmailHandler(
-    retrieval_service, PromptCreator(), generation_service, database_service, ReciprocalRankFusionService(), content_data_preparer, settings
-)
 logging.basicConfig(
     level=logging.INFO,  # Set the log level to INFO to capture info and higher levels
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'  # Customize log format
 )
 
-database_manager.db_init()
+# The dashboard only reads the answers, so neither the embedding model nor the search and generation clients are created
+database_service = get_service_container().database_service
 
 
 def get_user_feedback(answer: AnswerModel) -> str:
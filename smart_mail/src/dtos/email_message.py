@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class EmailMessage:
+    """ Represents an incoming email. """
+
+    email_from: str
+    subject: str
+    body: str
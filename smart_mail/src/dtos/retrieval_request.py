@@ -1,13 +1,18 @@
-# from dataclasses import dataclass
-# from typing import List
-# from uuid import UUID
+from dataclasses import dataclass, field
+from typing import Any, List
 
 
-# @dataclass
-# class RetrievalRequest:
-#     question: str
-#     number_of_results: int
-#     vector_field_name: str
+@dataclass(frozen=True)
+class RetrievalRequest:
+    """ Represents the parameters of a single search in a batch retrieval. """
 
-#     # specifies the project ids that should be used in the search
-#     customer_project_ids: List[UUID]
+    question: str
+    number_of_results: int = 20
+    vector_field_name: str = "vector_question_answer"
+
+    # specifies the project id that should be used in the search
+    customer_project_id: str | None = None
+    authorization_ids: List[str] = field(default_factory=lambda: [])
+
+    # the sentence embedding of the question, the question is encoded by the retrieval service if it is not set
+    query_vector: Any = field(default=None, compare=False)
@@ -1,10 +1,14 @@
 import time
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Sequence
+
+import numpy as np
+import torch
 
 from common.settings import Settings
 from data_loaders.repayment_schedule_loader import RepaymentScheduleLoader
 from services.database.database_service import DatabaseService
+from services.embedding_provider import EmbeddingProvider
 from services.generation.generation_result import GenerationResult
 from services.generation.generation_service import GenerationService
 from services.generation.prompt_creator import PromptCreator
@@ -12,14 +16,31 @@ from services.retrieval_service import RetrievalService
 from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
 from services.content.content_data_preparer import ContentDataPreparer
 from services.search_result import SearchResult
+from services.tracing.request_trace import RequestTrace, trace_span
+from services.tracing.span_exporter import SpanExporter
+from dtos.email_message import EmailMessage
 from dtos.identified_project import IdentifiedProject
+from dtos.retrieval_request import RetrievalRequest
 
 
 class EmailHandler:
     """
     Handles incoming emails and performs various operations on them.
+
+    The durations of the processing stages (project extraction, authorization lookup, query embedding, searches,
+    rank fusion, prompt rendering, generation and, for a streamed answer, the time to the first token) are stored
+    in `request_metadata` of the answer as `stage_durations_ms`.
+    All stages, including the database write, are passed to the optional span exporter.
+
+    The text of an email and its preprocessed (lowercased) version are encoded in one call of the embedding provider,
+    which answers a repeated email from its cache. The pooled embedding of the text as written is passed to the project
+    identification, the model is cased like the project names. The sentence embedding of the preprocessed text is passed
+    to the kNN search.
     """
 
+    # The number of the top search results after the rank fusion that are used in the prompt
+    NUMBER_OF_PROMPT_RESULTS = 10
+
     def __init__(
         self,
         retrieval_service: RetrievalService,
@@ -28,7 +49,9 @@ class EmailHandler:
         database_service: DatabaseService,
         reciprocal_rank_fusion_service: ReciprocalRankFusionService,
         content_data_preparer: ContentDataPreparer,
-        settings: Settings
+        embedding_provider: EmbeddingProvider,
+        settings: Settings,
+        span_exporter: SpanExporter | None = None
     ) -> None:
         self._retrieval_service = retrieval_service
         self._prompt_creator = prompt_creator
@@ -36,49 +59,212 @@ class EmailHandler:
         self._database_service = database_service
         self.reciprocal_rank_fusion_service = reciprocal_rank_fusion_service
         self._content_data_preparer = content_data_preparer
+        self._embedding_provider = embedding_provider
         self._settings = settings
+        self._span_exporter = span_exporter
         self._logger = logging.getLogger(__name__)
 
     def handle(self, email_from: str, subject: str, body: str) -> str:
         self._logger.info("Handling email from: %s, subject: %s", email_from, subject)
 
         start_time = time.time()
+        trace = RequestTrace(self._span_exporter)
 
-        question = subject + " " + body
-        identified_project = self._content_data_preparer.extract_project(question)
-        identified_project_id = str(identified_project.id) if identified_project is not None else None
-        user_authorization_ids = self._content_data_preparer.get_user_authorization_ids(email_from)
+        with trace.activate():
+            used_search_results, identified_project_id = self._get_search_results(email_from, subject, body)
+            prompt, generation_result, elapsed_llm_time = self._generate_answer(body, used_search_results, email_from, identified_project_id)
 
-        self._logger.info("Processing content for the extracted project: %s", identified_project)
+            end_time = time.time()
+            elapsed_time = end_time - start_time
+            trace.add("total", elapsed_time)
 
-        search_params = self._create_search_params(question, identified_project, user_authorization_ids)
-        retrieval_result = self._retrieval_service.search(**search_params)
+            # The duration of the database write is exported only, it is not known before the answer is stored
+            with trace_span("database_write"):
+                created_entity = self._save_to_database(email_from, subject, body, prompt, generation_result, elapsed_llm_time, elapsed_time,
+                                                        {"stage_durations_ms": trace.to_dict()})
+        self._logger.info(f"Created entity: {created_entity}")
+
+        return str(generation_result.output_text)
+
+    def handle_stream(self, email_from: str, subject: str, body: str) -> Iterator[str]:
+        """
+        Handles an email like `handle`, but yields the text of the answer while it is generated by the LLM.
+
+        The answer with the token counts is stored when the stream is consumed to the end. The time to the first
+        chunk of the answer is stored in `stage_durations_ms` as `first_token`.
+
+        Args:
+            email_from (str): The email address of the sender.
+            subject (str): The subject of the email.
+            body (str): The body of the email.
+
+        Returns:
+            Iterator[str]: The chunks of the generated answer.
+        """
+        self._logger.info("Handling email from: %s, subject: %s", email_from, subject)
+
+        start_time = time.time()
+        trace = RequestTrace(self._span_exporter)
+
+        with trace.activate():
+            used_search_results, identified_project_id = self._get_search_results(email_from, subject, body)
+            prompt = self._create_prompt(body, used_search_results, email_from, identified_project_id) if len(used_search_results) > 0 else ""
 
-        reranked_search_results = self.reciprocal_rank_fusion_service.rerank(retrieval_result)
-        prompt, generation_result, elapsed_llm_time = self._generate_answer(body, reranked_search_results, email_from, identified_project_id)
+        elapsed_llm_time = 0.0
+        if prompt == "":
+            generation_result = GenerationResult.empty()
+            yield generation_result.output_text
+        else:
+            # The trace is not active while the chunks are yielded, the caller's code runs between the chunks
+            start_llm_time = time.time()
+            generation_stream = self._generation_service.stream_answer(prompt)
 
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+            for idx, chunk in enumerate(generation_stream):
+                if idx == 0:
+                    trace.add("first_token", time.time() - start_llm_time)
+                yield chunk
 
-        created_entity = self._save_to_database(email_from, subject, body, prompt, generation_result, elapsed_llm_time, elapsed_time)
+            elapsed_llm_time = time.time() - start_llm_time
+            trace.add("generation", elapsed_llm_time)
+            generation_result = generation_stream.get_result()
+
+        elapsed_time = time.time() - start_time
+        trace.add("total", elapsed_time)
+
+        with trace.activate(), trace_span("database_write"):
+            created_entity = self._save_to_database(email_from, subject, body, prompt, generation_result, elapsed_llm_time, elapsed_time,
+                                                    {"stage_durations_ms": trace.to_dict()})
         self._logger.info(f"Created entity: {created_entity}")
 
-        return str(generation_result.output_text)
+    def handle_batch(self, emails: Sequence[EmailMessage]) -> List[str]:
+        """
+        Handles several emails at once.
+
+        The projects of all emails are identified in one forward pass, all questions are encoded in one batch,
+        all searches are sent in one `_msearch` request and all answers are stored in one transaction.
+
+        Args:
+            emails (Sequence[EmailMessage]): The emails to handle.
+
+        Returns:
+            List[str]: The generated answers in the order of the emails.
+        """
+        self._logger.info("Handling a batch of %d emails", len(emails))
+
+        start_time = time.time()
+        batch_trace = RequestTrace(self._span_exporter)
+
+        with batch_trace.activate():
+            questions = [email.subject + " " + email.body for email in emails]
+            query_vectors, pooled_embeddings = self._encode_questions(questions)
+
+            with trace_span("project_extraction"):
+                identified_projects = self._content_data_preparer.extract_projects(questions, pooled_embeddings)
+
+            with trace_span("authorization_lookup"):
+                user_authorization_ids_list = [self._content_data_preparer.get_user_authorization_ids(email.email_from) for email in emails]
+
+            retrieval_requests = [
+                self._create_retrieval_request(question, identified_project, user_authorization_ids, query_vector)
+                for question, identified_project, user_authorization_ids, query_vector in zip(questions, identified_projects, user_authorization_ids_list, query_vectors)
+            ]
+            retrieval_results = self._retrieval_service.search_batch(retrieval_requests)
+
+            with trace_span("rank_fusion"):
+                reranked_search_results_lists = [
+                    self.reciprocal_rank_fusion_service.rerank(retrieval_result, self.NUMBER_OF_PROMPT_RESULTS) for retrieval_result in retrieval_results
+                ]
+
+            # The documents used in the prompts of all emails are loaded at once
+            used_search_results_lists = self._retrieval_service.fetch_documents_batch(reranked_search_results_lists)
+
+        # The stages shared by all emails of the batch are measured once
+        shared_time = time.time() - start_time
+
+        answer_models: List[Dict[str, Any]] = []
+        output_texts: List[str] = []
+
+        for email, identified_project, used_search_results in zip(emails, identified_projects, used_search_results_lists):
+            identified_project_id = str(identified_project.id) if identified_project is not None else None
+
+            email_start_time = time.time()
+            email_trace = RequestTrace(self._span_exporter)
+            with email_trace.activate():
+                prompt, generation_result, elapsed_llm_time = self._generate_answer(email.body, used_search_results, email.email_from, identified_project_id)
+
+            # The processing time of an email is the time of the shared stages and of its own stages,
+            # the generation of the preceding emails of the batch is not included
+            elapsed_time = shared_time + (time.time() - email_start_time)
+            email_trace.add("total", elapsed_time)
+
+            # The durations of the shared stages are the durations for the whole batch
+            request_metadata = {"stage_durations_ms": {**batch_trace.to_dict(), **email_trace.to_dict()}, "batch_size": len(emails)}
+
+            answer_models.append(self._create_answer_model(email.email_from, email.subject, email.body, prompt, generation_result, elapsed_llm_time, elapsed_time,
+                                                           request_metadata))
+            output_texts.append(str(generation_result.output_text))
+
+        with batch_trace.activate(), trace_span("database_write"):
+            created_entities = self._database_service.create_answers(answer_models)
+        self._logger.info("Created %d entities", len(created_entities))
+
+        return output_texts
 
     def _generate_answer(self, question: str, reranked_search_results: List[SearchResult], email_from: str, extracted_project_id: str | None) -> tuple[str, GenerationResult, float]:
         if len(reranked_search_results) == 0:
             return "", GenerationResult.empty(), 0.0
 
-        used_results = reranked_search_results[:10]
-        prompt = self._prompt_creator.create(question, used_results, RepaymentScheduleLoader.get_repayment_schedule(email_from, extracted_project_id))
+        prompt = self._create_prompt(question, reranked_search_results, email_from, extracted_project_id)
 
         start_llm_time = time.time()
         # TODO: Add exception handling
-        generation_result = self._generation_service.get_answer(prompt)
+        with trace_span("generation"):
+            generation_result = self._generation_service.get_answer(prompt)
         end_llm_time = time.time()
         elapsed_llm_time = end_llm_time - start_llm_time
         return prompt, generation_result, elapsed_llm_time
 
+    def _create_prompt(self, question: str, reranked_search_results: List[SearchResult], email_from: str, extracted_project_id: str | None) -> str:
+        used_results = reranked_search_results[:self.NUMBER_OF_PROMPT_RESULTS]
+        with trace_span("prompt_rendering"):
+            return self._prompt_creator.create(question, used_results, RepaymentScheduleLoader.get_repayment_schedule(email_from, extracted_project_id))
+
+    def _get_search_results(self, email_from: str, subject: str, body: str) -> tuple[List[SearchResult], str | None]:
+        """ Returns the documents used in the prompt and the id of the project identified in the email. """
+
+        question = subject + " " + body
+        query_vectors, pooled_embeddings = self._encode_questions([question])
+
+        with trace_span("project_extraction"):
+            identified_project = self._content_data_preparer.extract_project(question, pooled_embeddings[0])
+        identified_project_id = str(identified_project.id) if identified_project is not None else None
+
+        with trace_span("authorization_lookup"):
+            user_authorization_ids = self._content_data_preparer.get_user_authorization_ids(email_from)
+
+        self._logger.info("Processing content for the extracted project: %s", identified_project)
+
+        search_params = self._create_search_params(question, identified_project, user_authorization_ids)
+        search_params["query_vector"] = query_vectors[0]
+        retrieval_result = self._retrieval_service.search(**search_params)
+
+        with trace_span("rank_fusion"):
+            reranked_search_results = self.reciprocal_rank_fusion_service.rerank(retrieval_result, self.NUMBER_OF_PROMPT_RESULTS)
+
+        return self._retrieval_service.fetch_documents(reranked_search_results), identified_project_id
+
+    def _encode_questions(self, questions: List[str]) -> tuple[np.ndarray, torch.Tensor]:
+        """
+        Returns the sentence embeddings of the preprocessed questions for the kNN search and the pooled embeddings
+        of the questions as written for the project identification. Both texts of all questions are encoded in one call.
+        """
+        search_questions = [self._retrieval_service.preprocess_question(question) for question in questions]
+
+        with trace_span("query_embedding"):
+            sentence_embeddings, pooled_embeddings = self._embedding_provider.encode_with_pooled(questions + search_questions)
+
+        return sentence_embeddings[len(questions):], pooled_embeddings[:len(questions)]
+
     def _create_search_params(self,
                               question: str,
                               identified_project: IdentifiedProject | None,
@@ -93,8 +279,26 @@ class EmailHandler:
 
         return search_params
 
+    def _create_retrieval_request(self,
+                                  question: str,
+                                  identified_project: IdentifiedProject | None,
+                                  user_authorization_ids: List[str] | None,
+                                  query_vector: Any = None) -> RetrievalRequest:
+        customer_project_id = str(identified_project.id) if identified_project is not None else None
+
+        return RetrievalRequest(question=question, customer_project_id=customer_project_id, authorization_ids=user_authorization_ids or [],
+                                query_vector=query_vector)
+
     def _save_to_database(self, email_from: str, subject: str, body: str, prompt: str,
-                          generation_result: GenerationResult, response_time: float, total_time: float):
+                          generation_result: GenerationResult, response_time: float, total_time: float,
+                          request_metadata: Dict[str, Any] | None = None):
+
+        answer_model = self._create_answer_model(email_from, subject, body, prompt, generation_result, response_time, total_time, request_metadata)
+        return self._database_service.create_answer(answer_model)
+
+    def _create_answer_model(self, email_from: str, subject: str, body: str, prompt: str,
+                             generation_result: GenerationResult, response_time: float, total_time: float,
+                             request_metadata: Dict[str, Any] | None = None) -> Dict[str, Any]:
 
         answer_model: Dict[str, Any] = {
             "email_id": "test-id",
@@ -110,8 +314,9 @@ class EmailHandler:
             "llm_response_time_ms": int(response_time * 1000),
             "processing_status": "processed",
             "total_processing_time_ms": int(total_time * 1000),
+            "request_metadata": request_metadata,
             "error_message": None,
             "source_system": self._settings.source_system
         }
 
-        self._database_service.create_answer(answer_model)
+        return answer_model
@@ -0,0 +1,86 @@
+from collections import deque
+from typing import Dict, List, Sequence, Set
+
+
+class AhoCorasickAutomaton:
+    """
+    Finds all occurrences of many patterns in a text with a single pass over the text.
+
+    The automaton is built once from the patterns. Searching costs O(len(text) + number of matched patterns),
+    independently of the number of patterns, which replaces running `pattern in text` for every pattern.
+    See https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm for more details.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._failure_links: List[int] = [0]
+        # The nearest state on the failure chain that ends a pattern, or -1
+        self._output_links: List[int] = [-1]
+        self._outputs: List[List[int]] = [[]]
+
+        for pattern_index, pattern in enumerate(patterns):
+            # An empty pattern would match every text, such patterns are ignored
+            if pattern:
+                self._add_pattern(pattern, pattern_index)
+
+        self._build_links()
+
+    def find_all(self, text: str) -> Set[int]:
+        """ Returns the indexes of the patterns that occur in the text. """
+
+        visited_states: Set[int] = set()
+        state = 0
+
+        for char in text:
+            while state != 0 and char not in self._transitions[state]:
+                state = self._failure_links[state]
+            state = self._transitions[state].get(char, 0)
+            visited_states.add(state)
+
+        result: Set[int] = set()
+        reported_states: Set[int] = set()
+
+        for state in visited_states:
+            output_state = state if self._outputs[state] else self._output_links[state]
+
+            while output_state != -1 and output_state not in reported_states:
+                reported_states.add(output_state)
+                result.update(self._outputs[output_state])
+                output_state = self._output_links[output_state]
+
+        return result
+
+    def _add_pattern(self, pattern: str, pattern_index: int) -> None:
+        state = 0
+
+        for char in pattern:
+            next_state = self._transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._failure_links.append(0)
+                self._output_links.append(-1)
+                self._outputs.append([])
+                self._transitions[state][char] = next_state
+            state = next_state
+
+        self._outputs[state].append(pattern_index)
+
+    def _build_links(self) -> None:
+        queue = deque(self._transitions[0].values())
+
+        while queue:
+            state = queue.popleft()
+
+            for char, next_state in self._transitions[state].items():
+                queue.append(next_state)
+
+                failure_state = self._failure_links[state]
+                while failure_state != 0 and char not in self._transitions[failure_state]:
+                    failure_state = self._failure_links[failure_state]
+
+                failure_link = self._transitions[failure_state].get(char, 0)
+                self._failure_links[next_state] = failure_link if failure_link != next_state else 0
+
+                fallback_state = self._failure_links[next_state]
+                self._output_links[next_state] = fallback_state if self._outputs[fallback_state] else self._output_links[fallback_state]
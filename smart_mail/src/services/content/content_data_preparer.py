@@ -1,22 +1,30 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence
+
+import torch
 
 from data_loaders.projects_loader import ProjectsLoader
 from dtos.identified_project import IdentifiedProject
 from dtos.project import Project
 from services.content.project_identifier_service import ProjectIdentifierService
+from services.embedding_provider import EmbeddingProvider
 
 
 class ContentDataPreparer:
-    def __init__(self):
+    def __init__(self, embedding_provider: EmbeddingProvider, project_embedding_index_path: str | None = None):
         self._list_of_projects = ProjectsLoader.get_projects()
-        self._project_identifier_service = ProjectIdentifierService(self._list_of_projects)
+        self._project_identifier_service = ProjectIdentifierService(self._list_of_projects, embedding_provider, project_embedding_index_path)
 
-    def extract_project(self, input_text: str) -> IdentifiedProject | None:
-        """ Extracts the project from the input text. """
+    def extract_project(self, input_text: str, input_embedding: torch.Tensor | None = None) -> IdentifiedProject | None:
+        """ Extracts the project from the input text, the optional pooled embedding of the text saves a forward pass. """
 
-        identified_project = self._project_identifier_service.extract_project(input_text)
+        identified_project = self._project_identifier_service.extract_project(input_text, query_embedding=input_embedding)
         return identified_project
 
+    def extract_projects(self, input_texts: Sequence[str], input_embeddings: torch.Tensor | None = None) -> List[IdentifiedProject | None]:
+        """ Extracts the projects from several input texts at once. """
+
+        return self._project_identifier_service.extract_projects(input_texts, query_embeddings=input_embeddings)
+
     def get_user_authorization_ids(self, email_from: str) -> List[str] | None:
         """
         Retrieves the list of authorization ids for the given email.
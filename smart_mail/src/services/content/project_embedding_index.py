@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from dtos.project import Project
+
+
+class ProjectEmbeddingIndex:
+    """
+    An on-disk index of the project name embeddings.
+
+    The embeddings are stored as a float32 matrix in a `.npy` file that is memory-mapped on load. A JSON manifest maps
+    every row of the matrix to the project id, the hash of the project name and the embedding model the row was created with.
+    Only new or renamed projects are encoded when the index is loaded, the other rows are reused.
+    A rebuild keeps the matrix of the previous generation, so a process that loads the index concurrently finds the matrix
+    of the manifest it has read. If the matrix is removed anyway, the manifest is read again.
+
+    Attributes:
+        directory (str): The directory with the manifest and the matrix files.
+        model_name (str): The name of the model (and the representation) the embeddings are created with.
+    """
+
+    MANIFEST_FILE_NAME = "manifest.json"
+    # The number of manifest reads when the matrix of the manifest is removed by concurrent rebuilds
+    LOAD_ATTEMPTS = 3
+
+    def __init__(self, directory: str, model_name: str) -> None:
+        self.directory = directory
+        self.model_name = model_name
+        self._logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+
+    def get_embeddings(self, projects: Sequence[Project], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns the embeddings of the project names with one row per project in the order of the projects.
+
+        Args:
+            projects (Sequence[Project]): The projects.
+            encode (Callable[[List[str]], np.ndarray]): The function that encodes the names of the new or renamed projects.
+
+        Returns:
+            np.ndarray: A copy-on-write memory-mapped float32 matrix.
+        """
+        keys = [self._create_key(project) for project in projects]
+        stored_matrix, stored_rows = self._load()
+
+        if stored_matrix is not None and keys == list(stored_rows.keys()):
+            return stored_matrix
+
+        missed_indexes = [idx for idx, key in enumerate(keys) if key not in stored_rows]
+        self._logger.info("Encoding %d of %d project names for the project embedding index", len(missed_indexes), len(keys))
+
+        encoded_vectors = np.asarray(encode([projects[idx].name for idx in missed_indexes]), dtype=np.float32) if missed_indexes else None
+        dimension = self._get_dimension(stored_matrix, encoded_vectors)
+
+        matrix = np.empty((len(keys), dimension), dtype=np.float32)
+        for idx, key in enumerate(keys):
+            if key in stored_rows and stored_matrix is not None:
+                matrix[idx] = stored_matrix[stored_rows[key]]
+
+        if encoded_vectors is not None:
+            matrix[missed_indexes] = encoded_vectors
+
+        return self._save(keys, matrix)
+
+    def _load(self) -> Tuple[np.ndarray | None, Dict[Tuple[str, str], int]]:
+        for _ in range(self.LOAD_ATTEMPTS):
+            manifest = self._read_manifest()
+            if manifest is None:
+                return None, {}
+
+            if manifest.get("model_name") != self.model_name:
+                self._logger.info("The project embedding index was created with the model %s, it is rebuilt", manifest.get("model_name"))
+                return None, {}
+
+            try:
+                matrix = np.load(os.path.join(self.directory, manifest["matrix_file_name"]), mmap_mode="c")
+            except FileNotFoundError:
+                # Concurrent rebuilds removed the matrix after the manifest was read, the current manifest points to a newer one
+                self._logger.info("The matrix %s of the project embedding index was removed, the manifest is read again", manifest["matrix_file_name"])
+                continue
+
+            rows = {(entry["project_id"], entry["name_hash"]): entry["row"] for entry in manifest["entries"]}
+            return matrix, rows
+
+        return None, {}
+
+    def _read_manifest(self) -> Dict[str, Any] | None:
+        try:
+            with open(os.path.join(self.directory, self.MANIFEST_FILE_NAME), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, keys: List[Tuple[str, str]], matrix: np.ndarray) -> np.ndarray:
+        # Every version of the matrix gets a new file and the manifest is replaced atomically,
+        # so a process that loads the index at the same time never sees a half-written matrix.
+        matrix_file_name = f"project_embeddings_{uuid.uuid4().hex}.npy"
+        np.save(os.path.join(self.directory, matrix_file_name), matrix)
+
+        manifest: Dict[str, Any] = {
+            "model_name": self.model_name,
+            "matrix_file_name": matrix_file_name,
+            "entries": [{"project_id": project_id, "name_hash": name_hash, "row": row} for row, (project_id, name_hash) in enumerate(keys)],
+        }
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".json")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(temporary_path, os.path.join(self.directory, self.MANIFEST_FILE_NAME))
+
+        # The matrix is mapped before the outdated matrices are removed, a concurrent rebuild can remove it right after
+        matrix = np.load(os.path.join(self.directory, matrix_file_name), mmap_mode="c")
+        self._remove_outdated_matrices(matrix_file_name)
+
+        return matrix
+
+    def _remove_outdated_matrices(self, current_matrix_file_name: str) -> None:
+        outdated_file_names = [
+            file_name for file_name in os.listdir(self.directory)
+            if file_name.startswith("project_embeddings_") and file_name != current_matrix_file_name
+        ]
+        outdated_file_names.sort(key=self._get_modification_time, reverse=True)
+
+        # The previous generation is kept, a process that has just read the previous manifest still loads its matrix
+        for file_name in outdated_file_names[1:]:
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                # The file can still be mapped by another process or removed by a concurrent rebuild
+                pass
+
+    def _get_modification_time(self, file_name: str) -> float:
+        try:
+            return os.path.getmtime(os.path.join(self.directory, file_name))
+        except OSError:
+            return 0.0
+
+    @staticmethod
+    def _get_dimension(stored_matrix: np.ndarray | None, encoded_vectors: np.ndarray | None) -> int:
+        if encoded_vectors is not None:
+            return encoded_vectors.shape[1]
+
+        if stored_matrix is not None:
+            return stored_matrix.shape[1]
+
+        return 0
+
+    @staticmethod
+    def _create_key(project: Project) -> Tuple[str, str]:
+        name_hash = hashlib.sha256(project.name.encode("utf-8")).hexdigest()
+        return str(project.id).upper(), name_hash
@@ -1,72 +1,142 @@
-from typing import Sequence
-from transformers import AutoTokenizer, AutoModel
+from typing import Dict, List, Sequence
+from uuid import UUID
 import torch
-from sklearn.metrics.pairwise import cosine_similarity
+import torch.nn.functional as F
 
 from dtos.identified_project import IdentifiedProject
 
 from dtos.project import Project
+from services.content.aho_corasick_automaton import AhoCorasickAutomaton
+from services.content.project_embedding_index import ProjectEmbeddingIndex
+from services.embedding_provider import EmbeddingProvider
 from services.content.text_preprocessor_service import TextPreprocessorService
 
 
 class ProjectIdentifierService:
-    def __init__(self, projects: Sequence[Project]):
+    def __init__(self, projects: Sequence[Project], embedding_provider: EmbeddingProvider, embedding_index_path: str | None = None):
         self._projects = projects
 
         preprocessed_projects = [ self._create_project_with_preprocessed_name(project) for project in projects ]
         self._sorted_projects_with_preprocessed_names = sorted(preprocessed_projects, key=lambda p: len(p.name), reverse=True)
 
-        self._model_name = "sentence-transformers/distiluse-base-multilingual-cased-v1"
-        self._tokenizer = AutoTokenizer.from_pretrained(self._model_name)
-        self._model = AutoModel.from_pretrained(self._model_name)
+        # The automaton reports the indexes of the sorted projects, so the longest matched name comes first
+        self._project_name_automaton = AhoCorasickAutomaton([project.name for project in self._sorted_projects_with_preprocessed_names])
+        self._projects_by_id: Dict[UUID, Project] = {}
+        for project in projects:
+            self._projects_by_id.setdefault(project.id, project)
 
-        # Get embeddings for each project name
-        self._project_embeddings = [self._get_embeddings(project.name) for project in self._projects]
+        # The model is shared with the retrieval service, see EmbeddingProvider
+        self._embedding_provider = embedding_provider
+
+        # Get embeddings for each project name. The embeddings are normalized and stacked into one contiguous matrix,
+        # so the cosine similarities to all projects are computed with a single matrix product.
+        # If the index path is set, the matrix is loaded from disk and only new or renamed projects are encoded.
+        if embedding_index_path is not None:
+            embedding_index = ProjectEmbeddingIndex(embedding_index_path, f"{embedding_provider.model_name}/mean-pooled-normalized")
+            project_embeddings = embedding_index.get_embeddings(self._projects, lambda names: self._get_normalized_embeddings(names).numpy())
+            self._project_embedding_matrix = torch.from_numpy(project_embeddings)
+        else:
+            self._project_embedding_matrix = self._get_normalized_embeddings([project.name for project in self._projects]).contiguous()
+
+    def extract_project(self, query: str, similarity_threshold: float = 0.5, query_embedding: torch.Tensor | None = None) -> IdentifiedProject | None:
+        """ Extracts the project from the query. The pooled embedding of the query is created only if it is not given and no name matches exactly. """
 
-    def extract_project(self, query: str, similarity_threshold: float = 0.5) -> IdentifiedProject | None:
         matched_projects = self.get_matched_projects(query)
 
         if matched_projects:
             return self._get_matched_project(matched_projects)
 
         # Step 2: If no exact match, fall back to similarity matching
-        project_match = self.extract_project_using_embeddings(query)
-        confidence = (project_match.similarity + 1) / 2
-
-        if confidence < similarity_threshold:
-            return None
-
-        return IdentifiedProject(project_match.name, project_match.id, confidence)
+        project_match = self.extract_project_using_embeddings(query, query_embedding)
+        return self._create_identified_project(project_match, similarity_threshold)
+
+    def extract_projects(self,
+                         queries: Sequence[str],
+                         similarity_threshold: float = 0.5,
+                         query_embeddings: torch.Tensor | None = None) -> List[IdentifiedProject | None]:
+        """
+        Extracts the projects for several queries. If the pooled embeddings of the queries (one row per query) are not given,
+        the queries without an exact match are embedded in a single forward pass.
+        """
+
+        result: List[IdentifiedProject | None] = [None] * len(queries)
+        unmatched_indexes: List[int] = []
+
+        for idx, query in enumerate(queries):
+            matched_projects = self.get_matched_projects(query)
+            if matched_projects:
+                result[idx] = self._get_matched_project(matched_projects)
+            else:
+                unmatched_indexes.append(idx)
+
+        unmatched_embeddings = query_embeddings[unmatched_indexes] if query_embeddings is not None else None
+        project_matches = self.extract_projects_using_embeddings([queries[idx] for idx in unmatched_indexes], unmatched_embeddings)
+        for idx, project_match in zip(unmatched_indexes, project_matches):
+            result[idx] = self._create_identified_project(project_match, similarity_threshold)
+
+        return result
 
     def get_matched_projects(self, query: str) -> Sequence[Project]:
         query = TextPreprocessorService.preprocess_text(query)
-        matched_projects = [project for project in self._sorted_projects_with_preprocessed_names if project.name in query]
+        matched_indexes = self._project_name_automaton.find_all(query)
+        matched_projects = [self._sorted_projects_with_preprocessed_names[idx] for idx in sorted(matched_indexes)]
 
         return matched_projects
 
-    def extract_project_using_embeddings(self, input_text: str) -> IdentifiedProject:
-        # Get embeddings for the input text
-        input_text = input_text.replace("\n", " ").replace("\r", " ").replace("\t", " ").strip()
+    def extract_project_using_embeddings(self, input_text: str, input_embedding: torch.Tensor | None = None) -> IdentifiedProject:
+        return self.extract_similar_projects(input_text, top_k=1, input_embedding=input_embedding)[0]
+
+    def extract_similar_projects(self, input_text: str, top_k: int = 5, input_embedding: torch.Tensor | None = None) -> List[IdentifiedProject]:
+        """ Returns the top_k projects most similar to the input text, ordered by descending cosine similarity. """
+
+        if input_embedding is None:
+            input_embedding = self._get_embeddings(self._clean_text(input_text))
+        input_embedding = F.normalize(input_embedding, dim=-1)
+
+        # Cosine similarities between the input text and each project name
+        similarities = self._project_embedding_matrix @ input_embedding
+        top_similarities, top_indexes = torch.topk(similarities, k=min(top_k, len(self._projects)))
 
-        input_embedding = self._get_embeddings(input_text)
+        return [self._create_project_match(int(idx), float(similarity)) for similarity, idx in zip(top_similarities, top_indexes)]
 
-        # Compute cosine similarities between input text and each project name
-        similarities: Sequence[float] = [cosine_similarity(input_embedding.unsqueeze(0), proj_emb.unsqueeze(0)).item() for proj_emb in self._project_embeddings]
+    def extract_projects_using_embeddings(self, input_texts: Sequence[str], input_embeddings: torch.Tensor | None = None) -> List[IdentifiedProject]:
+        if len(input_texts) == 0:
+            return []
 
-        max_similarity_value: float = max(similarities)
+        if input_embeddings is None:
+            input_embeddings = self._get_embeddings_batch([self._clean_text(input_text) for input_text in input_texts])
+        input_embeddings = F.normalize(input_embeddings, dim=-1)
+
+        # Rows are the input texts, columns are the projects
+        similarities = input_embeddings @ self._project_embedding_matrix.T
+        best_similarities, best_indexes = similarities.max(dim=1)
+
+        return [self._create_project_match(int(idx), float(similarity)) for similarity, idx in zip(best_similarities, best_indexes)]
+
+    def _create_project_match(self, project_index: int, similarity: float) -> IdentifiedProject:
+        project = self._projects[project_index]
+        return IdentifiedProject(project.name, project.id, similarity)
+
+    @staticmethod
+    def _clean_text(text: str) -> str:
+        return text.replace("\n", " ").replace("\r", " ").replace("\t", " ").strip()
+
+    def _create_identified_project(self, project_match: IdentifiedProject, similarity_threshold: float) -> IdentifiedProject | None:
+        confidence = (project_match.similarity + 1) / 2
+
+        if confidence < similarity_threshold:
+            return None
+
+        return IdentifiedProject(project_match.name, project_match.id, confidence)
 
-        # Find the most similar project name
-        best_match_index = similarities.index(max_similarity_value)
-        best_project = self._projects[best_match_index]
+    def _get_embeddings(self, text: str) -> torch.Tensor:
+        return self._embedding_provider.encode_pooled([text])[0]
 
-        return IdentifiedProject(best_project.name, best_project.id, max_similarity_value)
+    def _get_embeddings_batch(self, texts: Sequence[str]) -> torch.Tensor:
+        return self._embedding_provider.encode_pooled(texts)
 
-    # Tokenization function
-    def _get_embeddings(self, text: str):
-        inputs = self._tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            outputs = self._model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).squeeze()
+    def _get_normalized_embeddings(self, texts: Sequence[str]) -> torch.Tensor:
+        return F.normalize(self._get_embeddings_batch(texts), dim=-1)
 
     def _create_project_with_preprocessed_name(self, project: Project) -> Project:
         project_name = TextPreprocessorService.preprocess_text(project.name)
@@ -77,8 +147,8 @@ class ProjectIdentifierService:
         matched_project = matched_projects[0]
         confidence = 1  # Exact match, so confidence is 100%
 
-        for proj in self._projects:
-            if proj.id == matched_project.id:
-                return IdentifiedProject(proj.name, proj.id, confidence)
+        project = self._projects_by_id.get(matched_project.id)
+        if project is None:
+            raise Exception("Project not found.")
 
-        raise Exception("Project not found.")
+        return IdentifiedProject(project.name, project.id, confidence)
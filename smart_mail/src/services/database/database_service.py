@@ -27,6 +27,21 @@ class DatabaseService:
 
             return record
 
+    # Create several records in one transaction
+    def create_answers(self, data: List[dict[str, Any]]) -> List[AnswerModel]:
+        now = datetime.datetime.now()
+        records = [AnswerModel(**item) for item in data]
+        for record in records:
+            record.created_at = now
+            record.modified_at = now
+
+        # The generated ids are returned by the bulk insert, so the records do not need to be reloaded one by one
+        with Session(self._database_manager.engine, expire_on_commit=False) as session:
+            session.add_all(records)
+            session.commit()
+
+            return records
+
     def create_feedback(self, data: dict[str, Any]) -> UserFeedbackModel:
         record = UserFeedbackModel(**data)
 
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from elasticsearch import Elasticsearch, helpers
+
+from services.search_result import SearchResult
+
+
+class DocumentCache:
+    """
+    An in-process cache of the documents of the knowledge base, keyed by `document_id`.
+
+    All documents of the index are loaded at once, either from the index or from the optional snapshot file
+    (`snapshot_path`), and kept as `SearchResult` objects without a score. The cache is bound to the version
+    of the index: the name of the index behind the alias and the `_meta.content_version` of its mapping, which
+    the ingestion pipeline updates with every change of the documents. The version is checked at most every
+    `check_interval_seconds` seconds, a changed version reloads all documents.
+
+    An index with more than `max_documents` documents is not cached, `get_many` returns no documents then.
+
+    Attributes:
+        es_client (Elasticsearch): The Elasticsearch client used to load the documents.
+        index_name (str): The name of the index or the alias.
+        source_fields (List[str]): The fields of the cached documents.
+        max_documents (int): The maximum number of the cached documents.
+        check_interval_seconds (float): The minimum time between two checks of the index version in seconds.
+        snapshot_path (str | None): An optional JSON file with the documents of the last loaded version, so a restarted
+            process does not scan the index if the version has not changed.
+        version (str | None): The version of the index the documents were loaded from.
+        hits (int): The number of the documents found in the cache.
+        misses (int): The number of the documents not found in the cache.
+    """
+
+    def __init__(self,
+                 es_client: Elasticsearch,
+                 index_name: str,
+                 source_fields: List[str],
+                 max_documents: int = 100000,
+                 check_interval_seconds: float = 30.0,
+                 snapshot_path: str | None = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.es_client = es_client
+        self.index_name = index_name
+        self.source_fields = source_fields
+        self.max_documents = max_documents
+        self.check_interval_seconds = check_interval_seconds
+        self.snapshot_path = snapshot_path
+        self.version: str | None = None
+        self.hits = 0
+        self.misses = 0
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._documents: Dict[str, SearchResult] = {}
+        self._checked_at: float | None = None
+
+    def load(self) -> None:
+        """ Loads the documents of the current version of the index. """
+
+        with self._load_lock:
+            version = self._get_index_version()
+            self._load(version)
+
+    def get_many(self, document_ids: Sequence[str]) -> Dict[str, SearchResult]:
+        """
+        Returns the cached documents by their ids, the documents missed in the cache are not included.
+        The scores of the returned documents are 0, the callers copy the documents with their own scores.
+        """
+        self._reload_if_changed()
+
+        with self._lock:
+            documents = {document_id: self._documents[document_id] for document_id in document_ids if document_id in self._documents}
+            self.hits += len(documents)
+            self.misses += len(document_ids) - len(documents)
+
+        return documents
+
+    def statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._documents),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def _reload_if_changed(self) -> None:
+        now = self._clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval_seconds:
+            return
+
+        # A single thread checks the version, the other threads use the loaded documents meanwhile
+        if not self._load_lock.acquire(blocking=False):
+            return
+
+        try:
+            self._checked_at = now
+            version = self._get_index_version()
+            if version != self.version:
+                self._load(version)
+        finally:
+            self._load_lock.release()
+
+    def _load(self, version: str) -> None:
+        sources = self._read_snapshot(version)
+        if sources is None:
+            sources = self._read_index()
+            if sources is not None:
+                self._write_snapshot(version, sources)
+
+        documents = {source["document_id"]: SearchResult.create(0.0, source) for source in sources or []}
+
+        with self._lock:
+            self._documents = documents
+            self.version = version
+            self._checked_at = self._clock()
+
+    def _get_index_version(self) -> str:
+        response = self.es_client.indices.get_mapping(index=self.index_name)
+
+        # The alias resolves to the index it points to
+        index_name = next(iter(response))
+        content_version = response[index_name]["mappings"].get("_meta", {}).get("content_version")
+
+        return f"{index_name}/{content_version}"
+
+    def _read_index(self) -> List[Dict[str, Any]] | None:
+        if self.es_client.count(index=self.index_name)["count"] > self.max_documents:
+            return None
+
+        hits = helpers.scan(self.es_client, index=self.index_name, query={"query": {"match_all": {}}, "_source": self.source_fields})
+        return [hit["_source"] for hit in hits]
+
+    def _read_snapshot(self, version: str) -> List[Dict[str, Any]] | None:
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return None
+
+        with open(self.snapshot_path, encoding="utf-8") as file:
+            snapshot = json.load(file)
+
+        return snapshot["documents"] if snapshot.get("version") == version else None
+
+    def _write_snapshot(self, version: str, sources: List[Dict[str, Any]]) -> None:
+        if self.snapshot_path is None:
+            return
+
+        # The snapshot is replaced atomically, a process that starts meanwhile reads the previous snapshot
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"version": version, "documents": sources}, file, ensure_ascii=False)
+        os.replace(temporary_path, self.snapshot_path)
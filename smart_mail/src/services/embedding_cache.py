@@ -0,0 +1,240 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    A bounded cache for query embeddings.
+
+    The entries are keyed on the text and the name of the embedding model, so a changed model never returns stale vectors.
+    The text is lowercased and its whitespaces are collapsed unless `normalize_texts` is disabled, e.g. for a cased model.
+    The in-memory layer evicts the least recently used entries when `max_size` is reached and drops entries older than `ttl_seconds`.
+    The optional on-disk layer (an SQLite file) keeps the entries across process restarts, so a restarted worker comes back warm.
+    The expired rows of the file are deleted on open and every `PURGE_INTERVAL_WRITES` writes, then the oldest rows above
+    `max_disk_size` are deleted too, so the file does not grow without limit.
+
+    Attributes:
+        model_name (str): The name of the embedding model the vectors were created with.
+        max_size (int): The maximum number of entries kept in memory.
+        ttl_seconds (float): The time to live of an entry in seconds.
+        max_disk_size (int): The maximum number of rows kept in the SQLite file.
+        normalize_texts (bool): Whether the texts are normalized for the keys.
+        hits (int): The number of lookups answered from the memory or the disk layer.
+        misses (int): The number of lookups that required encoding the text.
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 max_size: int = 1024,
+                 ttl_seconds: float = 3600.0,
+                 path: str | None = None,
+                 clock: Callable[[], float] = time.time,
+                 max_disk_size: int = 100000,
+                 normalize_texts: bool = True) -> None:
+        if max_size <= 0:
+            raise ValueError("The cache size must be greater than zero.")
+
+        if max_disk_size <= 0:
+            raise ValueError("The disk cache size must be greater than zero.")
+
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_size = max_disk_size
+        self.normalize_texts = normalize_texts
+        self.hits = 0
+        self.misses = 0
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, np.ndarray]] = OrderedDict()
+        self._connection = self._create_connection(path) if path else None
+        self._writes_since_purge = 0
+
+        if self._connection is not None:
+            self._purge(self._clock())
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(text.lower().split())
+
+    PURGE_INTERVAL_WRITES = 100
+
+    def get_or_create(self, text: str, encode: Callable[[str], Any]) -> np.ndarray:
+        """
+        Returns the cached embedding of the text or encodes the text and caches the result.
+
+        Args:
+            text (str): The text to encode.
+            encode (Callable[[str], Any]): The function that creates the embedding on a cache miss, e.g. `SentenceTransformer.encode`.
+
+        Returns:
+            np.ndarray: The embedding as a read-only float32 vector.
+        """
+        key = self._create_key(text)
+
+        vector = self._get(key)
+        if vector is not None:
+            return vector
+
+        vector = np.asarray(encode(text), dtype=np.float32)
+        vector.setflags(write=False)
+        self._set(key, vector)
+
+        return vector
+
+    def get_or_create_many(self, texts: List[str], encode_batch: Callable[[List[str]], Any]) -> List[np.ndarray]:
+        """
+        Returns the embeddings of the texts. The cache misses are encoded with a single call of `encode_batch`.
+
+        Args:
+            texts (List[str]): The texts to encode.
+            encode_batch (Callable[[List[str]], Any]): The function that encodes a list of texts, e.g. `SentenceTransformer.encode`.
+
+        Returns:
+            List[np.ndarray]: The embeddings as read-only float32 vectors in the order of the texts.
+        """
+        keys = [self._create_key(text) for text in texts]
+        vectors: List[np.ndarray | None] = [self._get(key) for key in keys]
+
+        # Repeated texts in the same batch are encoded once.
+        missed_texts: Dict[str, str] = {keys[idx]: texts[idx] for idx, vector in enumerate(vectors) if vector is None}
+        if missed_texts:
+            missed_vectors = np.asarray(encode_batch(list(missed_texts.values())), dtype=np.float32)
+            created_vectors: Dict[str, np.ndarray] = {}
+
+            for key, vector in zip(missed_texts.keys(), missed_vectors):
+                vector.setflags(write=False)
+                created_vectors[key] = vector
+
+            self._set_many(created_vectors)
+
+            vectors = [vector if vector is not None else created_vectors[key] for key, vector in zip(keys, vectors)]
+
+        return [vector for vector in vectors if vector is not None]
+
+    def statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM embeddings")
+                self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _get(self, key: str) -> np.ndarray | None:
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+
+            disk_entry = self._get_from_disk(key, now)
+            if disk_entry is not None:
+                self._put_in_memory(key, disk_entry[0], disk_entry[1])
+                self.hits += 1
+                return disk_entry[1]
+
+            self.misses += 1
+            return None
+
+    def _set(self, key: str, vector: np.ndarray) -> None:
+        self._set_many({key: vector})
+
+    def _set_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        now = self._clock()
+
+        with self._lock:
+            for key, vector in vectors.items():
+                self._put_in_memory(key, now, vector)
+
+            if self._connection is not None:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, created_at, vector) VALUES (?, ?, ?)",
+                    [(key, now, vector.tobytes()) for key, vector in vectors.items()]
+                )
+                self._connection.commit()
+
+                self._writes_since_purge += len(vectors)
+                if self._writes_since_purge >= self.PURGE_INTERVAL_WRITES:
+                    self._purge(now)
+
+    def _purge(self, now: float) -> None:
+        """ Deletes the expired rows and the oldest rows above `max_disk_size` from the SQLite file. """
+
+        if self._connection is None:
+            return
+
+        self._connection.execute("DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_size,)
+        )
+        self._connection.commit()
+        self._writes_since_purge = 0
+
+    def _put_in_memory(self, key: str, created_at: float, vector: np.ndarray) -> None:
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _get_from_disk(self, key: str, now: float) -> Tuple[float, np.ndarray] | None:
+        if self._connection is None:
+            return None
+
+        row = self._connection.execute("SELECT created_at, vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        created_at, vector_bytes = row
+        if now - created_at > self.ttl_seconds:
+            self._connection.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._connection.commit()
+            return None
+
+        vector = np.frombuffer(vector_bytes, dtype=np.float32)
+        return created_at, vector
+
+    def _create_key(self, text: str) -> str:
+        value = f"{self.model_name}\0{self.normalize(text) if self.normalize_texts else text}"
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _create_connection(path: str) -> sqlite3.Connection:
+        # The connection is shared between the retrieval threads, access to it is serialized by the cache lock.
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created_at REAL NOT NULL, vector BLOB NOT NULL)")
+        # The purge deletes the rows by their age
+        connection.execute("CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)")
+        connection.commit()
+        return connection
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from services.embedding_cache import EmbeddingCache
+
+
+class EmbeddingProvider:
+    """
+    Provides embeddings of a single SentenceTransformer model to all services of a process.
+
+    A single forward pass creates two embeddings of a text:
+        - the sentence embedding (the output of the full model), used by the vector search;
+        - the pooled embedding (the mean of the token embeddings before the dense layer of the model), used by the project identification.
+
+    `encode_with_pooled` returns both embeddings, so the email handler encodes an email once and passes the embeddings
+    to the project identification and to the retrieval.
+
+    With the optional cache, both embeddings of a text are cached as one row (the sentence embedding followed by the
+    pooled embedding) and only the texts missed in the cache are encoded. The model is cased, so the cache must be
+    created with `normalize_texts=False` and the name of the representation (`CACHE_REPRESENTATION`).
+
+    Attributes:
+        model_name (str): The name of the embedding model.
+        cache (EmbeddingCache | None): An optional cache of the embeddings.
+    """
+
+    CACHE_REPRESENTATION = "sentence+mean-pooled"
+
+    def __init__(self, model: SentenceTransformer, model_name: str, cache: EmbeddingCache | None = None) -> None:
+        self.model_name = model_name
+        self.cache = cache
+        self._model = model
+        # The rows of the cache are split into the sentence and the pooled embedding at the sentence embedding dimension
+        self._sentence_dimension = model.get_sentence_embedding_dimension() if cache is not None else None
+
+        if cache is not None and self._sentence_dimension is None:
+            raise ValueError(f"The sentence embedding dimension of the model {model_name} is unknown, the embeddings cannot be cached.")
+
+    def encode(self, texts: str | List[str]) -> np.ndarray:
+        """
+        Creates the sentence embeddings of the texts. The signature follows `SentenceTransformer.encode`.
+
+        Args:
+            texts (str | List[str]): A text or a list of texts.
+
+        Returns:
+            np.ndarray: A float32 vector for a single text, or a matrix with one row per text.
+        """
+        if isinstance(texts, str):
+            return self.encode_with_pooled([texts])[0][0]
+
+        return self.encode_with_pooled(texts)[0]
+
+    def encode_pooled(self, texts: Sequence[str]) -> torch.Tensor:
+        """ Creates the mean-pooled token embeddings of the texts as a matrix with one row per text. """
+
+        return self.encode_with_pooled(texts)[1]
+
+    def encode_with_pooled(self, texts: Sequence[str]) -> Tuple[np.ndarray, torch.Tensor]:
+        """
+        Creates the sentence embeddings and the mean-pooled token embeddings of the texts in one forward pass.
+
+        Args:
+            texts (Sequence[str]): The texts to encode.
+
+        Returns:
+            Tuple[np.ndarray, torch.Tensor]: The float32 matrix of the sentence embeddings and the matrix of the pooled embeddings, one row per text.
+        """
+        if len(texts) == 0:
+            return np.empty((0, 0), dtype=np.float32), torch.empty((0, 0))
+
+        if self.cache is None:
+            return self._encode(texts)
+
+        rows = np.stack(self.cache.get_or_create_many(list(texts), self._encode_rows))
+
+        sentence_embeddings = rows[:, :self._sentence_dimension]
+        sentence_embeddings.setflags(write=False)
+
+        return sentence_embeddings, torch.from_numpy(rows[:, self._sentence_dimension:].copy())
+
+    def _encode_rows(self, texts: List[str]) -> np.ndarray:
+        """ Creates the rows of the cache, the sentence embeddings followed by the pooled embeddings. """
+
+        sentence_embeddings, pooled_embeddings = self._encode(texts)
+        return np.concatenate([sentence_embeddings, pooled_embeddings.numpy().astype(np.float32)], axis=1)
+
+    def _encode(self, texts: Sequence[str]) -> Tuple[np.ndarray, torch.Tensor]:
+        outputs: List[Dict[str, Any]] = self._model.encode(list(texts), output_value=None)  # type: ignore
+        embeddings = [self._create_embeddings(output) for output in outputs]
+
+        sentence_embeddings = np.stack([sentence_embedding for sentence_embedding, _ in embeddings])
+        sentence_embeddings.setflags(write=False)
+
+        return sentence_embeddings, torch.stack([pooled_embedding for _, pooled_embedding in embeddings])
+
+    @staticmethod
+    def _create_embeddings(output: Dict[str, Any]) -> Tuple[np.ndarray, torch.Tensor]:
+        sentence_embedding = output["sentence_embedding"].detach().cpu().numpy().astype(np.float32)
+
+        # Average over the real tokens only, the padding added by the batch must not change the embedding
+        token_embeddings = output["token_embeddings"].detach().cpu()
+        attention_mask = output["attention_mask"].detach().cpu().unsqueeze(-1).to(token_embeddings.dtype)
+        pooled_embedding = (token_embeddings * attention_mask).sum(dim=0) / attention_mask.sum(dim=0)
+
+        return sentence_embedding, pooled_embedding
@@ -1,9 +1,10 @@
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Generator, List
 from mypy_boto3_bedrock_runtime import BedrockRuntimeClient
 from common.settings import Settings
 from services.generation.generation_result import GenerationResult
 from services.generation.generation_service import GenerationService
+from services.generation.generation_stream import GenerationStream
 
 
 class AwsGenerationService(GenerationService):
@@ -18,6 +19,8 @@ class AwsGenerationService(GenerationService):
     Methods:
         get_answer(prompt: str) -> GenerationResult:
             Generates a text response based on the given prompt using the AWS Bedrock Runtime.
+        stream_answer(prompt: str) -> GenerationStream:
+            Yields the text of the response as it is generated by the AWS Bedrock Runtime.
     """
 
     def __init__(self, settings: Settings, bedrock_runtime_client: BedrockRuntimeClient) -> None:
@@ -26,18 +29,7 @@ class AwsGenerationService(GenerationService):
 
     def get_answer(self, prompt: str) -> GenerationResult:
         model = self._settings.aws_model_name
-
-        # See https://docs.aws.amazon.com/bedrock/latest/userguide/bedrock-runtime_example_bedrock-runtime_InvokeModel_AnthropicClaude_section.html
-        request: Dict[str, Any] = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 2048,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"type": "text", "text": prompt}],
-                }
-            ]
-        }
+        request = self._create_request(prompt)
 
         response = self._bedrock_runtime_client.invoke_model(
             modelId=model,
@@ -49,7 +41,7 @@ class AwsGenerationService(GenerationService):
         body_as_plain_text = response.get("body").read()
         response_body = json.loads(body_as_plain_text)
 
-        config_for_logging: Dict[str, Any] = {k: v for k, v in request.items() if k != "messages"}
+        config_for_logging: Dict[str, Any] = self._get_config_for_logging(request)
 
         generation_result = GenerationResult(
             input_text_token_count=response_body["usage"]["input_tokens"],
@@ -59,3 +51,65 @@ class AwsGenerationService(GenerationService):
             text_generation_config=config_for_logging
         )
         return generation_result
+
+    def stream_answer(self, prompt: str) -> GenerationStream:
+        return GenerationStream(self._generate(prompt))
+
+    def _generate(self, prompt: str) -> Generator[str, None, GenerationResult]:
+        request = self._create_request(prompt)
+
+        # See https://docs.aws.amazon.com/bedrock/latest/userguide/bedrock-runtime_example_bedrock-runtime_InvokeModelWithResponseStream_AnthropicClaude_section.html
+        response = self._bedrock_runtime_client.invoke_model_with_response_stream(
+            modelId=self._settings.aws_model_name,
+            contentType="application/json",
+            accept="*/*",
+            body=json.dumps(request)
+        )
+
+        chunks: List[str] = []
+        input_tokens = 0
+        output_tokens = 0
+        stop_reason = ""
+
+        # The events follow the Anthropic Messages streaming format
+        for event in response["body"]:
+            if "chunk" not in event or "bytes" not in event["chunk"]:
+                continue
+
+            chunk = json.loads(event["chunk"]["bytes"])
+
+            if chunk["type"] == "message_start":
+                input_tokens = chunk["message"]["usage"]["input_tokens"]
+            elif chunk["type"] == "content_block_delta" and chunk["delta"]["type"] == "text_delta":
+                chunks.append(chunk["delta"]["text"])
+                yield chunk["delta"]["text"]
+            elif chunk["type"] == "message_delta":
+                stop_reason = chunk["delta"].get("stop_reason") or ""
+                output_tokens = chunk["usage"]["output_tokens"]
+
+        generation_result = GenerationResult(
+            input_text_token_count=input_tokens,
+            token_count=output_tokens,
+            completion_reason=stop_reason.strip(),
+            output_text="".join(chunks).strip(),
+            text_generation_config=self._get_config_for_logging(request)
+        )
+        return generation_result
+
+    @staticmethod
+    def _create_request(prompt: str) -> Dict[str, Any]:
+        # See https://docs.aws.amazon.com/bedrock/latest/userguide/bedrock-runtime_example_bedrock-runtime_InvokeModel_AnthropicClaude_section.html
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2048,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": prompt}],
+                }
+            ]
+        }
+
+    @staticmethod
+    def _get_config_for_logging(request: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in request.items() if k != "messages"}
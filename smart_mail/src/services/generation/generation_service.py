@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from services.generation.generation_result import GenerationResult
+from services.generation.generation_stream import GenerationStream
 
 
 class GenerationService(ABC):
@@ -16,3 +17,24 @@ class GenerationService(ABC):
             GenerationResult: The result of the text generation, including token counts and the generated text.
         """
         pass
+
+    def stream_answer(self, prompt: str) -> GenerationStream:
+        """
+        Generates a text response based on the given prompt and yields the text while it is generated.
+
+        The default implementation yields the complete answer at once, the services of the LLMs with a streaming API
+        override the method.
+
+        Args:
+            prompt (str): The input text prompt for generating the response.
+
+        Returns:
+            GenerationStream: The chunks of the generated text, the result of the text generation is set at the end of the stream.
+        """
+
+        def generate():
+            generation_result = self.get_answer(prompt)
+            yield generation_result.output_text
+            return generation_result
+
+        return GenerationStream(generate())
@@ -0,0 +1,42 @@
+from typing import Generator, Iterator
+
+from services.generation.generation_result import GenerationResult
+
+
+class GenerationStream:
+    """
+    The text of an answer that is generated by an LLM, chunk by chunk.
+
+    The stream yields the text chunks (e.g. tokens) as they arrive. When the stream is consumed to the end,
+    `result` contains the complete answer with the token counts, like the result of `GenerationService.get_answer`.
+
+    Attributes:
+        result (GenerationResult | None): The result of the generation, set when the stream is consumed to the end.
+    """
+
+    def __init__(self, chunks: Generator[str, None, GenerationResult]) -> None:
+        self.result: GenerationResult | None = None
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[str]:
+        # A stream that was already consumed returns no result again
+        if self.result is not None:
+            return
+
+        self.result = yield from self._chunks
+
+    def get_result(self) -> GenerationResult:
+        """
+        Consumes the rest of the stream and returns the result of the generation.
+
+        Raises:
+            RuntimeError: If the chunks were closed before the end of the stream, so the generation has no result.
+        """
+
+        for _ in self:
+            pass
+
+        if self.result is None:
+            raise RuntimeError("The generation stream was closed before its end and has no result.")
+
+        return self.result
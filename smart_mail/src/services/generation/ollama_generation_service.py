@@ -1,10 +1,11 @@
-from typing import Any, Dict
+from typing import Any, Dict, Generator, List
 import requests
 import json
 
 from common.settings import Settings
 from services.generation.generation_result import GenerationResult
 from services.generation.generation_service import GenerationService
+from services.generation.generation_stream import GenerationStream
 
 
 class OllamaGenerationService(GenerationService):
@@ -19,46 +20,57 @@ class OllamaGenerationService(GenerationService):
     Methods:
         get_answer(prompt: str) -> GenerationResult:
             Generates a text response based on the given prompt using the local LLM.
+        stream_answer(prompt: str) -> GenerationStream:
+            Yields the tokens of the response as they are generated by the local LLM.
     """
 
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
 
     def get_answer(self, prompt: str) -> GenerationResult:
+        return self.stream_answer(prompt).get_result()
+
+    def stream_answer(self, prompt: str) -> GenerationStream:
+        return GenerationStream(self._generate(prompt))
+
+    def _generate(self, prompt: str) -> Generator[str, None, GenerationResult]:
 
         data: Dict[str, Any] = {
             "model": self._settings.local_llm_model_name,
             "prompt": prompt
         }
 
+        # Ollama streams the response as NDJSON, one line per token
         response = requests.post(self._settings.local_llm_url, json=data, stream=True)
 
         if response.status_code != 200:
             raise Exception(f"Error: {response.status_code} - {response.text}")
 
-        result = ""
+        chunks: List[str] = []
         prompt_eval_count = 0
         eval_count = 0
 
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode('utf-8')
-                response_data = json.loads(decoded_line)
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    decoded_line = line.decode('utf-8')
+                    response_data = json.loads(decoded_line)
 
-                if 'response' in response_data:
-                    result += response_data['response']
+                    if response_data.get('response'):
+                        chunks.append(response_data['response'])
+                        yield response_data['response']
 
-                if 'prompt_eval_count' in response_data:
-                    prompt_eval_count = response_data['prompt_eval_count']
+                    if 'prompt_eval_count' in response_data:
+                        prompt_eval_count = response_data['prompt_eval_count']
 
-                if 'eval_count' in response_data:
-                    eval_count = response_data['eval_count']
+                    if 'eval_count' in response_data:
+                        eval_count = response_data['eval_count']
 
         generation_result = GenerationResult(
             input_text_token_count=prompt_eval_count,
             token_count=eval_count,
             completion_reason="",
-            output_text=result.strip(),
+            output_text="".join(chunks).strip(),
             text_generation_config={},
         )
         return generation_result
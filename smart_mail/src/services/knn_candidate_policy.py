@@ -0,0 +1,134 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from elasticsearch import Elasticsearch
+
+
+class FilterSelectivityEstimator:
+    """
+    Estimates the share of the documents of an index that match a filter.
+
+    The share is the ratio of two `_count` requests (the filter and the whole index). The estimates are cached per filter,
+    the filters of the retrieval depend only on the customer project and the authorization ids, so a few entries cover most requests.
+
+    Attributes:
+        es_client (Elasticsearch): The Elasticsearch client used for the `_count` requests.
+        index_name (str): The name of the index or the alias.
+        ttl_seconds (float): The time to live of an estimate in seconds, the documents of the index change with every ingestion.
+        max_size (int): The maximum number of the cached estimates.
+    """
+
+    def __init__(self,
+                 es_client: Elasticsearch,
+                 index_name: str,
+                 ttl_seconds: float = 300.0,
+                 max_size: int = 1024,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.es_client = es_client
+        self.index_name = index_name
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    def estimate(self, filter_query: Dict[str, Any]) -> float:
+        """
+        Returns the share of the documents matched by the filter, a value between 0 and 1.
+        An empty index is treated as if the filter matched every document.
+        """
+        key = json.dumps(filter_query, sort_keys=True)
+
+        selectivity = self._get(key)
+        if selectivity is not None:
+            return selectivity
+
+        total_count = self.es_client.count(index=self.index_name)["count"]
+        matched_count = self.es_client.count(index=self.index_name, query=filter_query)["count"]
+        selectivity = min(matched_count / total_count, 1.0) if total_count > 0 else 1.0
+
+        self._set(key, selectivity)
+        return selectivity
+
+    def _get(self, key: str) -> float | None:
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _set(self, key: str, selectivity: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), selectivity)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class KnnCandidatePolicy:
+    """
+    Chooses the number of the candidates per shard (`num_candidates`) of a kNN search.
+
+    The cost of a kNN search grows with the number of the candidates, the recall stops growing once there are enough of them.
+    A fixed `num_candidates` is used as is. Otherwise the number is `k * candidates_per_result`, divided by the estimated
+    selectivity of the filter: a filter that matches 10% of the documents needs ten times more candidates to find `k` matches
+    in the HNSW graph. The result is kept between `min_num_candidates` and `max_num_candidates` and is never less than `k`.
+
+    Attributes:
+        num_candidates (int | None): A fixed number of the candidates. If it is set, the adaptive policy is not used.
+        candidates_per_result (float): The number of the candidates per requested result for a filter that matches every document.
+        min_num_candidates (int): The lower bound of the adaptive number of the candidates.
+        max_num_candidates (int): The upper bound of the number of the candidates.
+        selectivity_estimator (FilterSelectivityEstimator | None): The estimator of the filter selectivity.
+            Without an estimator, every filter is assumed to match all documents.
+    """
+
+    # The limit of Elasticsearch for `num_candidates`
+    MAX_NUM_CANDIDATES = 10000
+
+    # A filter that matches almost no documents would push every search to the upper bound because of a single rare project
+    MIN_SELECTIVITY = 0.001
+
+    def __init__(self,
+                 num_candidates: int | None = None,
+                 candidates_per_result: float = 10.0,
+                 min_num_candidates: int = 100,
+                 max_num_candidates: int = MAX_NUM_CANDIDATES,
+                 selectivity_estimator: FilterSelectivityEstimator | None = None) -> None:
+        if candidates_per_result < 1:
+            raise ValueError("The number of the candidates per result must be at least 1.")
+
+        if not 0 < min_num_candidates <= max_num_candidates <= self.MAX_NUM_CANDIDATES:
+            raise ValueError(f"The bounds of the number of the candidates must satisfy 0 < min <= max <= {self.MAX_NUM_CANDIDATES}.")
+
+        self.num_candidates = num_candidates
+        self.candidates_per_result = candidates_per_result
+        self.min_num_candidates = min_num_candidates
+        self.max_num_candidates = max_num_candidates
+        self.selectivity_estimator = selectivity_estimator
+
+    def get_num_candidates(self, k: int, filter_query: Dict[str, Any]) -> int:
+        """
+        Returns the number of the candidates for a kNN search of `k` results with the filter.
+        """
+        if self.num_candidates is not None:
+            return min(max(self.num_candidates, k), self.MAX_NUM_CANDIDATES)
+
+        selectivity = self.selectivity_estimator.estimate(filter_query) if self.selectivity_estimator is not None else 1.0
+        num_candidates = math.ceil(k * self.candidates_per_result / max(selectivity, self.MIN_SELECTIVITY))
+
+        return max(min(max(num_candidates, self.min_num_candidates), self.max_num_candidates), k)
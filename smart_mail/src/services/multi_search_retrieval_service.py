@@ -0,0 +1,35 @@
+from typing import Any, List
+
+from services.retrieval_result import RetrievalResult
+from services.retrieval_service import RetrievalService
+
+
+class MultiSearchRetrievalService(RetrievalService):
+    """
+    A retrieval service that sends the text and the kNN searches to Elasticsearch in a single `_msearch` request.
+
+    The search bodies are the same as in `RetrievalService`, but both of them are packed into one HTTP request,
+    so every retrieval costs one round trip to the Elasticsearch cluster instead of two.
+    The responses are split back into `text_result_items` and `vector_result_items`.
+    """
+
+    def _retrieve(self,
+                  user_question: str,
+                  number_of_results: int,
+                  vector_field_name: str,
+                  customer_project_id: str | None,
+                  authorization_ids: List[str],
+                  query_vector: Any = None) -> RetrievalResult:
+
+        if query_vector is None:
+            query_vector = self._encode_question(user_question)
+
+        text_body = self._create_text_search_body(user_question, number_of_results, customer_project_id, authorization_ids)
+        knn_body = self._create_knn_search_body(query_vector, number_of_results, vector_field_name, customer_project_id, authorization_ids)
+
+        responses = self._multi_search([text_body, knn_body])
+
+        return RetrievalResult(
+            text_result_items=self._create_search_results(responses[0]),
+            vector_result_items=self._create_search_results(responses[1])
+        )
@@ -1,7 +1,9 @@
-import math
+import heapq
+from dataclasses import replace
+from operator import itemgetter
 from services.retrieval_result import RetrievalResult
 from services.search_result import SearchResult
-from typing import Dict, List
+from typing import Dict, List, Sequence
 
 
 class ReciprocalRankFusionService:
@@ -9,18 +11,34 @@ class ReciprocalRankFusionService:
     Reciprocal rank fusion service.
     This class represents a service for performing reciprocal rank fusion.
     It is used to combine the rankings of multiple search engines or recommendation systems into a single ranking.
-    The fusion is based on the reciprocal ranks of the items in the rankings.
+    The fusion is based on the reciprocal ranks of the items in the rankings: a document at the rank `r` of a list with
+    the weight `w` scores `w / (k + r)`, the scores of all lists are summed up.
     See the following link to get more details https://www.elastic.co/guide/en/elasticsearch/reference/current/rrf.html to get more details.
+
+    Attributes:
+        k (int): The rank constant, a greater value lowers the influence of the top ranks.
+        text_weight (float): The weight of the text search results in `rerank`.
+        vector_weight (float): The weight of the vector search results in `rerank`.
     """
 
-    def rerank(self, retrieval_result: RetrievalResult) -> List[SearchResult]:
+    def __init__(self, k: int = 60, text_weight: float = 1.0, vector_weight: float = 1.0) -> None:
+        if k <= 0:
+            raise ValueError("The rank constant must be greater than zero.")
+
+        self.k = k
+        self.text_weight = text_weight
+        self.vector_weight = vector_weight
+
+    def rerank(self, retrieval_result: RetrievalResult, number_of_results: int | None = None) -> List[SearchResult]:
         """
         Re-rank the search results using the reciprocal rank fusion algorithm.
 
         Parameters
         ----------
         retrieval_result : RetrievalResult
-            The search result to be re-ranked.
+            The search result to be re-ranked, it is not modified.
+        number_of_results : int | None
+            The number of the returned top results, all results by default.
 
         Returns
         -------
@@ -28,74 +46,61 @@ class ReciprocalRankFusionService:
             The re-ranked search result.
         """
 
-        document_ids = self._get_document_ids(retrieval_result)
-
-        if len(document_ids) == 0:
-            return []
-
-        reciprocal_ranks = self._get_reciprocal_ranks(retrieval_result, document_ids)
-        return self._rerank_search_results(retrieval_result, reciprocal_ranks)
-
-    def _rerank_search_results(self, retrieval_result: RetrievalResult, reciprocal_ranks: Dict[str, float]) -> List[SearchResult]:
-        result: List[SearchResult] = []
-
-        retrieval_result_as_list = retrieval_result.vector_result_items
-        retrieval_result_as_list.extend(retrieval_result.text_result_items)
-
-        ordered_rrf = sorted(reciprocal_ranks.items(), key=lambda x: x[1], reverse=True)
-
-        for doc_id, rank in ordered_rrf:
-            for item in retrieval_result_as_list:
-                if item.document_id == doc_id:
-                    search_result = SearchResult(
-                        score=rank,
-                        category=item.category,
-                        question=item.question,
-                        answer=item.answer,
-                        document_id=item.document_id,
-                        answer_instructions=item.answer_instructions,
-                        project_id=item.project_id,
-                        project_name=item.project_name,
-                        authorization_id=item.authorization_id
-                    )
-
-                    result.append(search_result)
-                    break
-
-        return result
-
-    def _get_reciprocal_ranks(self, retrieval_result: RetrievalResult, document_ids: set[str], k: int = 60) -> Dict[str, float]:
-        result: Dict[str, float] = {}
+        # The fields of a document found by both searches are taken from the vector search result
+        return self.fuse(
+            [retrieval_result.vector_result_items, retrieval_result.text_result_items],
+            [self.vector_weight, self.text_weight],
+            number_of_results
+        )
+
+    def fuse(self,
+             ranked_lists: Sequence[Sequence[SearchResult]],
+             weights: Sequence[float] | None = None,
+             number_of_results: int | None = None) -> List[SearchResult]:
+        """
+        Fuses any number of ranked lists of search results in a single pass over the lists.
 
-        for document_id in document_ids:
-            score = self._get_reciprocal_rank(retrieval_result, document_id, k)
-            result[document_id] = score
+        Parameters
+        ----------
+        ranked_lists : Sequence[Sequence[SearchResult]]
+            The ranked lists, e.g. the results of several retrievers. A document repeated in a list counts with its best rank.
+        weights : Sequence[float] | None
+            The weights of the lists, 1 for every list by default.
+        number_of_results : int | None
+            The number of the returned top results, all results by default.
 
-        return result
+        Returns
+        -------
+        List[SearchResult]
+            Copies of the search results with the fused scores, ordered by the score. The fields of a document are taken
+            from the first list that contains it, the documents with equal scores keep the order of their first occurrence.
+        """
 
-    def _get_reciprocal_rank(self, retrieval_result: RetrievalResult, document_id: str, k: int) -> float:
-        score = 0.0
+        if weights is None:
+            weights = [1.0] * len(ranked_lists)
 
-        rank: float = self._get_document_rank(document_id, retrieval_result.text_result_items)
-        score += 1.0 / (k + rank)
-        rank = self._get_document_rank(document_id, retrieval_result.vector_result_items)
-        score += 1.0 / (k + rank)
-        return score
+        if len(weights) != len(ranked_lists):
+            raise ValueError(f"Expected {len(ranked_lists)} weights, but got {len(weights)}.")
 
-    def _get_document_rank(self, document_id: str, search_results: List[SearchResult]) -> float:
-        for idx, doc in enumerate(search_results):
-            if document_id is doc.document_id:
-                return idx + 1
+        scores: Dict[str, float] = {}
+        search_results: Dict[str, SearchResult] = {}
 
-        return math.inf
+        for ranked_list, weight in zip(ranked_lists, weights):
+            ranked_document_ids: set[str] = set()
 
-    def _get_document_ids(self, retrieval_result: RetrievalResult) -> set[str]:
-        document_ids: set[str] = set()
+            for rank, search_result in enumerate(ranked_list, start=1):
+                document_id = search_result.document_id
+                if document_id in ranked_document_ids:
+                    continue
 
-        for text_item in retrieval_result.text_result_items:
-            document_ids.add(text_item.document_id)
+                ranked_document_ids.add(document_id)
+                scores[document_id] = scores.get(document_id, 0.0) + weight / (self.k + rank)
+                search_results.setdefault(document_id, search_result)
 
-        for vector_item in retrieval_result.vector_result_items:
-            document_ids.add(vector_item.document_id)
+        # Both sorts are stable, so the ties keep the order of the first occurrence
+        if number_of_results is None:
+            ordered_scores = sorted(scores.items(), key=itemgetter(1), reverse=True)
+        else:
+            ordered_scores = heapq.nlargest(number_of_results, scores.items(), key=itemgetter(1))
 
-        return document_ids
+        return [replace(search_results[document_id], score=score) for document_id, score in ordered_scores]
@@ -1,10 +1,18 @@
-from typing import Any, Dict, List
+import contextvars
+from concurrent.futures import Executor
+from dataclasses import replace
+from typing import Any, Dict, List, Sequence
 from uuid import UUID
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from torch import Tensor
 from common.settings import Settings
+from dtos.retrieval_request import RetrievalRequest
+from services.document_cache import DocumentCache
+from services.embedding_provider import EmbeddingProvider
+from services.knn_candidate_policy import KnnCandidatePolicy
 from services.search_result import SearchResult
+from services.tracing.request_trace import trace_span
 from elasticsearch import Elasticsearch
 
 from services.retrieval_result import RetrievalResult
@@ -15,33 +23,55 @@ class RetrievalService:
     A service for retrieving search results from an Elasticsearch index using both text-based and vector-based search methods.
 
     This class provides methods to search for user queries in an Elasticsearch index, leveraging both traditional text search and vector search using embeddings.
-    It integrates with Elasticsearch for text search and SentenceTransformer for generating query embeddings for vector search.
+    It integrates with Elasticsearch for text search and an EmbeddingProvider for generating query embeddings for vector search.
 
     Attributes:
         es_client (Elasticsearch): The Elasticsearch client used for querying the index.
-        embedding_model (SentenceTransformer): The model used for generating embeddings for vector search.
+        embedding_provider (EmbeddingProvider): The provider of the embedding model used for generating embeddings for vector search.
         settings (Settings): Configuration settings for the retrieval service.
+        executor (Executor | None): An optional executor shared between requests. If it is set, the text search runs on the executor
+            while the query is encoded and the kNN search is executed, so the retrieval takes as long as the slowest search.
+        candidate_policy (KnnCandidatePolicy): Chooses the number of the kNN candidates per search. Defaults to the fixed
+            number of 10000 candidates, the default of the setting `knn_num_candidates`.
+        two_phase (bool): If it is set, the searches return only the ids, the scores and the access fields of the hits
+            (`REFERENCE_SOURCE_FIELDS`) and the texts of the documents are loaded by `fetch_documents` for the results
+            that are actually used, e.g. the top results after the rank fusion.
+        document_cache (DocumentCache | None): An optional in-process cache of the documents used by the two-phase retrieval.
+            Only the documents missed in the cache are loaded from Elasticsearch.
     """
 
     SOURCE_FIELDS = ["score", "category", "question", "answer", "document_id",
                      "answer_instructions", "project_id", "authorization_id", "project_name"]
 
+    # The fields of the first phase of the two-phase retrieval
+    REFERENCE_SOURCE_FIELDS = ["document_id", "project_id", "authorization_id"]
+    REFERENCE_FILTER_PATH = ["hits.hits._score", "hits.hits._source"]
+
     def __init__(
         self,
         es_client: Elasticsearch,
-        embedding_model: SentenceTransformer,
+        embedding_provider: EmbeddingProvider,
         settings: Settings,
+        executor: Executor | None = None,
+        candidate_policy: KnnCandidatePolicy | None = None,
+        two_phase: bool = False,
+        document_cache: DocumentCache | None = None,
     ) -> None:
         self.es_client = es_client
-        self.embedding_model = embedding_model
+        self.embedding_provider = embedding_provider
         self.settings = settings
+        self.executor = executor
+        self.candidate_policy = candidate_policy or KnnCandidatePolicy(KnnCandidatePolicy.MAX_NUM_CANDIDATES)
+        self.two_phase = two_phase
+        self.document_cache = document_cache
 
     def search(self,
                question: str,
                number_of_results: int = 20,
                vector_field_name: str = "vector_question_answer",
                customer_project_id: UUID | None = None,
-               authorization_ids: List[str] | None = []) -> RetrievalResult:
+               authorization_ids: List[str] | None = [],
+               query_vector: Any = None) -> RetrievalResult:
         """
         Search for user_question in the retrieval service.
 
@@ -51,70 +81,262 @@ class RetrievalService:
             vector_field_name (str, optional): The name of the field containing the vector embeddings. Defaults to "vector_question_answer".
             customer_project_id (str | None): A project id to filter the retrieval result. If the result does not have field 'project_id', the one is included.
             authorization_ids (List[str], optional): A list of authorization ids to filter the protected documents that the user has access to. Defaults to [].
+            query_vector (Any, optional): The sentence embedding of the question, e.g. created by the email handler together with
+                the embedding for the project identification. If it is not set, the question is encoded.
 
         Returns:
             RetrievalResult: The retrieval result containing text_result_items and vector_result_items.
         """
 
-        preprocessed_question = ' '.join(question.lower().split())
+        preprocessed_question = self.preprocess_question(question)
         authorization_ids = authorization_ids or []
 
         # TODO: Move to Content Data preparer
         customer_project_id_upcased: str | None = str(customer_project_id) if customer_project_id is not None else None
         number_of_results_per_type = int(number_of_results / 2)
 
-        vector_result = self._get_vector_search_result(preprocessed_question, number_of_results_per_type, vector_field_name, customer_project_id_upcased, authorization_ids)
-        text_result = self._get_text_retrieval_result(preprocessed_question, number_of_results_per_type, customer_project_id_upcased, authorization_ids)
+        return self._retrieve(preprocessed_question, number_of_results_per_type, vector_field_name, customer_project_id_upcased, authorization_ids, query_vector)
+
+    def search_batch(self, requests: Sequence[RetrievalRequest]) -> List[RetrievalResult]:
+        """
+        Search for several questions at once.
+
+        The questions without a query vector are encoded in one model batch and all text and kNN searches are sent in a single `_msearch` request.
+
+        Args:
+            requests (Sequence[RetrievalRequest]): The search parameters per question.
+
+        Returns:
+            List[RetrievalResult]: The retrieval results in the order of the requests.
+        """
+
+        if len(requests) == 0:
+            return []
+
+        preprocessed_questions = [self.preprocess_question(request.question) for request in requests]
+        query_vectors: List[Any] = [request.query_vector for request in requests]
+
+        missed_indexes = [idx for idx, query_vector in enumerate(query_vectors) if query_vector is None]
+        if missed_indexes:
+            missed_vectors = self._encode_questions([preprocessed_questions[idx] for idx in missed_indexes])
+            for idx, query_vector in zip(missed_indexes, missed_vectors):
+                query_vectors[idx] = query_vector
+
+        bodies: List[Dict[str, Any]] = []
+        for request, preprocessed_question, query_vector in zip(requests, preprocessed_questions, query_vectors):
+            number_of_results_per_type = int(request.number_of_results / 2)
+            bodies.append(self._create_text_search_body(preprocessed_question, number_of_results_per_type, request.customer_project_id, request.authorization_ids))
+            bodies.append(self._create_knn_search_body(query_vector, number_of_results_per_type, request.vector_field_name, request.customer_project_id, request.authorization_ids))
+
+        responses = self._multi_search(bodies)
+
+        return [
+            RetrievalResult(
+                text_result_items=self._create_search_results(responses[idx]),
+                vector_result_items=self._create_search_results(responses[idx + 1])
+            )
+            for idx in range(0, len(responses), 2)
+        ]
+
+    @staticmethod
+    def preprocess_question(question: str) -> str:
+        """ Lowercases the question and collapses the whitespaces. The text search and the query embedding use the preprocessed question. """
+
+        return ' '.join(question.lower().split())
+
+    def fetch_documents(self, search_results: List[SearchResult]) -> List[SearchResult]:
+        """
+        Loads the texts of the documents of the search results found by the two-phase retrieval.
+
+        Args:
+            search_results (List[SearchResult]): The search results, e.g. the top results after the rank fusion.
+
+        Returns:
+            List[SearchResult]: The complete search results with the same scores and in the same order. A document deleted
+                since the search is skipped. Without the two-phase retrieval, the search results are returned as they are.
+        """
+
+        return self.fetch_documents_batch([search_results])[0]
+
+    def fetch_documents_batch(self, search_results_lists: Sequence[List[SearchResult]]) -> List[List[SearchResult]]:
+        """
+        Loads the texts of the documents of several lists of search results from the document cache,
+        the documents missed in the cache are loaded with a single `_mget` request.
+        """
+
+        if not self.two_phase:
+            return list(search_results_lists)
+
+        document_ids = list(dict.fromkeys(result.document_id for results in search_results_lists for result in results))
+
+        with trace_span("document_fetch"):
+            documents = self.document_cache.get_many(document_ids) if self.document_cache is not None else {}
+            documents.update(self._get_documents([document_id for document_id in document_ids if document_id not in documents]))
+
+        return [
+            [replace(documents[result.document_id], score=result.score) for result in results if result.document_id in documents]
+            for results in search_results_lists
+        ]
+
+    def _get_documents(self, document_ids: List[str]) -> Dict[str, SearchResult]:
+        """ Returns the documents by their ids, the exporter indexes the documents with `document_id` as `_id`. """
+
+        if len(document_ids) == 0:
+            return {}
+
+        response = self.es_client.mget(index=self.settings.index_name, ids=document_ids, source=self.SOURCE_FIELDS,
+                                       filter_path=["docs._id", "docs.found", "docs._source"])
+
+        return {doc["_id"]: SearchResult.create(0.0, doc["_source"]) for doc in response["docs"] if doc.get("found")}
+
+    def _retrieve(self,
+                  user_question: str,
+                  number_of_results: int,
+                  vector_field_name: str,
+                  customer_project_id: str | None,
+                  authorization_ids: List[str],
+                  query_vector: Any = None) -> RetrievalResult:
+        """ Runs the text and the kNN searches. Subclasses override the method to change how the searches are sent to Elasticsearch. """
+
+        if self.executor is not None:
+            return self._get_concurrent_retrieval_result(user_question, number_of_results, vector_field_name, customer_project_id, authorization_ids, query_vector)
+
+        vector_result = self._get_vector_search_result(user_question, number_of_results, vector_field_name, customer_project_id, authorization_ids, query_vector)
+        text_result = self._get_text_retrieval_result(user_question, number_of_results, customer_project_id, authorization_ids)
 
         # filtered_vector_result = self._filter_knn_results(vector_result, customer_project_id)
 
         return RetrievalResult(text_result_items=text_result, vector_result_items=vector_result)
 
+    def _get_concurrent_retrieval_result(self,
+                                         user_question: str,
+                                         number_of_results: int,
+                                         vector_field_name: str,
+                                         customer_project_id: str | None,
+                                         authorization_ids: List[str],
+                                         query_vector: Any = None) -> RetrievalResult:
+        """ Runs the text search on the executor while the calling thread encodes the query and runs the kNN search. """
+
+        if self.executor is None:
+            raise ValueError("The executor must be set to run the concurrent retrieval.")
+
+        # The copied context carries the trace of the request to the executor thread
+        text_future = self.executor.submit(contextvars.copy_context().run, self._get_text_retrieval_result,
+                                           user_question, number_of_results, customer_project_id, authorization_ids)
+
+        try:
+            vector_result = self._get_vector_search_result(user_question, number_of_results, vector_field_name, customer_project_id, authorization_ids, query_vector)
+        except BaseException:
+            text_future.cancel()
+            raise
+
+        text_result = text_future.result()
+
+        return RetrievalResult(text_result_items=text_result, vector_result_items=vector_result)
+
     def _get_text_retrieval_result(self,
                                    user_question: str,
                                    number_of_results: int,
                                    customer_project_id: str | None,
                                    authorization_ids: List[str]) -> List[SearchResult]:
 
-        text_query = self._create_text_query(user_question, self.settings.source_system, customer_project_id, authorization_ids)
-
-        body: Dict[str, Any] = {
-            "query": text_query,
-            "size": number_of_results,
-            "_source": self.SOURCE_FIELDS
-        }
-        text_response = self.es_client.search(index=self.settings.index_name, body=body)
-
-        result: List[SearchResult] = []
-
-        for hit in text_response["hits"]["hits"]:
-            retrieval_result = self._create_search_result(hit)
-            result.append(retrieval_result)
+        with trace_span("text_search"):
+            body = self._create_text_search_body(user_question, number_of_results, customer_project_id, authorization_ids)
+            text_response = self.es_client.search(index=self.settings.index_name, body=body, **self._get_search_params())
 
-        return result
+        return self._create_search_results(text_response)
 
     def _get_vector_search_result(self,
                                   user_question: str,
                                   number_of_results: int,
                                   vector_field_name: str,
                                   customer_project_id: str | None,
-                                  authorization_ids: List[str]) -> List[SearchResult]:
+                                  authorization_ids: List[str],
+                                  query_vector: Any = None) -> List[SearchResult]:
+
+        if query_vector is None:
+            query_vector = self._encode_question(user_question)
+
+        with trace_span("knn_search"):
+            body = self._create_knn_search_body(query_vector, number_of_results, vector_field_name, customer_project_id, authorization_ids)
+            knn_response = self.es_client.search(index=self.settings.index_name, body=body, **self._get_search_params())
+
+        return self._create_search_results(knn_response)
+
+    def _encode_question(self, user_question: str) -> Any:
+        # The embedding provider answers a repeated question from its cache
+        with trace_span("query_embedding"):
+            return self.embedding_provider.encode(user_question)
+
+    def _encode_questions(self, user_questions: List[str]) -> List[Any]:
+        with trace_span("query_embedding"):
+            return list(self.embedding_provider.encode(user_questions))
+
+    def _multi_search(self, bodies: List[Dict[str, Any]]) -> List[Any]:
+        """ Sends the search bodies in one `_msearch` request and returns the responses in the same order. """
+
+        searches: List[Dict[str, Any]] = []
+        for body in bodies:
+            searches.append({"index": self.settings.index_name})
+            searches.append(body)
+
+        with trace_span("multi_search"):
+            response = self.es_client.msearch(body=searches, **self._get_search_params(multi_search=True))
+        responses: List[Any] = response["responses"]
 
-        query_vector = self.embedding_model.encode(user_question)
+        for item in responses:
+            if "error" in item:
+                raise Exception(f"The multi search request failed: {item['error']}")
+
+        return responses
+
+    def _get_search_params(self, multi_search: bool = False) -> Dict[str, Any]:
+        """ Returns the query parameters of the search requests, the two-phase retrieval trims the responses with `filter_path`. """
+
+        if not self.two_phase:
+            return {}
+
+        if multi_search:
+            # The status keeps the responses without hits in the list, so the responses stay in the order of the searches
+            return {"filter_path": [f"responses.{path}" for path in self.REFERENCE_FILTER_PATH] + ["responses.status", "responses.error"]}
+
+        return {"filter_path": self.REFERENCE_FILTER_PATH}
+
+    def _create_text_search_body(self,
+                                 user_question: str,
+                                 number_of_results: int,
+                                 customer_project_id: str | None,
+                                 authorization_ids: List[str]) -> Dict[str, Any]:
+
+        text_query = self._create_text_query(user_question, self.settings.source_system, customer_project_id, authorization_ids)
+
+        return {
+            "query": text_query,
+            "size": number_of_results,
+            "_source": self.REFERENCE_SOURCE_FIELDS if self.two_phase else self.SOURCE_FIELDS
+        }
+
+    def _create_knn_search_body(self,
+                                query_vector: Tensor,
+                                number_of_results: int,
+                                vector_field_name: str,
+                                customer_project_id: str | None,
+                                authorization_ids: List[str]) -> Dict[str, Any]:
 
         knn_query = self._create_knn_query(vector_field_name, query_vector, number_of_results, self.settings.source_system, customer_project_id, authorization_ids)
 
-        knn_response = self.es_client.search(
-            index=self.settings.index_name,
-            body={
-                "knn": knn_query,
-                "_source": self.SOURCE_FIELDS
-            },
-        )
+        return {
+            "knn": knn_query,
+            "_source": self.REFERENCE_SOURCE_FIELDS if self.two_phase else self.SOURCE_FIELDS
+        }
 
+    def _create_search_results(self, response: Any) -> List[SearchResult]:
         result: List[SearchResult] = []
 
-        for hit in knn_response["hits"]["hits"]:
+        # A response trimmed with `filter_path` has no `hits` if nothing is found
+        hits = response["hits"]["hits"] if "hits" in response else []
+
+        for hit in hits:
             retrieval_result = self._create_search_result(hit)
             result.append(retrieval_result)
 
@@ -139,6 +361,10 @@ class RetrievalService:
         return results
 
     def _create_search_result(self, hit: Dict[str, Any]) -> SearchResult:
+        if self.two_phase:
+            # The texts are loaded by `fetch_documents` for the used results only
+            return SearchResult.create(hit["_score"], {"category": "", "question": "", "answer": "", **hit["_source"]})
+
         result = SearchResult.create(hit["_score"], hit["_source"])
         return result
 
@@ -151,14 +377,24 @@ class RetrievalService:
         customer_project_id: str | None,
         authorization_ids: List[str] | None
     ) -> Dict[str, Any]:
+        filter_block = self._create_filter_block(source_system, customer_project_id, authorization_ids)
+
         return {
             "field": vector_field_name,
-            "query_vector": query_vector,
+            # The documents are indexed as unit vectors, the `dot_product` similarity requires a unit query vector too
+            "query_vector": self._normalize(query_vector),
             "k": number_of_results,
-            "num_candidates": 10000,
-            "filter": self._create_filter_block(source_system, customer_project_id, authorization_ids)
+            "num_candidates": self.candidate_policy.get_num_candidates(number_of_results, filter_block),
+            "filter": filter_block
         }
 
+    @staticmethod
+    def _normalize(vector: Any) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+
+        return vector / norm if norm > 0 else vector
+
     def _create_text_query(
         self,
         user_question: str,
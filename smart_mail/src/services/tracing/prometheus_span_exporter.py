@@ -0,0 +1,33 @@
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, start_http_server
+
+from services.tracing.span_exporter import SpanExporter
+
+
+class PrometheusSpanExporter(SpanExporter):
+    """
+    Exports the span durations as the Prometheus histogram `smart_mail_stage_duration_seconds` with the label `stage`.
+
+    Attributes:
+        port (int | None): The port of the HTTP endpoint `/metrics` started for the scraping. If not set, the histogram is
+            only registered, e.g. to be served by another endpoint of the process.
+    """
+
+    # From a cached BM25 search to a long generation of a remote LLM
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, port: int | None = None, registry: CollectorRegistry = REGISTRY) -> None:
+        self.port = port
+
+        self._histogram = Histogram(
+            "smart_mail_stage_duration_seconds",
+            "The duration of the stages of the email processing.",
+            ["stage"],
+            buckets=self.BUCKETS,
+            registry=registry
+        )
+
+        if port:
+            start_http_server(port, registry=registry)
+
+    def export(self, name: str, duration_seconds: float) -> None:
+        self._histogram.labels(stage=name).observe(duration_seconds)
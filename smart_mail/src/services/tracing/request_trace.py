@@ -0,0 +1,70 @@
+import threading
+import time
+from collections.abc import Generator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict
+
+from services.tracing.span_exporter import SpanExporter
+
+
+_current_trace: ContextVar["RequestTrace | None"] = ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+    """
+    Collects the durations of the stages (spans) of a request, e.g. the kNN search or the generation.
+
+    The trace is activated for the current context with `activate`, then the services record their stages with `trace_span`
+    without knowing the trace. A stage recorded several times (e.g. the searches of a batch) sums up its durations.
+    Every finished span is passed to the optional exporter as well.
+
+    Attributes:
+        exporter (SpanExporter | None): The exporter of the finished spans, e.g. to Prometheus.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.exporter = exporter
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._durations: Dict[str, float] = {}
+
+    @contextmanager
+    def activate(self) -> Generator["RequestTrace", None, None]:
+        """ Makes the trace the current trace of the context, e.g. of the handled email. """
+
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str) -> Generator[None, None, None]:
+        start_time = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, self._clock() - start_time)
+
+    def add(self, name: str, duration_seconds: float) -> None:
+        # The stages of a concurrent retrieval are recorded by several threads
+        with self._lock:
+            self._durations[name] = self._durations.get(name, 0.0) + duration_seconds
+
+        if self.exporter is not None:
+            self.exporter.export(name, duration_seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        """ Returns the durations of the stages in milliseconds, e.g. to store them in `request_metadata`. """
+
+        with self._lock:
+            return {name: round(duration * 1000, 3) for name, duration in self._durations.items()}
+
+
+def trace_span(name: str) -> AbstractContextManager[None]:
+    """ Measures a stage of the current request. Without an active trace, nothing is measured. """
+
+    trace = _current_trace.get()
+    return trace.span(name) if trace is not None else nullcontext()
@@ -0,0 +1,15 @@
+from abc import ABC, abstractmethod
+
+
+class SpanExporter(ABC):
+
+    @abstractmethod
+    def export(self, name: str, duration_seconds: float) -> None:
+        """
+        Exports the duration of a finished span.
+
+        Args:
+            name (str): The name of the stage, e.g. "knn_search".
+            duration_seconds (float): The duration of the span in seconds.
+        """
+        pass
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+# The container imports the clients of all external systems
+pytest.importorskip("psycopg2")
+
+from common.service_container import ServiceContainer  # noqa: E402
+from services.tracing.span_exporter import SpanExporter  # noqa: E402
+
+
+class FakeSpanExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.names: List[str] = []
+
+    def export(self, name: str, duration_seconds: float) -> None:
+        self.names.append(name)
+
+
+def create_settings() -> Any:
+    return SimpleNamespace(metrics_port=0)
+
+
+def test_override_replaces_a_created_service():
+    container = ServiceContainer(create_settings())
+    span_exporter = FakeSpanExporter()
+
+    assert container.span_exporter is None
+    container.override("span_exporter", span_exporter)
+
+    assert container.span_exporter is span_exporter
+
+
+def test_override_rejects_an_unknown_service():
+    container = ServiceContainer(create_settings())
+
+    with pytest.raises(ValueError):
+        container.override("unknown_service", FakeSpanExporter())
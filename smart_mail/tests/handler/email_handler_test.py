@@ -0,0 +1,153 @@
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from dtos.email_message import EmailMessage
+from handler.email_handler import EmailHandler
+from services.generation.generation_result import GenerationResult
+from services.generation.generation_service import GenerationService
+from services.generation.prompt_creator import PromptCreator
+from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
+from services.retrieval_service import RetrievalService
+
+
+class FakeEmbeddingProvider:
+    def __init__(self) -> None:
+        self.encoded_batches: List[List[str]] = []
+
+    def encode(self, texts: Any) -> np.ndarray:
+        raise AssertionError("The question must not be encoded again by the retrieval.")
+
+    def encode_with_pooled(self, texts: Sequence[str]) -> Tuple[np.ndarray, torch.Tensor]:
+        self.encoded_batches.append(list(texts))
+
+        # The embedding depends on the case of the text like the embedding of the cased model
+        embeddings = np.array([[float(len(text)), float(sum(char.isupper() for char in text)) + 1.0] for text in texts], dtype=np.float32)
+        return embeddings, torch.from_numpy(embeddings.copy())
+
+
+class FakeContentDataPreparer:
+    def __init__(self) -> None:
+        self.input_texts: List[str] = []
+        self.input_embeddings: List[torch.Tensor] = []
+
+    def extract_project(self, input_text: str, input_embedding: torch.Tensor | None = None) -> None:
+        assert input_embedding is not None
+        self.input_texts.append(input_text)
+        self.input_embeddings.append(input_embedding)
+
+    def extract_projects(self, input_texts: Sequence[str], input_embeddings: torch.Tensor | None = None) -> List[None]:
+        assert input_embeddings is not None and len(input_embeddings) == len(input_texts)
+        self.input_texts.extend(input_texts)
+        self.input_embeddings.extend(input_embeddings)
+        return [None] * len(input_texts)
+
+    def get_user_authorization_ids(self, email_from: str) -> None:
+        return None
+
+
+class FakeElasticsearch:
+    def search(self, index: str, body: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+        return self._create_response()
+
+    def msearch(self, body: List[Dict[str, Any]], **params: Any) -> Dict[str, Any]:
+        return {"responses": [self._create_response() for _ in body[1::2]]}
+
+    @staticmethod
+    def _create_response() -> Dict[str, Any]:
+        hits = [{"_score": 1.0, "_source": {"category": "category", "question": "question", "answer": "answer", "document_id": f"doc{idx}"}} for idx in range(2)]
+        return {"hits": {"hits": hits}}
+
+
+class FakeGenerationService(GenerationService):
+    def get_answer(self, prompt: str) -> GenerationResult:
+        return GenerationResult(10, 2, "stop", "Die Antwort", {})
+
+
+class FakeDatabaseService:
+    def __init__(self) -> None:
+        self.answer_models: List[Dict[str, Any]] = []
+
+    def create_answer(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.answer_models.append(data)
+        return data
+
+    def create_answers(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.answer_models.extend(data)
+        return data
+
+
+def create_handler(embedding_provider: FakeEmbeddingProvider, content_data_preparer: FakeContentDataPreparer,
+                   generation_service: GenerationService | None = None, database_service: FakeDatabaseService | None = None) -> EmailHandler:
+    settings: Any = SimpleNamespace(index_name="documents", source_system="evdi")
+
+    return EmailHandler(
+        RetrievalService(FakeElasticsearch(), embedding_provider, settings),  # type: ignore
+        PromptCreator(),
+        generation_service or FakeGenerationService(),
+        database_service or FakeDatabaseService(),  # type: ignore
+        ReciprocalRankFusionService(),
+        content_data_preparer,  # type: ignore
+        embedding_provider,  # type: ignore
+        settings
+    )
+
+
+def test_handle_encodes_the_email_once_for_the_project_identification_and_the_retrieval():
+    embedding_provider = FakeEmbeddingProvider()
+    content_data_preparer = FakeContentDataPreparer()
+
+    output_text = create_handler(embedding_provider, content_data_preparer).handle("customer@example.com", "Auszahlung", "Wann  erfolgt\ndie Zahlung?")
+
+    assert output_text == "Die Antwort"
+    assert embedding_provider.encoded_batches == [["Auszahlung Wann  erfolgt\ndie Zahlung?", "auszahlung wann erfolgt die zahlung?"]]
+    assert len(content_data_preparer.input_embeddings) == 1
+
+
+def test_handle_identifies_the_project_in_the_email_as_written():
+    embedding_provider = FakeEmbeddingProvider()
+    content_data_preparer = FakeContentDataPreparer()
+
+    create_handler(embedding_provider, content_data_preparer).handle("customer@example.com", "The Five", "Wann  erfolgt die Zahlung?")
+
+    # The project identification gets the cased text and its own embedding, as if it encoded the text itself
+    assert content_data_preparer.input_texts == ["The Five Wann  erfolgt die Zahlung?"]
+    assert torch.equal(content_data_preparer.input_embeddings[0], embedding_provider.encode_with_pooled(["The Five Wann  erfolgt die Zahlung?"])[1][0])
+
+
+def test_handle_batch_encodes_all_emails_in_one_forward_pass():
+    embedding_provider = FakeEmbeddingProvider()
+    content_data_preparer = FakeContentDataPreparer()
+    emails = [EmailMessage("customer@example.com", f"Frage {idx}", "Wann erfolgt die Zahlung?") for idx in range(3)]
+
+    output_texts = create_handler(embedding_provider, content_data_preparer).handle_batch(emails)
+
+    assert output_texts == ["Die Antwort"] * 3
+    assert embedding_provider.encoded_batches == [
+        [f"Frage {idx} Wann erfolgt die Zahlung?" for idx in range(3)] + [f"frage {idx} wann erfolgt die zahlung?" for idx in range(3)]
+    ]
+    assert content_data_preparer.input_texts == [f"Frage {idx} Wann erfolgt die Zahlung?" for idx in range(3)]
+
+
+class SlowGenerationService(GenerationService):
+    def get_answer(self, prompt: str) -> GenerationResult:
+        time.sleep(0.05)
+        return GenerationResult(10, 2, "stop", "Die Antwort", {})
+
+
+def test_handle_batch_does_not_add_the_generation_of_the_preceding_emails_to_the_processing_time():
+    database_service = FakeDatabaseService()
+    handler = create_handler(FakeEmbeddingProvider(), FakeContentDataPreparer(), SlowGenerationService(), database_service)
+    emails = [EmailMessage("customer@example.com", f"Frage {idx}", "Wann erfolgt die Zahlung?") for idx in range(4)]
+
+    handler.handle_batch(emails)
+
+    total_processing_times_ms = [answer_model["total_processing_time_ms"] for answer_model in database_service.answer_models]
+    stage_totals_ms = [answer_model["request_metadata"]["stage_durations_ms"]["total"] for answer_model in database_service.answer_models]
+
+    # Every email waits for its own generation of 50 ms only, the times do not grow with the position in the batch
+    assert all(50 <= total_processing_time_ms < 150 for total_processing_time_ms in total_processing_times_ms)
+    assert max(stage_totals_ms) - min(stage_totals_ms) < 40
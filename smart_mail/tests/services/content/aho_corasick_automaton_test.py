@@ -0,0 +1,30 @@
+import random
+
+from services.content.aho_corasick_automaton import AhoCorasickAutomaton
+
+
+def test_find_all_returns_overlapping_and_nested_patterns():
+    patterns = ["he", "she", "his", "hers", "stadthaus mozart", "stadthaus mozart ii"]
+    automaton = AhoCorasickAutomaton(patterns)
+
+    assert automaton.find_all("ushers") == {0, 1, 3}
+    assert automaton.find_all("projekt stadthaus mozart iii") == {4, 5}
+    assert automaton.find_all("") == set()
+
+
+def test_find_all_ignores_empty_patterns():
+    automaton = AhoCorasickAutomaton(["", "five"])
+
+    assert automaton.find_all("the five") == {1}
+
+
+def test_find_all_matches_substring_search():
+    rng = random.Random(42)
+    patterns = ["".join(rng.choice("ab c") for _ in range(rng.randint(1, 6))) for _ in range(200)]
+    automaton = AhoCorasickAutomaton(patterns)
+
+    for _ in range(200):
+        text = "".join(rng.choice("ab cd") for _ in range(rng.randint(0, 40)))
+        expected_result = {idx for idx, pattern in enumerate(patterns) if pattern and pattern in text}
+
+        assert automaton.find_all(text) == expected_result
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import uuid
+from typing import Any, Dict, List
+
+import numpy as np
+
+from dtos.project import Project
+from services.content.project_embedding_index import ProjectEmbeddingIndex
+
+
+class FakeEncoder:
+    def __init__(self) -> None:
+        self.encoded_names: List[str] = []
+
+    def __call__(self, names: List[str]) -> np.ndarray:
+        self.encoded_names.extend(names)
+        return np.array([[float(len(name)), 1.0] for name in names], dtype=np.float32)
+
+
+class StaleManifestIndex(ProjectEmbeddingIndex):
+    """ Reads the manifest of a removed matrix first, as a process that loads the index during concurrent rebuilds. """
+
+    def __init__(self, directory: str, model_name: str) -> None:
+        super().__init__(directory, model_name)
+        self.manifest_reads = 0
+
+    def _read_manifest(self) -> Dict[str, Any] | None:
+        self.manifest_reads += 1
+        manifest = super()._read_manifest()
+
+        if manifest is not None and self.manifest_reads == 1:
+            return {**manifest, "matrix_file_name": "project_embeddings_removed.npy"}
+
+        return manifest
+
+
+PROJECTS = [
+    Project.create(uuid.UUID("0113C948-C9CE-4A3D-AF99-D66BDEDE7D33"), "The Five"),
+    Project.create(uuid.UUID("811DC8A3-C453-48A0-82DD-58DF3AD52A6D"), "Am Akkonplatz"),
+]
+
+
+def test_get_embeddings_reuses_the_persisted_matrix():
+    with tempfile.TemporaryDirectory() as directory:
+        encoder = FakeEncoder()
+
+        expected_matrix = np.array(ProjectEmbeddingIndex(directory, "model").get_embeddings(PROJECTS, encoder))
+        actual_matrix = np.array(ProjectEmbeddingIndex(directory, "model").get_embeddings(PROJECTS, encoder))
+
+    assert encoder.encoded_names == ["The Five", "Am Akkonplatz"]
+    assert np.array_equal(actual_matrix, expected_matrix)
+
+
+def test_get_embeddings_encodes_only_new_and_renamed_projects():
+    with tempfile.TemporaryDirectory() as directory:
+        ProjectEmbeddingIndex(directory, "model").get_embeddings(PROJECTS, FakeEncoder())
+
+        encoder = FakeEncoder()
+        changed_projects = [
+            Project.create(uuid.UUID("2E239357-4967-40E6-807E-B9EB87FAB5AD"), "Pracht-Altbau Sendlinger Tor"),
+            PROJECTS[1],
+            Project.create(PROJECTS[0].id, "The Five II"),
+        ]
+        matrix = np.array(ProjectEmbeddingIndex(directory, "model").get_embeddings(changed_projects, encoder))
+
+    assert encoder.encoded_names == ["Pracht-Altbau Sendlinger Tor", "The Five II"]
+    assert matrix[:, 0].tolist() == [28.0, 13.0, 11.0]
+
+
+def test_get_embeddings_rebuilds_the_index_for_another_model():
+    with tempfile.TemporaryDirectory() as directory:
+        ProjectEmbeddingIndex(directory, "model-1").get_embeddings(PROJECTS, FakeEncoder())
+
+        encoder = FakeEncoder()
+        ProjectEmbeddingIndex(directory, "model-2").get_embeddings(PROJECTS, encoder)
+
+    assert encoder.encoded_names == ["The Five", "Am Akkonplatz"]
+
+
+def test_get_embeddings_reads_the_manifest_again_if_its_matrix_was_removed():
+    with tempfile.TemporaryDirectory() as directory:
+        expected_matrix = np.array(ProjectEmbeddingIndex(directory, "model").get_embeddings(PROJECTS, FakeEncoder()))
+
+        encoder = FakeEncoder()
+        index = StaleManifestIndex(directory, "model")
+        actual_matrix = np.array(index.get_embeddings(PROJECTS, encoder))
+
+    assert index.manifest_reads == 2
+    assert encoder.encoded_names == []
+    assert np.array_equal(actual_matrix, expected_matrix)
+
+
+def test_get_embeddings_keeps_the_matrix_of_the_previous_generation():
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ["The Five", "The Five II", "The Five III"]:
+            ProjectEmbeddingIndex(directory, "model").get_embeddings([Project.create(PROJECTS[0].id, name)], FakeEncoder())
+
+        matrix_file_names = [file_name for file_name in os.listdir(directory) if file_name.endswith(".npy")]
+        matrices = [np.load(os.path.join(directory, file_name)) for file_name in matrix_file_names]
+
+    assert sorted(matrix[0, 0] for matrix in matrices) == [11.0, 12.0]
@@ -0,0 +1,39 @@
+import uuid
+from typing import Sequence
+
+import torch
+
+from dtos.project import Project
+from services.content.project_identifier_service import ProjectIdentifierService
+
+
+class FakeEmbeddingProvider:
+    def encode_pooled(self, texts: Sequence[str]) -> torch.Tensor:
+        return torch.tensor([[float(len(text)), 1.0] for text in texts])
+
+
+def create_service() -> ProjectIdentifierService:
+    projects = [
+        Project.create(uuid.UUID("AFDD98B3-B93C-4803-8D60-FF1733217768"), "Stadthaus 'Mozart' II"),
+        Project.create(uuid.UUID("118BBDEC-3A71-4E5F-B725-BDC85E4A31EB"), "Stadthaus 'Mozart'"),
+        Project.create(uuid.UUID("0113C948-C9CE-4A3D-AF99-D66BDEDE7D33"), "The Five"),
+    ]
+    return ProjectIdentifierService(projects, FakeEmbeddingProvider())  # type: ignore
+
+
+def test_extract_project_prefers_the_longest_matched_name():
+    service = create_service()
+
+    identified_project = service.extract_project("Wann erfolgt die Auszahlung im Projekt Stadthaus Mozart II?")
+
+    assert identified_project is not None
+    assert identified_project.name == "Stadthaus 'Mozart' II"
+    assert identified_project.similarity == 1
+
+
+def test_get_matched_projects_returns_all_matches_ordered_by_name_length():
+    service = create_service()
+
+    matched_projects = service.get_matched_projects("Re: Fwd: The Five und Stadthaus Mozart")
+
+    assert [project.name for project in matched_projects] == ["stadthaus mozart", "the five"]
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from services import document_cache as document_cache_module
+from services.document_cache import DocumentCache
+from services.retrieval_service import RetrievalService
+from services.search_result import SearchResult
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeIndices:
+    def __init__(self) -> None:
+        self.index_name = "documents_20240901120000"
+        self.content_version = "1"
+
+    def get_mapping(self, index: str) -> Dict[str, Any]:
+        return {self.index_name: {"mappings": {"_meta": {"content_version": self.content_version}}}}
+
+
+class FakeElasticsearch:
+    def __init__(self, documents: List[Dict[str, Any]]) -> None:
+        self.indices = FakeIndices()
+        self.documents = documents
+        self.number_of_scans = 0
+        self.requested_ids: List[List[str]] = []
+
+    def count(self, index: str) -> Dict[str, Any]:
+        return {"count": len(self.documents)}
+
+    def mget(self, index: str, ids: List[str], source: List[str], **params: Any) -> Dict[str, Any]:
+        self.requested_ids.append(ids)
+        sources = {document["document_id"]: document for document in self.documents}
+        return {"docs": [{"_id": document_id, "found": document_id in sources, "_source": sources.get(document_id)} for document_id in ids]}
+
+
+@pytest.fixture(autouse=True)
+def fake_scan(monkeypatch: pytest.MonkeyPatch) -> None:
+    def scan(es_client: FakeElasticsearch, index: str, query: Dict[str, Any]) -> Any:
+        es_client.number_of_scans += 1
+        return iter([{"_source": document} for document in es_client.documents])
+
+    monkeypatch.setattr(document_cache_module.helpers, "scan", scan)
+
+
+def create_document(document_id: str, answer: str = "answer") -> Dict[str, Any]:
+    return {"category": "category", "question": f"question {document_id}", "answer": answer, "document_id": document_id}
+
+
+def create_cache(es_client: FakeElasticsearch, clock: FakeClock, **kwargs: Any) -> DocumentCache:
+    return DocumentCache(es_client, "documents", RetrievalService.SOURCE_FIELDS, check_interval_seconds=30, clock=clock, **kwargs)  # type: ignore
+
+
+def test_get_many_returns_the_loaded_documents():
+    es_client = FakeElasticsearch([create_document("doc1"), create_document("doc2")])
+    cache = create_cache(es_client, FakeClock())
+    cache.load()
+
+    documents = cache.get_many(["doc1", "doc3"])
+
+    assert list(documents.keys()) == ["doc1"]
+    assert documents["doc1"].question == "question doc1"
+    assert cache.version == "documents_20240901120000/1"
+    assert cache.statistics()["hits"] == 1 and cache.statistics()["misses"] == 1
+
+
+def test_documents_are_reloaded_when_the_index_version_changes():
+    clock = FakeClock()
+    es_client = FakeElasticsearch([create_document("doc1")])
+    cache = create_cache(es_client, clock)
+    cache.load()
+
+    es_client.documents = [create_document("doc1", "changed answer")]
+    es_client.indices.content_version = "2"
+
+    # The version is not checked again within the interval
+    assert cache.get_many(["doc1"])["doc1"].answer == "answer"
+
+    clock.now += 31
+    assert cache.get_many(["doc1"])["doc1"].answer == "changed answer"
+
+    es_client.indices.index_name = "documents_20240902120000"
+    clock.now += 31
+    cache.get_many(["doc1"])
+
+    assert es_client.number_of_scans == 3
+
+
+def test_documents_are_loaded_from_the_snapshot_of_the_same_version():
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "documents.json")
+        es_client = FakeElasticsearch([create_document("doc1")])
+
+        create_cache(es_client, FakeClock(), snapshot_path=snapshot_path).load()
+        restarted_cache = create_cache(es_client, FakeClock(), snapshot_path=snapshot_path)
+        restarted_cache.load()
+
+        assert es_client.number_of_scans == 1
+        assert list(restarted_cache.get_many(["doc1"]).keys()) == ["doc1"]
+
+        with open(snapshot_path, encoding="utf-8") as file:
+            assert json.load(file)["version"] == "documents_20240901120000/1"
+
+
+def test_too_large_index_is_not_cached():
+    es_client = FakeElasticsearch([create_document("doc1"), create_document("doc2")])
+    cache = create_cache(es_client, FakeClock(), max_documents=1)
+    cache.load()
+
+    assert cache.get_many(["doc1"]) == {}
+    assert es_client.number_of_scans == 0
+
+
+def test_two_phase_retrieval_loads_only_the_documents_missed_in_the_cache():
+    es_client = FakeElasticsearch([create_document("doc1"), create_document("doc2")])
+    cache = create_cache(es_client, FakeClock())
+    cache.load()
+    es_client.documents.append(create_document("doc3"))
+
+    settings = SimpleNamespace(index_name="documents", source_system="evdi")
+    service = RetrievalService(es_client, None, settings, two_phase=True, document_cache=cache)  # type: ignore
+    search_results = [SearchResult.create(score, {"category": "", "question": "", "answer": "", "document_id": document_id})
+                      for score, document_id in [(0.3, "doc3"), (0.2, "doc1"), (0.1, "doc4")]]
+
+    used_results = service.fetch_documents(search_results)
+
+    assert [(item.document_id, item.score, item.question) for item in used_results] == [("doc3", 0.3, "question doc3"), ("doc1", 0.2, "question doc1")]
+    assert es_client.requested_ids == [["doc3", "doc4"]]
+    assert cache.get_many(["doc1"])["doc1"].score == 0.0
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import tempfile
+from typing import List
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeEncoder:
+    def __init__(self) -> None:
+        self.encoded_texts: List[str] = []
+
+    def __call__(self, text: str) -> np.ndarray:
+        self.encoded_texts.append(text)
+        return np.array([float(len(text)), 1.0], dtype=np.float32)
+
+
+def test_get_or_create_encodes_a_normalized_question_once():
+    encoder = FakeEncoder()
+    cache = EmbeddingCache("model", max_size=10)
+
+    first_vector = cache.get_or_create("Wann erfolgt die Auszahlung?", encoder)
+    second_vector = cache.get_or_create("  wann  erfolgt die\nAuszahlung?", encoder)
+
+    assert encoder.encoded_texts == ["Wann erfolgt die Auszahlung?"]
+    assert np.array_equal(first_vector, second_vector)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_get_or_create_evicts_the_least_recently_used_entry():
+    encoder = FakeEncoder()
+    cache = EmbeddingCache("model", max_size=2)
+
+    cache.get_or_create("a", encoder)
+    cache.get_or_create("b", encoder)
+    cache.get_or_create("a", encoder)
+    cache.get_or_create("c", encoder)
+    cache.get_or_create("a", encoder)
+    cache.get_or_create("b", encoder)
+
+    assert encoder.encoded_texts == ["a", "b", "c", "b"]
+
+
+def test_get_or_create_expires_entries_after_ttl():
+    clock = FakeClock()
+    encoder = FakeEncoder()
+    cache = EmbeddingCache("model", max_size=10, ttl_seconds=60, clock=clock)
+
+    cache.get_or_create("a", encoder)
+    clock.now += 61
+    cache.get_or_create("a", encoder)
+
+    assert encoder.encoded_texts == ["a", "a"]
+
+
+def test_get_or_create_does_not_share_entries_between_models():
+    encoder = FakeEncoder()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+
+        for model_name in ["model-1", "model-2"]:
+            cache = EmbeddingCache(model_name, path=path)
+            cache.get_or_create("a", encoder)
+            cache.close()
+
+    assert encoder.encoded_texts == ["a", "a"]
+
+
+def test_get_or_create_restores_entries_from_disk():
+    encoder = FakeEncoder()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+
+        cache = EmbeddingCache("model", path=path)
+        expected_vector = cache.get_or_create("a", encoder)
+        cache.close()
+
+        restarted_cache = EmbeddingCache("model", path=path)
+        actual_vector = restarted_cache.get_or_create("a", encoder)
+        restarted_cache.close()
+
+    assert restarted_cache.statistics()["hits"] == 1
+    assert encoder.encoded_texts == ["a"]
+    assert np.array_equal(actual_vector, expected_vector)
+
+
+def test_get_or_create_many_encodes_only_the_misses_in_one_batch():
+    encoded_batches: List[List[str]] = []
+
+    def encode_batch(texts: List[str]) -> np.ndarray:
+        encoded_batches.append(texts)
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+    cache = EmbeddingCache("model", max_size=10)
+    cache.get_or_create("a", FakeEncoder())
+
+    vectors = cache.get_or_create_many(["bb", "a", "ccc", "bb"], encode_batch)
+
+    assert encoded_batches == [["bb", "ccc"]]
+    assert [vector[0] for vector in vectors] == [2.0, 1.0, 3.0, 2.0]
+
+
+def test_get_or_create_keeps_the_case_of_the_texts_without_normalization():
+    encoder = FakeEncoder()
+    cache = EmbeddingCache("model", max_size=10, normalize_texts=False)
+
+    cache.get_or_create("The Five", encoder)
+    cache.get_or_create("the five", encoder)
+
+    assert encoder.encoded_texts == ["The Five", "the five"]
+
+
+def test_the_disk_layer_deletes_the_expired_and_the_oldest_rows():
+    clock = FakeClock()
+    encoder = FakeEncoder()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+
+        cache = EmbeddingCache("model", ttl_seconds=60, path=path, clock=clock, max_disk_size=150)
+        cache.get_or_create("expired", encoder)
+        clock.now += 61
+
+        # With the expired row, the last write is the second purge
+        for idx in range(EmbeddingCache.PURGE_INTERVAL_WRITES * 2 - 1):
+            clock.now += 0.01
+            cache.get_or_create(f"text {idx}", encoder)
+        cache.close()
+
+        connection = sqlite3.connect(path)
+        row_count = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        connection.close()
+
+        restarted_cache = EmbeddingCache("model", ttl_seconds=60, path=path, clock=clock, max_disk_size=150)
+        restarted_cache.get_or_create("text 198", encoder)
+        restarted_cache.get_or_create("text 0", encoder)
+        restarted_cache.close()
+
+    # The purges removed the expired row and the oldest rows above the maximum size
+    assert row_count == 150
+    assert encoder.encoded_texts[-1] == "text 0"
+    assert encoder.encoded_texts.count("text 198") == 1
@@ -0,0 +1,70 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+
+from services.embedding_cache import EmbeddingCache
+from services.embedding_provider import EmbeddingProvider
+
+
+class FakeSentenceTransformer:
+    """ Returns the outputs of `SentenceTransformer.encode(output_value=None)` with one padded token per text. """
+
+    def __init__(self) -> None:
+        self.encoded_batches: List[List[str]] = []
+
+    def encode(self, texts: List[str], output_value: str | None = "sentence_embedding") -> List[Dict[str, Any]]:
+        self.encoded_batches.append(texts)
+
+        return [
+            {
+                "token_embeddings": torch.tensor([[float(len(text)), 1.0], [3.0, 3.0], [100.0, 100.0]]),
+                "attention_mask": torch.tensor([1, 1, 0]),
+                "sentence_embedding": torch.tensor([float(len(text))]),
+            }
+            for text in texts
+        ]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 1
+
+
+def test_encode_pooled_averages_real_tokens_only():
+    provider = EmbeddingProvider(FakeSentenceTransformer(), "model")  # type: ignore
+
+    pooled_embeddings = provider.encode_pooled(["abcde"])
+
+    assert torch.equal(pooled_embeddings, torch.tensor([[4.0, 2.0]]))
+
+
+def test_encode_with_pooled_creates_both_embeddings_in_one_forward_pass():
+    model = FakeSentenceTransformer()
+    provider = EmbeddingProvider(model, "model")  # type: ignore
+
+    sentence_embeddings, pooled_embeddings = provider.encode_with_pooled(["abcde", "The Five"])
+
+    assert model.encoded_batches == [["abcde", "The Five"]]
+    assert np.array_equal(sentence_embeddings, np.array([[5.0], [8.0]], dtype=np.float32))
+    assert torch.equal(pooled_embeddings, torch.tensor([[4.0, 2.0], [5.5, 2.0]]))
+
+
+def test_encode_returns_a_vector_for_a_single_text():
+    provider = EmbeddingProvider(FakeSentenceTransformer(), "model")  # type: ignore
+
+    sentence_embedding = provider.encode("Wann erfolgt die Auszahlung?")
+    sentence_embeddings = provider.encode(["Wann erfolgt die Auszahlung?", "The Five"])
+
+    assert np.array_equal(sentence_embedding, np.array([28.0], dtype=np.float32))
+    assert sentence_embeddings.shape == (2, 1)
+
+
+def test_encode_with_pooled_encodes_only_the_texts_missed_in_the_cache():
+    model = FakeSentenceTransformer()
+    provider = EmbeddingProvider(model, "model", EmbeddingCache("model", normalize_texts=False))  # type: ignore
+
+    provider.encode_with_pooled(["abcde"])
+    sentence_embeddings, pooled_embeddings = provider.encode_with_pooled(["The Five", "abcde"])
+
+    assert model.encoded_batches == [["abcde"], ["The Five"]]
+    assert np.array_equal(sentence_embeddings, np.array([[8.0], [5.0]], dtype=np.float32))
+    assert torch.equal(pooled_embeddings, torch.tensor([[5.5, 2.0], [4.0, 2.0]]))
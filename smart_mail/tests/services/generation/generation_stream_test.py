@@ -0,0 +1,123 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Generator, Iterator, List
+
+import pytest
+
+from services.generation import ollama_generation_service as ollama_generation_service_module
+from services.generation.aws_generation_service import AwsGenerationService
+from services.generation.generation_result import GenerationResult
+from services.generation.generation_service import GenerationService
+from services.generation.generation_stream import GenerationStream
+from services.generation.ollama_generation_service import OllamaGenerationService
+
+
+class FakeGenerationService(GenerationService):
+    def get_answer(self, prompt: str) -> GenerationResult:
+        return GenerationResult(10, 2, "stop", "Die Antwort", {})
+
+
+class FakeOllamaResponse:
+    status_code = 200
+
+    def __init__(self, lines: List[Dict[str, Any]]) -> None:
+        self._lines = lines
+        self.closed = False
+
+    def iter_lines(self) -> Iterator[bytes]:
+        for line in self._lines:
+            yield json.dumps(line).encode("utf-8")
+            yield b""
+
+    def __enter__(self) -> "FakeOllamaResponse":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.closed = True
+
+
+class FakeBedrockRuntimeClient:
+    def __init__(self, events: List[Dict[str, Any]]) -> None:
+        self._events = events
+        self.number_of_calls = 0
+
+    def invoke_model_with_response_stream(self, **params: Any) -> Dict[str, Any]:
+        self.number_of_calls += 1
+        return {"body": iter([{"chunk": {"bytes": json.dumps(event).encode("utf-8")}} for event in self._events])}
+
+
+def create_post(response: FakeOllamaResponse) -> Callable[..., FakeOllamaResponse]:
+    def post(*args: Any, **kwargs: Any) -> FakeOllamaResponse:
+        return response
+
+    return post
+
+
+def create_settings() -> Any:
+    return SimpleNamespace(local_llm_model_name="llama", local_llm_url="http://localhost:11434/api/generate", aws_model_name="model")
+
+
+def test_default_stream_yields_the_complete_answer():
+    stream = FakeGenerationService().stream_answer("prompt")
+
+    assert list(stream) == ["Die Antwort"]
+    assert stream.result == GenerationResult(10, 2, "stop", "Die Antwort", {})
+
+
+def test_ollama_stream_yields_the_tokens_before_the_response_ends(monkeypatch: pytest.MonkeyPatch):
+    response = FakeOllamaResponse([
+        {"response": " Die", "done": False},
+        {"response": " Antwort", "done": False},
+        {"response": "", "done": True, "prompt_eval_count": 12, "eval_count": 2},
+    ])
+    monkeypatch.setattr(ollama_generation_service_module.requests, "post", create_post(response))
+
+    stream = OllamaGenerationService(create_settings()).stream_answer("prompt")
+    chunks = iter(stream)
+
+    assert next(chunks) == " Die"
+    assert stream.result is None
+    assert list(chunks) == [" Antwort"]
+    assert stream.result == GenerationResult(12, 2, "", "Die Antwort", {})
+    assert response.closed
+
+
+def test_ollama_get_answer_returns_the_complete_answer(monkeypatch: pytest.MonkeyPatch):
+    response = FakeOllamaResponse([{"response": "Die"}, {"response": " Antwort", "prompt_eval_count": 12, "eval_count": 2}])
+    monkeypatch.setattr(ollama_generation_service_module.requests, "post", create_post(response))
+
+    generation_result = OllamaGenerationService(create_settings()).get_answer("prompt")
+
+    assert generation_result.output_text == "Die Antwort"
+    assert generation_result.token_count == 2
+
+
+def test_aws_stream_yields_the_text_deltas_and_counts_the_tokens():
+    client = FakeBedrockRuntimeClient([
+        {"type": "message_start", "message": {"usage": {"input_tokens": 25, "output_tokens": 1}}},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "<p>Die"}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": " Antwort</p>"}},
+        {"type": "content_block_stop", "index": 0},
+        {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 7}},
+        {"type": "message_stop"},
+    ])
+
+    stream = AwsGenerationService(create_settings(), client).stream_answer("prompt")  # type: ignore
+
+    assert list(stream) == ["<p>Die", " Antwort</p>"]
+    assert stream.get_result() == GenerationResult(25, 7, "end_turn", "<p>Die Antwort</p>", {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 2048})
+    assert client.number_of_calls == 1
+
+
+def test_get_result_raises_an_error_when_the_stream_was_closed_before_its_end():
+    def generate() -> Generator[str, None, GenerationResult]:
+        yield "Die"
+        return GenerationResult(10, 2, "stop", "Die Antwort", {})
+
+    chunks = generate()
+    chunks.close()
+    stream = GenerationStream(chunks)
+
+    with pytest.raises(RuntimeError):
+        stream.get_result()
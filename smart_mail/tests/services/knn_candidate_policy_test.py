@@ -0,0 +1,90 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from services.knn_candidate_policy import FilterSelectivityEstimator, KnnCandidatePolicy
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeElasticsearch:
+    def __init__(self, total_count: int, matched_count: int) -> None:
+        self.total_count = total_count
+        self.matched_count = matched_count
+        self.count_requests: List[Dict[str, Any]] = []
+
+    def count(self, index: str, query: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        self.count_requests.append({"index": index, "query": query})
+        return {"count": self.total_count if query is None else self.matched_count}
+
+
+class FakeEstimator:
+    def __init__(self, selectivity: float) -> None:
+        self.selectivity = selectivity
+
+    def estimate(self, filter_query: Dict[str, Any]) -> float:
+        return self.selectivity
+
+
+PROJECT_FILTER = {"bool": {"must": [{"term": {"project_id": "P1"}}]}}
+
+
+def test_fixed_number_of_candidates_is_used_as_is():
+    policy = KnnCandidatePolicy(num_candidates=500, selectivity_estimator=FakeEstimator(0.01))  # type: ignore
+
+    assert policy.get_num_candidates(10, PROJECT_FILTER) == 500
+    assert policy.get_num_candidates(1000, PROJECT_FILTER) == 1000
+
+
+def test_adaptive_number_of_candidates_scales_with_k():
+    policy = KnnCandidatePolicy(candidates_per_result=10, min_num_candidates=50)
+
+    assert policy.get_num_candidates(3, PROJECT_FILTER) == 50
+    assert policy.get_num_candidates(10, PROJECT_FILTER) == 100
+    assert policy.get_num_candidates(40, PROJECT_FILTER) == 400
+
+
+def test_adaptive_number_of_candidates_grows_for_selective_filters():
+    broad_policy = KnnCandidatePolicy(candidates_per_result=10, selectivity_estimator=FakeEstimator(1.0))  # type: ignore
+    selective_policy = KnnCandidatePolicy(candidates_per_result=10, selectivity_estimator=FakeEstimator(0.1))  # type: ignore
+    rare_policy = KnnCandidatePolicy(candidates_per_result=10, max_num_candidates=2000, selectivity_estimator=FakeEstimator(0.0))  # type: ignore
+
+    assert broad_policy.get_num_candidates(20, PROJECT_FILTER) == 200
+    assert selective_policy.get_num_candidates(20, PROJECT_FILTER) == 2000
+    assert rare_policy.get_num_candidates(20, PROJECT_FILTER) == 2000
+
+
+def test_invalid_bounds_are_rejected():
+    with pytest.raises(ValueError):
+        KnnCandidatePolicy(min_num_candidates=200, max_num_candidates=100)
+
+    with pytest.raises(ValueError):
+        KnnCandidatePolicy(max_num_candidates=20000)
+
+
+def test_selectivity_is_estimated_once_per_filter_until_it_expires():
+    clock = FakeClock()
+    es_client = FakeElasticsearch(total_count=1000, matched_count=50)
+    estimator = FilterSelectivityEstimator(es_client, "documents", ttl_seconds=60, clock=clock)  # type: ignore
+
+    assert estimator.estimate(PROJECT_FILTER) == 0.05
+    assert estimator.estimate({"bool": {"must": [{"term": {"project_id": "P1"}}]}}) == 0.05
+    assert len(es_client.count_requests) == 2
+
+    clock.now += 61
+    es_client.matched_count = 100
+
+    assert estimator.estimate(PROJECT_FILTER) == 0.1
+    assert len(es_client.count_requests) == 4
+
+
+def test_selectivity_of_an_empty_index_is_one():
+    estimator = FilterSelectivityEstimator(FakeElasticsearch(total_count=0, matched_count=0), "documents")  # type: ignore
+
+    assert estimator.estimate(PROJECT_FILTER) == 1.0
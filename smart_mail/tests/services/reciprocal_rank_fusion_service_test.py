@@ -1,3 +1,5 @@
+import pytest
+
 from services.reciprocal_rank_fusion_service import ReciprocalRankFusionService
 from services.retrieval_result import RetrievalResult
 from services.search_result import SearchResult
@@ -38,3 +40,61 @@ def test_rerank():
 
     # Assert the results
     assert actual_result == expected_result, f"Expected {expected_result}, but got {actual_result}"
+
+
+def create_search_result(document_id: str, score: float = 1.0, question: str = "question") -> SearchResult:
+    return SearchResult(score=score, document_id=document_id, category="category", question=question, answer="answer",
+                        answer_instructions=None, project_id=None, project_name=None, authorization_id=None)
+
+
+def test_rerank_does_not_modify_the_retrieval_result():
+    text_result_items = [create_search_result("doc1"), create_search_result("doc2")]
+    vector_result_items = [create_search_result("doc2", 0.9)]
+    retrieval_result = RetrievalResult(text_result_items=list(text_result_items), vector_result_items=list(vector_result_items))
+
+    ReciprocalRankFusionService().rerank(retrieval_result)
+
+    assert retrieval_result.text_result_items == text_result_items
+    assert retrieval_result.vector_result_items == vector_result_items
+    assert [item.score for item in text_result_items + vector_result_items] == [1.0, 1.0, 0.9]
+
+
+def test_fuse_combines_any_number_of_weighted_lists():
+    service = ReciprocalRankFusionService(k=1)
+    ranked_lists = [
+        [create_search_result("doc1"), create_search_result("doc2")],
+        [create_search_result("doc2"), create_search_result("doc3")],
+        [create_search_result("doc3")],
+    ]
+
+    actual_result = service.fuse(ranked_lists, weights=[1.0, 1.0, 2.0])
+
+    # doc1: 1/2, doc2: 1/3 + 1/2, doc3: 1/3 + 2/2
+    assert [(item.document_id, round(item.score, 6)) for item in actual_result] == [("doc3", 1.333333), ("doc2", 0.833333), ("doc1", 0.5)]
+
+
+def test_fuse_returns_the_top_results_and_keeps_the_order_of_the_ties():
+    service = ReciprocalRankFusionService()
+    ranked_lists = [[create_search_result(f"doc{i}") for i in range(5)], [create_search_result(f"other{i}") for i in range(5)]]
+
+    actual_result = service.fuse(ranked_lists, number_of_results=3)
+
+    assert [item.document_id for item in actual_result] == ["doc0", "other0", "doc1"]
+
+
+def test_fuse_compares_the_document_ids_by_value_and_counts_the_best_rank_of_a_repeated_document():
+    service = ReciprocalRankFusionService(k=1)
+    document_id = "".join(["doc", "1"])
+    ranked_lists = [
+        [create_search_result(document_id, question="first"), create_search_result("doc2"), create_search_result("doc1")],
+        [create_search_result("doc1", question="second")],
+    ]
+
+    actual_result = service.fuse(ranked_lists)
+
+    assert [(item.document_id, item.score, item.question) for item in actual_result] == [("doc1", 1.0, "first"), ("doc2", 1 / 3, "question")]
+
+
+def test_fuse_requires_a_weight_per_list():
+    with pytest.raises(ValueError):
+        ReciprocalRankFusionService().fuse([[create_search_result("doc1")]], weights=[1.0, 2.0])
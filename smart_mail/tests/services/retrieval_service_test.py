@@ -0,0 +1,206 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from dtos.retrieval_request import RetrievalRequest
+from services.knn_candidate_policy import KnnCandidatePolicy
+from services.multi_search_retrieval_service import MultiSearchRetrievalService
+from services.retrieval_service import RetrievalService
+
+
+class FakeEmbeddingModel:
+    def __init__(self) -> None:
+        self.number_of_calls = 0
+
+    def encode(self, text: str | List[str]) -> Any:
+        self.number_of_calls += 1
+
+        if isinstance(text, list):
+            return [[float(len(item)), 1.0] for item in text]
+
+        return [float(len(text)), 1.0]
+
+
+class FakeElasticsearch:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.thread_names: List[str] = []
+        self.number_of_requests = 0
+        self.bodies: List[Dict[str, Any]] = []
+        self.params: List[Dict[str, Any]] = []
+        self.requested_ids: List[List[str]] = []
+
+    def search(self, index: str, body: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+        self.number_of_requests += 1
+        self.bodies.append(body)
+        self.params.append(params)
+        self.thread_names.append(threading.current_thread().name)
+        time.sleep(self.delay)
+
+        return self._create_response(body)
+
+    def msearch(self, body: List[Dict[str, Any]], **params: Any) -> Dict[str, Any]:
+        self.number_of_requests += 1
+        self.params.append(params)
+
+        return {"responses": [self._create_response(search_body) for search_body in body[1::2]]}
+
+    def mget(self, index: str, ids: List[str], source: List[str], **params: Any) -> Dict[str, Any]:
+        self.number_of_requests += 1
+        self.requested_ids.append(ids)
+
+        docs = [{"_id": document_id, "found": True, "_source": self._create_source(document_id)} for document_id in ids if not document_id.endswith("doc2")]
+        return {"docs": docs + [{"_id": document_id, "found": False} for document_id in ids if document_id.endswith("doc2")]}
+
+    @staticmethod
+    def _create_response(body: Dict[str, Any]) -> Dict[str, Any]:
+        prefix = "knn" if "knn" in body else "text"
+        filter_block = body["knn"]["filter"] if "knn" in body else body["query"]["bool"]["filter"]
+        prefix += "_project" if "function_score" in filter_block else ""
+
+        hits = [FakeElasticsearch._create_hit(f"{prefix}_doc{i}", 1.0 / (i + 1)) for i in range(3)]
+        for hit in hits:
+            hit["_source"] = {field: value for field, value in hit["_source"].items() if field in body["_source"]}
+
+        return {"hits": {"hits": hits}}
+
+    @staticmethod
+    def _create_hit(document_id: str, score: float) -> Dict[str, Any]:
+        return {"_score": score, "_source": FakeElasticsearch._create_source(document_id)}
+
+    @staticmethod
+    def _create_source(document_id: str) -> Dict[str, Any]:
+        return {"category": "category", "question": f"question {document_id}", "answer": "answer", "document_id": document_id}
+
+
+def create_settings() -> Any:
+    return SimpleNamespace(index_name="documents", source_system="evdi")
+
+
+def test_concurrent_search_returns_the_same_result_as_sequential_search():
+    sequential_service = RetrievalService(FakeElasticsearch(), FakeEmbeddingModel(), create_settings())  # type: ignore
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval") as executor:
+        es_client = FakeElasticsearch()
+        concurrent_service = RetrievalService(es_client, FakeEmbeddingModel(), create_settings(), executor)  # type: ignore
+
+        expected_result = sequential_service.search("Wann erfolgt die Auszahlung?", customer_project_id=None)
+        actual_result = concurrent_service.search("Wann erfolgt die Auszahlung?", customer_project_id=None)
+
+    assert actual_result == expected_result
+    assert any(name.startswith("retrieval") for name in es_client.thread_names)
+
+
+def test_concurrent_search_takes_as_long_as_the_slowest_search():
+    delay = 0.2
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        service = RetrievalService(FakeElasticsearch(delay), FakeEmbeddingModel(), create_settings(), executor)  # type: ignore
+
+        start_time = time.perf_counter()
+        service.search("Wann erfolgt die Auszahlung?")
+        elapsed_time = time.perf_counter() - start_time
+
+    assert elapsed_time < 2 * delay
+
+
+def test_multi_search_returns_the_same_result_as_two_searches_in_one_request():
+    sequential_service = RetrievalService(FakeElasticsearch(), FakeEmbeddingModel(), create_settings())  # type: ignore
+    es_client = FakeElasticsearch()
+    multi_search_service = MultiSearchRetrievalService(es_client, FakeEmbeddingModel(), create_settings())  # type: ignore
+
+    expected_result = sequential_service.search("Wann erfolgt die Auszahlung?", authorization_ids=["ID1"])
+    actual_result = multi_search_service.search("Wann erfolgt die Auszahlung?", authorization_ids=["ID1"])
+
+    assert actual_result == expected_result
+    assert es_client.number_of_requests == 1
+
+
+def test_search_batch_returns_the_results_in_the_order_of_the_requests():
+    sequential_service = RetrievalService(FakeElasticsearch(), FakeEmbeddingModel(), create_settings())  # type: ignore
+    es_client = FakeElasticsearch()
+    embedding_model = FakeEmbeddingModel()
+    batch_service = RetrievalService(es_client, embedding_model, create_settings())  # type: ignore
+
+    requests = [
+        RetrievalRequest("Wann erfolgt die Auszahlung?"),
+        RetrievalRequest("Wann erfolgt die Auszahlung im Projekt?", customer_project_id="PROJECT1", authorization_ids=["PROJECT1"]),
+        RetrievalRequest("Was ist Crowdinvesting?"),
+    ]
+
+    expected_results = [
+        sequential_service.search(request.question, customer_project_id=request.customer_project_id, authorization_ids=request.authorization_ids)  # type: ignore
+        for request in requests
+    ]
+    actual_results = batch_service.search_batch(requests)
+
+    assert actual_results == expected_results
+    assert actual_results[0] != actual_results[1]
+    assert es_client.number_of_requests == 1
+    assert embedding_model.number_of_calls == 1
+
+
+def test_knn_search_uses_the_number_of_candidates_of_the_policy():
+    es_client = FakeElasticsearch()
+    service = RetrievalService(es_client, FakeEmbeddingModel(), create_settings(), candidate_policy=KnnCandidatePolicy(candidates_per_result=20))  # type: ignore
+
+    service.search("Wann erfolgt die Auszahlung?", number_of_results=20)
+
+    knn_bodies = [body for body in es_client.bodies if "knn" in body]
+    assert [body["knn"]["k"] for body in knn_bodies] == [10]
+    assert [body["knn"]["num_candidates"] for body in knn_bodies] == [200]
+
+
+def test_knn_search_uses_the_default_number_of_candidates_of_the_settings_without_a_policy():
+    es_client = FakeElasticsearch()
+    service = RetrievalService(es_client, FakeEmbeddingModel(), create_settings())  # type: ignore
+
+    service.search("Wann erfolgt die Auszahlung?", number_of_results=20)
+
+    knn_bodies = [body for body in es_client.bodies if "knn" in body]
+    assert [body["knn"]["num_candidates"] for body in knn_bodies] == [10000]
+
+
+def test_two_phase_search_loads_the_texts_of_the_used_documents_only():
+    es_client = FakeElasticsearch()
+    service = RetrievalService(es_client, FakeEmbeddingModel(), create_settings(), two_phase=True)  # type: ignore
+
+    result = service.search("Wann erfolgt die Auszahlung?")
+
+    assert [item.document_id for item in result.text_result_items] == ["text_doc0", "text_doc1", "text_doc2"]
+    assert all(item.question == "" for item in result.text_result_items + result.vector_result_items)
+    assert all(body["_source"] == RetrievalService.REFERENCE_SOURCE_FIELDS for body in es_client.bodies)
+    assert all("filter_path" in params for params in es_client.params)
+
+    used_results = service.fetch_documents(result.vector_result_items[:2] + result.text_result_items)
+
+    # The deleted document "text_doc2" is skipped, the scores of the search results are kept
+    assert [item.document_id for item in used_results] == ["knn_doc0", "knn_doc1", "text_doc0", "text_doc1"]
+    assert [item.question for item in used_results] == ["question knn_doc0", "question knn_doc1", "question text_doc0", "question text_doc1"]
+    assert [item.score for item in used_results] == [1.0, 0.5, 1.0, 0.5]
+    assert es_client.requested_ids == [["knn_doc0", "knn_doc1", "text_doc0", "text_doc1", "text_doc2"]]
+
+
+def test_fetch_documents_batch_sends_one_request_for_all_lists():
+    es_client = FakeElasticsearch()
+    service = MultiSearchRetrievalService(es_client, FakeEmbeddingModel(), create_settings(), two_phase=True)  # type: ignore
+
+    results = service.search_batch([RetrievalRequest("Wann erfolgt die Auszahlung?"), RetrievalRequest("Was ist Crowdinvesting?")])
+    used_results_lists = service.fetch_documents_batch([result.text_result_items[:2] for result in results])
+
+    assert [[item.question for item in items] for items in used_results_lists] == [["question text_doc0", "question text_doc1"]] * 2
+    assert es_client.requested_ids == [["text_doc0", "text_doc1"]]
+    assert "responses.status" in es_client.params[0]["filter_path"]
+
+
+def test_fetch_documents_returns_the_results_without_the_two_phase_search():
+    es_client = FakeElasticsearch()
+    service = RetrievalService(es_client, FakeEmbeddingModel(), create_settings())  # type: ignore
+
+    result = service.search("Wann erfolgt die Auszahlung?")
+
+    assert service.fetch_documents(result.text_result_items) == result.text_result_items
+    assert es_client.requested_ids == []
+    assert all(params == {} for params in es_client.params)
@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from prometheus_client import CollectorRegistry
+
+from services.retrieval_service import RetrievalService
+from services.tracing.prometheus_span_exporter import PrometheusSpanExporter
+from services.tracing.request_trace import RequestTrace, trace_span
+from services.tracing.span_exporter import SpanExporter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeSpanExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: List[Tuple[str, float]] = []
+
+    def export(self, name: str, duration_seconds: float) -> None:
+        self.spans.append((name, duration_seconds))
+
+
+class FakeEmbeddingModel:
+    def encode(self, text: str) -> Any:
+        return [float(len(text)), 1.0]
+
+
+class FakeElasticsearch:
+    def __init__(self) -> None:
+        self.thread_names: List[str] = []
+
+    def search(self, index: str, body: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+        self.thread_names.append(threading.current_thread().name)
+        return {"hits": {"hits": []}}
+
+
+def test_spans_are_summed_up_by_name_and_exported():
+    clock = FakeClock()
+    exporter = FakeSpanExporter()
+    trace = RequestTrace(exporter, clock)
+
+    with trace.activate():
+        for duration in (0.25, 0.5):
+            with trace_span("knn_search"):
+                clock.now += duration
+        trace.add("total", 1.0)
+
+    assert trace.to_dict() == {"knn_search": 750.0, "total": 1000.0}
+    assert exporter.spans == [("knn_search", 0.25), ("knn_search", 0.5), ("total", 1.0)]
+
+
+def test_spans_without_an_active_trace_are_not_recorded():
+    trace = RequestTrace()
+
+    with trace_span("knn_search"):
+        pass
+
+    with trace.activate():
+        pass
+
+    with trace_span("text_search"):
+        pass
+
+    assert trace.to_dict() == {}
+
+
+def test_concurrent_retrieval_records_the_stages_of_all_threads():
+    es_client = FakeElasticsearch()
+    settings = SimpleNamespace(index_name="documents", source_system="evdi")
+    trace = RequestTrace()
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval") as executor:
+        service = RetrievalService(es_client, FakeEmbeddingModel(), settings, executor)  # type: ignore
+
+        with trace.activate():
+            service.search("Wann erfolgt die Auszahlung?")
+
+    assert set(trace.to_dict().keys()) == {"query_embedding", "knn_search", "text_search"}
+    assert any(name.startswith("retrieval") for name in es_client.thread_names)
+
+
+def test_prometheus_exporter_observes_the_durations_by_stage():
+    registry = CollectorRegistry()
+    exporter = PrometheusSpanExporter(registry=registry)
+
+    exporter.export("generation", 1.5)
+    exporter.export("generation", 0.5)
+    exporter.export("knn_search", 0.01)
+
+    assert registry.get_sample_value("smart_mail_stage_duration_seconds_count", {"stage": "generation"}) == 2
+    assert registry.get_sample_value("smart_mail_stage_duration_seconds_sum", {"stage": "generation"}) == 2.0
+    assert registry.get_sample_value("smart_mail_stage_duration_seconds_bucket", {"stage": "knn_search", "le": "0.01"}) == 1